@@ -1,16 +1,91 @@
 import os
+import sys
+import asyncio
 import json
+import time
+import logging
+import hashlib
+import threading
+import importlib.util
 from dataclasses import dataclass, asdict
-from typing import Dict
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
+from answer_cache import cache_key, get_cache
+from answer_pack import PackSet, get_packs
+from rate_limiter import RateLimiter, estimate_tokens, limiter
+from single_flight import AsyncSingleFlight, SingleFlight
+from prompt_templates import PROMPT_VERSION, SUMMARY_INSTRUCTIONS, get_template
+from conversation_memory import ConversationMemory
+import codec
+from model_router import PROBE_CHARS, ModelRouter, is_doubtful, too_short
+from hedging import HedgePolicy, race, race_async
+from prefetch import SPECULATIVE_PREFETCH, Prefetcher
+import cancellation
+from cancellation import CancelScope
+import telemetry
+
+# The OpenAI SDK (and httpx under it) takes ~0.5s to import: it is loaded on first use,
+# so the apps can show their first page and tools like batch_answer can use the helpers
+# without paying for it
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger(__name__)
 
-MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o-mini")
 
-@dataclass
+# Read a setting from the environment, falling back to Streamlit secrets (cloud deployment)
+def get_setting(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = os.getenv(name)
+    if value:
+        return value
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            return st.secrets.get(name, default)
+        except Exception:
+            pass
+    return default
+
+
+# Everything the OpenAI client needs, resolved once per process (Streamlit reruns reuse it)
+@dataclass(frozen=True)
+class Settings:
+    api_key: Optional[str]
+    model_name: str
+    base_url: Optional[str]
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    http2: bool
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    return Settings(
+        api_key=get_setting("OPENAI_API_KEY"),
+        model_name=get_setting("MODEL_NAME", "gpt-4o-mini"),
+        base_url=get_setting("OPENAI_BASE_URL"),
+        max_connections=int(get_setting("OPENAI_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(get_setting("OPENAI_MAX_KEEPALIVE", "20")),
+        # Keep idle connections longer than httpx's 5s default: students pause between questions
+        keepalive_expiry=float(get_setting("OPENAI_KEEPALIVE_EXPIRY", "120")),
+        http2=get_setting("OPENAI_HTTP2", "0") == "1",
+    )
+
+
+MODEL_NAME = get_settings().model_name
+# Cheapest to largest, e.g. "gpt-4o-mini,gpt-4o"; a single model (the default) disables routing
+MODEL_TIERS = [m.strip() for m in (get_setting("MODEL_TIERS") or "").split(",") if m.strip()] or [MODEL_NAME]
+# Backup backend for hedged requests (see hedging): another model, another endpoint, or both
+HEDGE_MODEL = get_setting("HEDGE_MODEL")
+HEDGE_BASE_URL = get_setting("HEDGE_BASE_URL")
+
+
+# Slotted: one small fixed-layout object per student (see codec for how it is stored)
+@dataclass(slots=True)
 class StudentProfile:
     Student_Name: str
     Academic_Name: str
@@ -57,24 +132,662 @@ def collect_student_profile() -> StudentProfile:
         Subject=subject,
     )
 
-# Ask OpenAI for Answer
-def ask_openai(question: str, profile: StudentProfile) -> str:
-    prompt = (
-        f"The student profile is: {json.dumps(asdict(profile))}.\n"
-        f"The student has asked: {question}\n"
-        f"Please answer according to the student's Academic_Level ({profile.Academic_Level})."
+def _http_options(settings: Settings) -> Dict:
+    import httpx
+
+    http2 = settings.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("OPENAI_HTTP2=1 but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=settings.max_connections,
+        max_keepalive_connections=settings.max_keepalive_connections,
+        keepalive_expiry=settings.keepalive_expiry,
+    )
+    return {"limits": limits, "http2": http2}
+
+
+# Clients are created on first use and shared by every caller (and every Streamlit rerun)
+# in this process, so the keep-alive connection pool survives between questions.
+# max_retries=0: a 429 must reach the rate limiter, which pauses and shrinks concurrency
+# for every caller, instead of being retried inside the SDK while the permit is held;
+# the limiter also retries 5xx responses and failed connections, without holding one
+@lru_cache(maxsize=None)
+def get_http_client() -> "httpx.Client":
+    from openai import DefaultHttpxClient
+
+    return DefaultHttpxClient(**_http_options(get_settings()))
+
+
+@lru_cache(maxsize=None)
+def get_async_http_client() -> "httpx.AsyncClient":
+    from openai import DefaultAsyncHttpxClient
+
+    return DefaultAsyncHttpxClient(**_http_options(get_settings()))
+
+
+@lru_cache(maxsize=None)
+def get_client() -> "OpenAI":
+    from openai import OpenAI
+
+    settings = get_settings()
+    return OpenAI(api_key=settings.api_key, base_url=settings.base_url,
+                  http_client=get_http_client(), max_retries=0)
+
+
+@lru_cache(maxsize=None)
+def get_async_client() -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+
+    settings = get_settings()
+    return AsyncOpenAI(api_key=settings.api_key, base_url=settings.base_url,
+                       http_client=get_async_http_client(), max_retries=0)
+
+
+# The hedge backup shares the connection pool; a separate endpoint may have its own key
+@lru_cache(maxsize=None)
+def get_backup_client() -> "OpenAI":
+    from openai import OpenAI
+
+    settings = get_settings()
+    return OpenAI(api_key=get_setting("HEDGE_API_KEY") or settings.api_key,
+                  base_url=HEDGE_BASE_URL or settings.base_url, http_client=get_http_client(), max_retries=0)
+
+
+@lru_cache(maxsize=None)
+def get_backup_async_client() -> "AsyncOpenAI":
+    from openai import AsyncOpenAI
+
+    settings = get_settings()
+    return AsyncOpenAI(api_key=get_setting("HEDGE_API_KEY") or settings.api_key,
+                       base_url=HEDGE_BASE_URL or settings.base_url, http_client=get_async_http_client(),
+                       max_retries=0)
+
+
+def _api_base_url() -> str:
+    return get_settings().base_url or "https://api.openai.com/v1"
+
+
+_prewarm_lock = threading.Lock()
+_prewarmed = set()
+
+
+def _claim_prewarm(kind: str) -> bool:
+    with _prewarm_lock:
+        if kind in _prewarmed:
+            return False
+        _prewarmed.add(kind)
+        return True
+
+
+# Load the SDK, build the client and open a TLS connection to the API ahead of the first
+# question. Any response (even 401/404) leaves the connection in the keep-alive pool;
+# failures are only logged.
+def prewarm() -> None:
+    if not _claim_prewarm("sync"):
+        return
+
+    def warm():
+        try:
+            get_client()
+            get_http_client().head(_api_base_url(), timeout=5.0)
+        except Exception as e:
+            logger.info("prewarm failed: %s", e)
+
+    threading.Thread(target=warm, daemon=True).start()
+
+
+async def prewarm_async() -> None:
+    if not _claim_prewarm("async"):
+        return
+    try:
+        # The first SDK import would block the event loop (every session) for ~0.5s
+        await asyncio.to_thread(get_async_client)
+        await get_async_http_client().head(_api_base_url(), timeout=5.0)
+    except Exception as e:
+        logger.info("prewarm failed: %s", e)
+
+
+# Time to first token and total time of one streamed answer (seconds)
+@dataclass
+class StreamTiming:
+    ttft: Optional[float] = None
+    total: Optional[float] = None
+
+
+# Token usage of every OpenAI call made by this process
+class UsageStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cut_off = 0
+
+    def record(self, usage) -> None:
+        cached = 0
+        if usage is not None and usage.prompt_tokens_details is not None:
+            cached = usage.prompt_tokens_details.cached_tokens or 0
+        with self._lock:
+            self.requests += 1
+            if usage is not None:
+                self.prompt_tokens += usage.prompt_tokens or 0
+                self.cached_prompt_tokens += cached
+                self.completion_tokens += usage.completion_tokens or 0
+        if usage is not None:
+            logger.info("usage: prompt=%d (cached=%d) completion=%d",
+                        usage.prompt_tokens or 0, cached, usage.completion_tokens or 0)
+
+    # A stream cut off before its usage arrived (cancelled or failed): estimated tokens
+    def record_partial(self, prompt_tokens: int, completion_tokens: int) -> int:
+        with self._lock:
+            self.requests += 1
+            self.cut_off += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        logger.info("usage (cut off, estimated): prompt=%d completion=%d", prompt_tokens, completion_tokens)
+        return prompt_tokens + completion_tokens
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "cut_off": self.cut_off,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "uncached_prompt_tokens": self.prompt_tokens - self.cached_prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+            }
+
+
+usage_stats = UsageStats()
+# In-flight identical questions, per process (see single_flight)
+flights = SingleFlight()
+async_flights = AsyncSingleFlight()
+router = ModelRouter(MODEL_TIERS)
+hedge = HedgePolicy(enabled=bool(HEDGE_MODEL or HEDGE_BASE_URL))
+# A backup on the same endpoint counts against the same quotas; another endpoint has its own
+backup_limiter = RateLimiter() if HEDGE_BASE_URL else limiter
+
+
+# Build chat messages for a question: the brief static instructions, then the
+# per-(level, subject) guidance, then only the class and question. Name and institution
+# are not sent.
+def build_messages(question: str, profile: StudentProfile,
+                   context: Sequence[Dict[str, str]] = ()) -> List[Dict[str, str]]:
+    return get_template().messages(profile.Academic_Level, profile.Subject, profile.Class, question, context)
+
+
+# Routes requests with the same prefix to the same provider cache shard
+def _prompt_cache_key(profile: StudentProfile) -> str:
+    return get_template().cache_key(profile.Academic_Level, profile.Subject)
+
+
+def _delta(chunk) -> str:
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def _log_timing(timing: StreamTiming, start: float, source: str) -> None:
+    timing.total = time.perf_counter() - start
+    logger.info("answer from %s: ttft=%.3fs total=%.3fs", source,
+                timing.ttft if timing.ttft is not None else float("nan"), timing.total)
+
+
+# Cache key: question + level + subject + model(s) + prompt version (no student identity)
+def _answer_key(question: str, profile: StudentProfile) -> str:
+    return cache_key(question, profile.Academic_Level, profile.Subject, router.namespace, PROMPT_VERSION)
+
+
+# Near-duplicate lookup is opt-in: it needs NumPy and trades a little accuracy for hit rate
+SEMANTIC_CACHE = get_setting("SEMANTIC_CACHE", "0") == "1"
+
+
+def _semantic_index():
+    if not SEMANTIC_CACHE:
+        return None
+    from semantic_index import get_index
+    return get_index(f"{router.namespace}-v{PROMPT_VERSION}")
+
+
+# Precomputed answers for this model and prompt version (see answer_pack, build_pack)
+def answer_packs() -> Optional[PackSet]:
+    return get_packs(f"{router.namespace}-v{PROMPT_VERSION}")
+
+
+# (answer, source) from the answer packs, the exact cache, then the near-duplicate index
+def _lookup(key: str, question: str, profile: StudentProfile) -> Optional[Tuple[str, str]]:
+    packs = answer_packs()
+    answer = packs.get(key) if packs is not None else None
+    if answer is not None:
+        return answer, "pack"
+    cache = get_cache()
+    answer = cache.get(key) if cache is not None else None
+    if answer is not None:
+        return answer, "cache"
+    index = _semantic_index()
+    if index is not None:
+        match = index.search(profile.Academic_Level, profile.Subject, question)
+        if match is not None:
+            return match[1], "semantic"
+    return None
+
+
+def _store(key: str, question: str, profile: StudentProfile, answer: str) -> None:
+    if not answer:
+        return
+    cache = get_cache()
+    if cache is not None:
+        cache.put(key, answer)
+    index = _semantic_index()
+    if index is not None:
+        index.add(profile.Academic_Level, profile.Subject, question, answer)
+
+
+# Set OPENAI_PROMPT_CACHE_KEY=0 for OpenAI-compatible servers that reject the parameter
+PROMPT_CACHE_KEY = get_setting("OPENAI_PROMPT_CACHE_KEY", "1") == "1"
+
+
+def _cache_hint(prompt_cache_key: Optional[str]) -> Dict[str, str]:
+    return {"prompt_cache_key": prompt_cache_key} if prompt_cache_key and PROMPT_CACHE_KEY else {}
+
+
+# Tokens billed for a stream that ended without usage: the whole answer if it completed
+# (some compatible servers never send usage: keep the reservation), else an estimate
+def _settle(usage, complete: bool, messages: List[Dict[str, str]], chars: int) -> Optional[int]:
+    if usage is not None:
+        usage_stats.record(usage)
+        return usage.total_tokens
+    if complete:
+        usage_stats.record(None)
+        return None
+    return usage_stats.record_partial(sum(len(m["content"]) for m in messages) // 4, chars // 4)
+
+
+# Raw OpenAI token stream. Every call goes through the shared rate limiter, which queues
+# callers, retries 429s and adapts concurrency from the time to first token.
+# backup=True sends it to the hedge backup backend instead.
+def _upstream_stream(messages: List[Dict[str, str]], prompt_cache_key: Optional[str] = None,
+                     trace: Optional[telemetry.RequestTrace] = None, model: Optional[str] = None,
+                     backup: bool = False) -> Iterator[str]:
+    model = model or MODEL_NAME
+    client, gate = (get_backup_client(), backup_limiter) if backup else (get_client(), limiter)
+    scope = cancellation.current()
+    if scope is not None:
+        # Abandoned before it was sent (e.g. while queued behind the flight's subscribers)
+        scope.check()
+    start, queued = time.perf_counter(), time.monotonic()
+    stream, permit = gate.open(
+        lambda: client.chat.completions.create(
+            model=model, messages=messages, stream=True,
+            stream_options={"include_usage": True},
+            **_cache_hint(prompt_cache_key),
+        ),
+        estimate_tokens(messages),
     )
+    # Cancelling the scope (from any thread) drops the connection and wakes the read below
+    unregister = scope.on_cancel(lambda: cancellation.abort_response(stream.response)) if scope else None
+    usage, ttft, chars, complete = None, None, 0, False
+    try:
+        for chunk in stream:
+            usage = chunk.usage or usage
+            delta = _delta(chunk)
+            if delta:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                chars += len(delta)
+                yield delta
+        complete = True
+    finally:
+        if unregister is not None:
+            unregister()
+        stream.close()
+        gate.release(permit, _settle(usage, complete, messages, chars), ttft)
+        if telemetry.ENABLED:
+            telemetry.record_upstream(trace, model, start, permit.acquired - queued, usage)
 
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "system", "content": "You are a helpful teacher assistant."},
-                  {"role": "user", "content": prompt}]
+
+async def _upstream_stream_async(messages: List[Dict[str, str]], prompt_cache_key: Optional[str] = None,
+                                 trace: Optional[telemetry.RequestTrace] = None,
+                                 model: Optional[str] = None, backup: bool = False) -> AsyncIterator[str]:
+    model = model or MODEL_NAME
+    client, gate = (get_backup_async_client(), backup_limiter) if backup else (get_async_client(), limiter)
+    start, queued = time.perf_counter(), time.monotonic()
+    stream, permit = await gate.open_async(
+        lambda: client.chat.completions.create(
+            model=model, messages=messages, stream=True,
+            stream_options={"include_usage": True},
+            **_cache_hint(prompt_cache_key),
+        ),
+        estimate_tokens(messages),
     )
-    return response.choices[0].message.content.strip()
+    usage, ttft, chars, complete = None, None, 0, False
+    try:
+        async for chunk in stream:
+            usage = chunk.usage or usage
+            delta = _delta(chunk)
+            if delta:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                chars += len(delta)
+                yield delta
+        complete = True
+    finally:
+        await stream.close()
+        gate.release(permit, _settle(usage, complete, messages, chars), ttft)
+        if telemetry.ENABLED:
+            telemetry.record_upstream(trace, model, start, permit.acquired - queued, usage)
+
+
+# Upstream stream for one model, hedged to the backup backend when one is configured
+def _hedged_stream(messages: List[Dict[str, str]], prompt_cache_key: Optional[str] = None,
+                   trace: Optional[telemetry.RequestTrace] = None, model: Optional[str] = None) -> Iterator[str]:
+    model = model or MODEL_NAME
+    if not hedge.enabled:
+        return _upstream_stream(messages, prompt_cache_key, trace, model)
+    # Build the clients (and import the SDK) here, not on a helper thread against the deadline
+    get_client(), get_backup_client()
+    return race(model, lambda: _upstream_stream(messages, prompt_cache_key, trace, model),
+                lambda: _upstream_stream(messages, prompt_cache_key, trace, HEDGE_MODEL or model, backup=True),
+                hedge)
+
+
+def _hedged_stream_async(messages: List[Dict[str, str]], prompt_cache_key: Optional[str] = None,
+                         trace: Optional[telemetry.RequestTrace] = None,
+                         model: Optional[str] = None) -> AsyncIterator[str]:
+    model = model or MODEL_NAME
+    if not hedge.enabled:
+        return _upstream_stream_async(messages, prompt_cache_key, trace, model)
+    get_async_client(), get_backup_async_client()
+    return race_async(model, lambda: _upstream_stream_async(messages, prompt_cache_key, trace, model),
+                      lambda: _upstream_stream_async(messages, prompt_cache_key, trace, HEDGE_MODEL or model,
+                                                     backup=True),
+                      hedge)
+
+
+def _use_model(trace: Optional[telemetry.RequestTrace], model: str) -> None:
+    if trace is not None:
+        trace.labels = (*trace.labels[:2], model)
+
+
+# Answer from the cheapest tier the router trusts with this question (see model_router).
+# A cheaper tier's first PROBE_CHARS are held back; a hedging or too-short answer is
+# dropped before the student sees it and the next tier answers instead.
+def _routed_stream(question: str, profile: StudentProfile, messages: List[Dict[str, str]],
+                   trace: Optional[telemetry.RequestTrace] = None) -> Iterator[str]:
+    prompt_cache_key = _prompt_cache_key(profile)
+    if not router.enabled:
+        yield from _hedged_stream(messages, prompt_cache_key, trace)
+        return
+    level = profile.Academic_Level
+    route = router.route(question, level, profile.Subject)
+    start = time.perf_counter()
+    for tier in range(route.tier, len(router.tiers)):
+        model = router.tiers[tier]
+        _use_model(trace, model)
+        stream = _hedged_stream(messages, prompt_cache_key, trace, model)
+        held = "" if not router.is_last(tier) else None
+        try:
+            for delta in stream:
+                if held is None:
+                    yield delta
+                    continue
+                held += delta
+                if is_doubtful(held):
+                    break
+                if len(held) >= PROBE_CHARS:
+                    yield held
+                    held = None
+        finally:
+            stream.close()
+        if held is None:
+            break
+        if not is_doubtful(held) and not too_short(held, level):
+            yield held
+            break
+        logger.info("route: escalating from %s (%s)", model, "doubtful" if is_doubtful(held) else "too short")
+    router.record(route, level, profile.Subject, tier, time.perf_counter() - start)
+
+
+async def _routed_stream_async(question: str, profile: StudentProfile, messages: List[Dict[str, str]],
+                               trace: Optional[telemetry.RequestTrace] = None) -> AsyncIterator[str]:
+    prompt_cache_key = _prompt_cache_key(profile)
+    if not router.enabled:
+        async for delta in _hedged_stream_async(messages, prompt_cache_key, trace):
+            yield delta
+        return
+    level = profile.Academic_Level
+    route = router.route(question, level, profile.Subject)
+    start = time.perf_counter()
+    for tier in range(route.tier, len(router.tiers)):
+        model = router.tiers[tier]
+        _use_model(trace, model)
+        stream = _hedged_stream_async(messages, prompt_cache_key, trace, model)
+        held = "" if not router.is_last(tier) else None
+        try:
+            async for delta in stream:
+                if held is None:
+                    yield delta
+                    continue
+                held += delta
+                if is_doubtful(held):
+                    break
+                if len(held) >= PROBE_CHARS:
+                    yield held
+                    held = None
+        finally:
+            await stream.aclose()
+        if held is None:
+            break
+        if not is_doubtful(held) and not too_short(held, level):
+            yield held
+            break
+        logger.info("route: escalating from %s (%s)", model, "doubtful" if is_doubtful(held) else "too short")
+    router.record(route, level, profile.Subject, tier, time.perf_counter() - start)
+
+
+# Upstream answer for one coalesced flight; stored once, only when the stream completed
+def _generate(key: str, question: str, profile: StudentProfile, messages: List[Dict[str, str]],
+              cacheable: bool = True, trace: Optional[telemetry.RequestTrace] = None) -> Iterator[str]:
+    parts = []
+    for delta in _routed_stream(question, profile, messages, trace):
+        parts.append(delta)
+        yield delta
+    if cacheable:
+        _store(key, question, profile, "".join(parts).strip())
+
+
+async def _generate_async(key: str, question: str, profile: StudentProfile, messages: List[Dict[str, str]],
+                          cacheable: bool = True,
+                          trace: Optional[telemetry.RequestTrace] = None) -> AsyncIterator[str]:
+    parts = []
+    async for delta in _routed_stream_async(question, profile, messages, trace):
+        parts.append(delta)
+        yield delta
+    if cacheable:
+        _store(key, question, profile, "".join(parts).strip())
+
+
+# Follow-ups answered ahead of time while the student reads (see prefetch); off by default
+speculation = Prefetcher(build_messages, _routed_stream, limiter) if SPECULATIVE_PREFETCH else None
+
+
+# Fold older turns into the running summary (runs on the memory's background worker)
+def summarize_conversation(summary: str, turns: List[Dict[str, str]]) -> str:
+    lines = [f"Previous summary: {summary}"] if summary else []
+    for turn in turns:
+        lines.append(f"Student: {turn['question']}")
+        lines.append(f"Teacher: {turn['answer']}")
+    messages = [{"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                {"role": "user", "content": "\n".join(lines)}]
+    return "".join(_upstream_stream(messages, model=router.tiers[0])).strip()
+
+
+# Conversation context for this question, and the key used to coalesce / cache it.
+# Follow-ups depend on the conversation, so their key carries a fingerprint of it and
+# they skip the answer cache.
+def _prepare(question: str, profile: StudentProfile,
+             memory: Optional[ConversationMemory]) -> Tuple[List[Dict[str, str]], str]:
+    context = memory.context_for(question) if memory is not None else []
+    key = _answer_key(question, profile)
+    if context:
+        fingerprint = hashlib.sha256(codec.dumps(context)).hexdigest()[:16]
+        key = f"{key}:{fingerprint}"
+    return context, key
+
+
+def _remember(memory: Optional[ConversationMemory], question: str, profile: StudentProfile,
+              parts: List[str]) -> None:
+    if memory is not None:
+        memory.add_turn(question, "".join(parts).strip(), summarize_conversation)
+        if speculation is not None:
+            speculation.schedule(memory, profile)
+
+
+# Prefetched answer for this question of the session, if it is the follow-up one was made for
+def _prefetched(question: str, profile: StudentProfile,
+                memory: Optional[ConversationMemory]) -> Optional[Tuple[str, str]]:
+    if speculation is None or memory is None:
+        return None
+    answer = speculation.take(memory, question, profile)
+    return (answer, "prefetch") if answer is not None else None
+
+
+# Stream the answer as text deltas. Identical questions already in flight
+# (same cache key) attach to that request instead of starting another one.
+# Pass the session's ConversationMemory to answer follow-ups in context, and a
+# CancelScope to be able to stop it: cancelling raises AnswerCancelled here, aborts the
+# upstream request unless another caller shares it, and leaves the memory untouched.
+def ask_openai_stream(question: str, profile: StudentProfile,
+                      timing: Optional[StreamTiming] = None,
+                      memory: Optional[ConversationMemory] = None,
+                      scope: Optional[CancelScope] = None) -> Iterator[str]:
+    timing = timing if timing is not None else StreamTiming()
+    trace = telemetry.start_request(profile.Academic_Level, profile.Subject, MODEL_NAME)
+    stream = _answer_stream(question, profile, timing, memory, trace, scope)
+    return stream if trace is None else _traced(stream, trace, timing)
+
+
+def _answer_stream(question: str, profile: StudentProfile, timing: StreamTiming,
+                   memory: Optional[ConversationMemory], trace: Optional[telemetry.RequestTrace],
+                   scope: Optional[CancelScope] = None) -> Iterator[str]:
+    start = time.perf_counter()
+    context, key = _prepare(question, profile, memory)
+    prefetched = _prefetched(question, profile, memory)
+    cached = prefetched or (None if context else _lookup(key, question, profile))
+    if cached is not None:
+        timing.ttft = time.perf_counter() - start
+        _log_timing(timing, start, cached[1])
+        if trace is not None:
+            trace.source = cached[1]
+        yield cached[0]
+        _remember(memory, question, profile, [cached[0]])
+        return
+
+    messages = build_messages(question, profile, context)
+    if trace is not None:
+        trace.built()
+    parts = []
+    try:
+        for delta in flights.stream(key, lambda: _generate(key, question, profile, messages, not context, trace),
+                                    scope):
+            if timing.ttft is None:
+                timing.ttft = time.perf_counter() - start
+            parts.append(delta)
+            yield delta
+    finally:
+        _log_timing(timing, start, "openai")
+    _remember(memory, question, profile, parts)
+
+
+def _traced(stream: Iterator[str], trace: telemetry.RequestTrace, timing: StreamTiming) -> Iterator[str]:
+    try:
+        yield from stream
+    except BaseException as e:
+        trace.failed(e)
+        raise
+    finally:
+        telemetry.finish_request(trace, timing.ttft, timing.total or time.perf_counter() - trace.start)
+
+
+# Ask OpenAI for Answer
+def ask_openai(question: str, profile: StudentProfile,
+               memory: Optional[ConversationMemory] = None) -> str:
+    return "".join(ask_openai_stream(question, profile, memory=memory)).strip()
+
+
+# Stream the answer without blocking the event loop
+def ask_openai_stream_async(question: str, profile: StudentProfile,
+                            timing: Optional[StreamTiming] = None,
+                            memory: Optional[ConversationMemory] = None,
+                            scope: Optional[CancelScope] = None) -> AsyncIterator[str]:
+    timing = timing if timing is not None else StreamTiming()
+    trace = telemetry.start_request(profile.Academic_Level, profile.Subject, MODEL_NAME)
+    stream = _answer_stream_async(question, profile, timing, memory, trace, scope)
+    return stream if trace is None else _traced_async(stream, trace, timing)
+
+
+async def _answer_stream_async(question: str, profile: StudentProfile, timing: StreamTiming,
+                               memory: Optional[ConversationMemory],
+                               trace: Optional[telemetry.RequestTrace],
+                               scope: Optional[CancelScope] = None) -> AsyncIterator[str]:
+    start = time.perf_counter()
+    context, key = _prepare(question, profile, memory)
+    prefetched = _prefetched(question, profile, memory)
+    # SQLite lookups are sub-millisecond local reads, cheap enough to run inline
+    cached = prefetched or (None if context else _lookup(key, question, profile))
+    if cached is not None:
+        timing.ttft = time.perf_counter() - start
+        _log_timing(timing, start, cached[1])
+        if trace is not None:
+            trace.source = cached[1]
+        yield cached[0]
+        _remember(memory, question, profile, [cached[0]])
+        return
+
+    messages = build_messages(question, profile, context)
+    if trace is not None:
+        trace.built()
+    parts = []
+    try:
+        async for delta in async_flights.stream(
+            key, lambda: _generate_async(key, question, profile, messages, not context, trace), scope
+        ):
+            if timing.ttft is None:
+                timing.ttft = time.perf_counter() - start
+            parts.append(delta)
+            yield delta
+    finally:
+        _log_timing(timing, start, "openai")
+    _remember(memory, question, profile, parts)
+
+
+async def _traced_async(stream: AsyncIterator[str], trace: telemetry.RequestTrace,
+                        timing: StreamTiming) -> AsyncIterator[str]:
+    try:
+        async for delta in stream:
+            yield delta
+    except BaseException as e:
+        trace.failed(e)
+        raise
+    finally:
+        await stream.aclose()
+        telemetry.finish_request(trace, timing.ttft, timing.total or time.perf_counter() - trace.start)
+
+
+# Ask OpenAI for Answer without blocking the event loop
+async def ask_openai_async(question: str, profile: StudentProfile,
+                           memory: Optional[ConversationMemory] = None) -> str:
+    parts = [delta async for delta in ask_openai_stream_async(question, profile, memory=memory)]
+    return "".join(parts).strip()
 
 
 def main():
+    prewarm()
     profile = collect_student_profile()
+    memory = ConversationMemory()
     print("\n📘 Student Profile:")
     print(json.dumps(asdict(profile), indent=2))
 
@@ -88,8 +801,10 @@ def main():
 
         if choice == "1":
             q = input("Enter your question: ")
-            ans = ask_openai(q, profile)
-            print("\n🧑‍🏫 Answer:", ans)
+            print("\n🧑‍🏫 Answer: ", end="", flush=True)
+            for delta in ask_openai_stream(q, profile, memory=memory):
+                print(delta, end="", flush=True)
+            print()
 
         elif choice == "2":
             profile.Subject = input("Enter new subject: ")
@@ -97,6 +812,7 @@ def main():
 
         elif choice == "3":
             profile = collect_student_profile()  # Fixed: Added parentheses
+            memory.clear()
             print("\n📘 Updated Student Profile:")
             print(json.dumps(asdict(profile), indent=2))
 
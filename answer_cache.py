@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# Exact-match answer cache: in-process LRU in front of a SQLite file that is
+# shared by every Streamlit / Chainlit worker on the machine and survives restarts.
+
+CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") != "0"
+CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(".cache", "answers.sqlite3"))
+CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MEMORY_SIZE = int(os.getenv("ANSWER_CACHE_MEMORY_SIZE", "1024"))
+CACHE_DISK_SIZE = int(os.getenv("ANSWER_CACHE_DISK_SIZE", "100000"))
+
+# Check the disk tier size every N writes (COUNT(*) is a table scan in SQLite)
+_EVICT_EVERY = 100
+
+_SPACES = re.compile(r"\s+")
+
+
+# "  What is  Photosynthesis?? " -> "what is photosynthesis"
+def normalize_question(question: str) -> str:
+    return _SPACES.sub(" ", question).strip().rstrip("?!. ").lower()
+
+
+# Student name and institution are deliberately not part of the key
+def cache_key(question: str, level: str, subject: str, model: str, prompt_version: str) -> str:
+    parts = [normalize_question(question), level, subject.strip().lower(), model, prompt_version]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, path: Optional[str] = CACHE_PATH, ttl: float = CACHE_TTL,
+                 memory_size: int = CACHE_MEMORY_SIZE, disk_size: int = CACHE_DISK_SIZE):
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if path:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT answer, expires FROM answers WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._db.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, answer: str) -> None:
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock:
+            self._remember(key, answer, expires)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, answer, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, answer, expires, now),
+            )
+            self._writes += 1
+            if self._writes % _EVICT_EVERY == 0:
+                self._evict(now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+
+    def stats(self) -> Dict[str, int]:
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    # Caller holds the lock
+    def _remember(self, key: str, answer: str, expires: float) -> None:
+        self._memory[key] = (answer, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    # Caller holds the lock: drop expired rows, then least recently used ones over the size limit
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM answers WHERE expires <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        if count > self.disk_size:
+            self._db.execute(
+                "DELETE FROM answers WHERE key IN "
+                "(SELECT key FROM answers ORDER BY accessed LIMIT ?)",
+                (count - self.disk_size,),
+            )
+
+
+# One cache per process
+@lru_cache(maxsize=None)
+def get_cache() -> Optional[AnswerCache]:
+    if not CACHE_ENABLED:
+        return None
+    return AnswerCache()
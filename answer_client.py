@@ -0,0 +1,250 @@
+import os
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Iterator, List, Optional
+
+from answer_protocol import (HAS_MSGPACK, JSON, MSGPACK, FrameReader, batch_body, codec_for, decode, encode,
+                             request_body)
+from cancellation import AnswerCancelled, CancelScope, abort_response
+from conversation_memory import ConversationMemory
+
+# How the web frontends get answers. With ANSWER_SERVICE_URL set (e.g.
+# http://127.0.0.1:8000) they are thin clients of answer_service, over one pooled
+# keep-alive connection per process; otherwise the answer is produced in-process by
+# ai_teacher_assistant as before. Either way the caller gets the same text deltas.
+#
+# Remote answers keep their conversation context on the service, keyed by `session`;
+# local ones use the `memory` passed in. AnswerHandle wraps either in an answer that can be
+# cancelled from anywhere.
+
+if TYPE_CHECKING:
+    import httpx
+    from ai_teacher_assistant import StudentProfile
+
+ANSWER_SERVICE_URL = os.getenv("ANSWER_SERVICE_URL", "").rstrip("/")
+REMOTE = bool(ANSWER_SERVICE_URL)
+SERVICE_TIMEOUT = float(os.getenv("ANSWER_SERVICE_TIMEOUT", "120"))
+# msgpack when both sides have it; set ANSWER_SERVICE_CODEC=json to force JSON
+CODEC = MSGPACK if HAS_MSGPACK and os.getenv("ANSWER_SERVICE_CODEC", "msgpack") == "msgpack" else JSON
+
+_prewarmed = threading.Event()
+
+
+class AnswerServiceError(RuntimeError):
+    pass
+
+
+def _headers() -> Dict[str, str]:
+    return {"content-type": CODEC, "accept": CODEC}
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+    return httpx.Limits(max_connections=int(os.getenv("ANSWER_SERVICE_MAX_CONNECTIONS", "100")),
+                        max_keepalive_connections=int(os.getenv("ANSWER_SERVICE_MAX_KEEPALIVE", "20")),
+                        keepalive_expiry=120)
+
+
+@lru_cache(maxsize=None)
+def get_service_client() -> "httpx.Client":
+    import httpx
+    return httpx.Client(base_url=ANSWER_SERVICE_URL, timeout=SERVICE_TIMEOUT, limits=_limits())
+
+
+@lru_cache(maxsize=None)
+def get_async_service_client() -> "httpx.AsyncClient":
+    import httpx
+    return httpx.AsyncClient(base_url=ANSWER_SERVICE_URL, timeout=SERVICE_TIMEOUT, limits=_limits())
+
+
+def _error(status: int, data: bytes, content_type: Optional[str]) -> AnswerServiceError:
+    try:
+        message = decode(data, codec_for(content_type)).get("error")
+    except (ValueError, AttributeError):
+        message = data[:200].decode("utf-8", "replace")
+    return AnswerServiceError(f"answer service returned {status}: {message}")
+
+
+# Text of a delta frame; None for the closing frame
+def _delta(frame: Dict) -> Optional[str]:
+    if "error" in frame:
+        raise AnswerServiceError(frame["error"])
+    return frame.get("d")
+
+
+def _truncated() -> AnswerServiceError:
+    return AnswerServiceError("answer stream ended before it was complete")
+
+
+# Open the connection (local: to OpenAI; remote: to the service) in the background,
+# once per process
+def prewarm() -> None:
+    if not REMOTE:
+        from ai_teacher_assistant import prewarm as prewarm_local
+        prewarm_local()
+        return
+    if not _prewarmed.is_set():
+        _prewarmed.set()
+        threading.Thread(target=_ping, daemon=True).start()
+
+
+def _ping() -> None:
+    try:
+        get_service_client().get("/healthz")
+    except Exception:
+        pass
+
+
+async def prewarm_async() -> None:
+    if not REMOTE:
+        from ai_teacher_assistant import prewarm_async as prewarm_local
+        await prewarm_local()
+        return
+    if _prewarmed.is_set():
+        return
+    _prewarmed.set()
+    try:
+        await get_async_service_client().get("/healthz")
+    except Exception:
+        pass
+
+
+def stream_answer(question: str, profile: "StudentProfile", session: Optional[str] = None,
+                  memory: Optional[ConversationMemory] = None, scope: Optional[CancelScope] = None) -> Iterator[str]:
+    if not REMOTE:
+        from ai_teacher_assistant import ask_openai_stream
+        return ask_openai_stream(question, profile, memory=memory, scope=scope)
+    return _remote_stream(question, profile, session, scope)
+
+
+# Cancelling drops the connection to the service, which then cancels the answer there
+def _remote_stream(question: str, profile: "StudentProfile", session: Optional[str],
+                   scope: Optional[CancelScope] = None) -> Iterator[str]:
+    body = encode(request_body(question, profile, session), CODEC)
+    with get_service_client().stream("POST", "/v1/stream", content=body, headers=_headers()) as response:
+        unregister = scope.on_cancel(lambda: abort_response(response)) if scope is not None else None
+        try:
+            content_type = response.headers.get("content-type")
+            if response.status_code != 200:
+                raise _error(response.status_code, response.read(), content_type)
+            reader, ended = FrameReader(codec_for(content_type)), False
+            for chunk in response.iter_bytes():
+                for frame in reader.feed(chunk):
+                    delta = _delta(frame)
+                    if delta is None:
+                        ended = True
+                    else:
+                        yield delta
+            if not ended:
+                raise _truncated()
+        except Exception:
+            if scope is not None:
+                scope.check()
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
+
+
+def stream_answer_async(question: str, profile: "StudentProfile", session: Optional[str] = None,
+                        memory: Optional[ConversationMemory] = None,
+                        scope: Optional[CancelScope] = None) -> AsyncIterator[str]:
+    if not REMOTE:
+        from ai_teacher_assistant import ask_openai_stream_async
+        return ask_openai_stream_async(question, profile, memory=memory, scope=scope)
+    return _remote_stream_async(question, profile, session, scope)
+
+
+async def _remote_stream_async(question: str, profile: "StudentProfile", session: Optional[str],
+                               scope: Optional[CancelScope] = None) -> AsyncIterator[str]:
+    body = encode(request_body(question, profile, session), CODEC)
+    async with get_async_service_client().stream("POST", "/v1/stream", content=body,
+                                                 headers=_headers()) as response:
+        unregister = scope.on_cancel(lambda: abort_response(response)) if scope is not None else None
+        try:
+            content_type = response.headers.get("content-type")
+            if response.status_code != 200:
+                raise _error(response.status_code, await response.aread(), content_type)
+            reader, ended = FrameReader(codec_for(content_type)), False
+            async for chunk in response.aiter_bytes():
+                for frame in reader.feed(chunk):
+                    delta = _delta(frame)
+                    if delta is None:
+                        ended = True
+                    else:
+                        yield delta
+            if not ended:
+                raise _truncated()
+        except Exception:
+            if scope is not None:
+                scope.check()
+            raise
+        finally:
+            if unregister is not None:
+                unregister()
+
+
+# One answer in progress. Iterate it (for / async for) to get the text deltas; cancel()
+# from any thread or task ends the iteration early and stops the upstream request. A
+# cancelled answer is not added to the conversation memory; check `cancelled` before
+# saving the text.
+class AnswerHandle:
+    def __init__(self, question: str, profile: "StudentProfile", session: Optional[str] = None,
+                 memory: Optional[ConversationMemory] = None):
+        self.question = question
+        self.profile = profile
+        self.session = session
+        self.memory = memory
+        self.scope = CancelScope()
+        self.finished = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self.scope.cancelled
+
+    def cancel(self) -> None:
+        self.scope.cancel()
+
+    def __iter__(self) -> Iterator[str]:
+        stream = stream_answer(self.question, self.profile, self.session, self.memory, self.scope)
+        try:
+            yield from stream
+        except AnswerCancelled:
+            pass
+        finally:
+            stream.close()
+            self.finished = True
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        stream = stream_answer_async(self.question, self.profile, self.session, self.memory, self.scope)
+        try:
+            async for delta in stream:
+                yield delta
+        except AnswerCancelled:
+            pass
+        finally:
+            await stream.aclose()
+            self.finished = True
+
+
+def _post(path: str, payload: Dict) -> Dict:
+    response = get_service_client().post(path, content=encode(payload, CODEC), headers=_headers())
+    content_type = response.headers.get("content-type")
+    if response.status_code != 200:
+        raise _error(response.status_code, response.content, content_type)
+    return decode(response.content, codec_for(content_type))
+
+
+def ask(question: str, profile: "StudentProfile", session: Optional[str] = None,
+        memory: Optional[ConversationMemory] = None) -> str:
+    if not REMOTE:
+        from ai_teacher_assistant import ask_openai
+        return ask_openai(question, profile, memory=memory)
+    return _post("/v1/ask", request_body(question, profile, session))["answer"]
+
+
+# Many independent questions in one round trip: [{"answer"} | {"error"}] in input order
+def ask_batch(requests: List[Dict]) -> List[Dict]:
+    if not REMOTE:
+        raise AnswerServiceError("ask_batch needs ANSWER_SERVICE_URL")
+    return _post("/v1/batch", batch_body(requests))["results"]
@@ -0,0 +1,206 @@
+import os
+import mmap
+import json
+import time
+import struct
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Precomputed answer packs: answers to the questions we know in advance (see build_pack),
+# in a read-only file that is memory-mapped, so a lookup is a hash probe into the page
+# cache. Every worker process maps the same file and shares its pages through the OS;
+# nothing is parsed or copied at startup.
+#
+# Layout (little-endian): header, metadata JSON, index, records.
+#   header   magic, format version, entries, slots, index offset, metadata length
+#   index    `slots` (hash, record offset) pairs, open addressing with linear probing;
+#            offset 0 marks an empty slot (the header is there)
+#   record   32-byte key digest, answer length, UTF-8 answer
+# Keys are the answer cache keys (sha256 of question, level, subject, model and prompt
+# version), so a pack only matches the model and prompt it was built with.
+#
+# Packs are the *.pack files in ANSWER_PACK_DIR, looked up in name order. The directory
+# is checked every ANSWER_PACK_CHECK_INTERVAL seconds: replacing a file (build_pack
+# writes a temporary file and renames it), adding or removing one takes effect without a
+# restart. Readers still holding the old mapping finish with it.
+
+logger = logging.getLogger(__name__)
+
+ANSWER_PACK_DIR = os.getenv("ANSWER_PACK_DIR", os.path.join(".cache", "packs"))
+ANSWER_PACK_CHECK_INTERVAL = float(os.getenv("ANSWER_PACK_CHECK_INTERVAL", "2.0"))
+
+MAGIC = b"ANSPACK\x00"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQ")
+_SLOT = struct.Struct("<QQ")
+_LENGTH = struct.Struct("<I")
+_DIGEST = 32
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+# entries: cache key (sha256 hex) -> answer. Written next to `path` and renamed over it,
+# so readers never see a partial file.
+def write_pack(path: str, entries: Dict[str, str], meta: Dict) -> None:
+    meta_bytes = json.dumps({**meta, "entries": len(entries)}).encode("utf-8")
+    slots = 1 << max(3, (2 * len(entries) - 1).bit_length())
+    index_offset = _align(_HEADER.size + len(meta_bytes))
+    index = bytearray(slots * _SLOT.size)
+    records = bytearray()
+    data_offset = index_offset + len(index)
+    for key, answer in entries.items():
+        digest = bytes.fromhex(key)
+        h = int.from_bytes(digest[:8], "little")
+        slot = h & (slots - 1)
+        while _SLOT.unpack_from(index, slot * _SLOT.size)[1]:
+            slot = (slot + 1) & (slots - 1)
+        _SLOT.pack_into(index, slot * _SLOT.size, h, data_offset + len(records))
+        encoded = answer.encode("utf-8")
+        records += digest + _LENGTH.pack(len(encoded)) + encoded
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(entries), slots, index_offset, len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(b"\0" * (index_offset - _HEADER.size - len(meta_bytes)))
+        f.write(index)
+        f.write(records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class AnswerPack:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path}: not an answer pack")
+        magic, version, self.entries, slots, self._index, meta_length = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not an answer pack")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: pack format {version}, expected {FORMAT_VERSION}")
+        if len(self._map) < self._index + slots * _SLOT.size:
+            raise ValueError(f"{path}: truncated pack")
+        self._mask = slots - 1
+        self.meta = json.loads(self._map[_HEADER.size:_HEADER.size + meta_length])
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            digest = bytes.fromhex(key)
+        except ValueError:
+            return None
+        h = int.from_bytes(digest[:8], "little")
+        data, slot = self._map, h & self._mask
+        while True:
+            stored, offset = _SLOT.unpack_from(data, self._index + slot * _SLOT.size)
+            if not offset:
+                return None
+            if stored == h and data[offset:offset + _DIGEST] == digest:
+                (length,) = _LENGTH.unpack_from(data, offset + _DIGEST)
+                start = offset + _DIGEST + _LENGTH.size
+                return data[start:start + length].decode("utf-8")
+            slot = (slot + 1) & self._mask
+
+    def close(self) -> None:
+        self._map.close()
+
+
+# Identity of the file at `path`: a rename over it changes the inode
+def _signature(path: str) -> Tuple[int, int, int]:
+    st = os.stat(path)
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class PackSet:
+    def __init__(self, directory: str, namespace: str, check_interval: float = ANSWER_PACK_CHECK_INTERVAL):
+        self.directory = directory
+        self.namespace = namespace
+        self.check_interval = check_interval
+        self._packs: List[AnswerPack] = []
+        self._loaded: Dict[str, Tuple[Tuple[int, int, int], Optional[AnswerPack]]] = {}
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.swaps = 0
+
+    def get(self, key: str) -> Optional[str]:
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        for pack in self._packs:
+            answer = pack.get(key)
+            if answer is not None:
+                self.hits += 1
+                return answer
+        self.misses += 1
+        return None
+
+    # Pick up added, replaced and removed pack files. One thread rescans at a time; the
+    # others keep using the current packs meanwhile.
+    def refresh(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                names = sorted(n for n in os.listdir(self.directory) if n.endswith(".pack"))
+            except FileNotFoundError:
+                names = []
+            loaded: Dict[str, Tuple[Tuple[int, int, int], Optional[AnswerPack]]] = {}
+            for name in names:
+                path = os.path.join(self.directory, name)
+                try:
+                    signature = _signature(path)
+                except FileNotFoundError:
+                    continue
+                previous = self._loaded.get(path)
+                if previous is not None and previous[0] == signature:
+                    loaded[path] = previous
+                    continue
+                loaded[path] = (signature, self._open(path))
+                if previous is not None:
+                    self.swaps += 1
+            if loaded != self._loaded:
+                self._loaded = loaded
+                self._packs = [pack for _, pack in loaded.values() if pack is not None]
+        finally:
+            self._lock.release()
+
+    # A pack that cannot be used is remembered as None, so it is not retried until it changes
+    def _open(self, path: str) -> Optional[AnswerPack]:
+        try:
+            pack = AnswerPack(path)
+        except (OSError, ValueError) as e:
+            logger.warning("answer pack skipped: %s", e)
+            return None
+        if pack.meta.get("namespace") != self.namespace:
+            logger.warning("answer pack %s skipped: built for %s, serving %s", path, pack.meta.get("namespace"),
+                           self.namespace)
+            return None
+        logger.info("answer pack %s loaded: version %s, %d answers", path, pack.meta.get("version"), pack.entries)
+        return pack
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "swaps": self.swaps,
+            "packs": [{"file": os.path.basename(p.path), "version": p.meta.get("version"), "entries": p.entries}
+                      for p in self._packs],
+        }
+
+
+# One pack set per (model, prompt version) namespace per process; None when disabled
+@lru_cache(maxsize=None)
+def get_packs(namespace: str) -> Optional[PackSet]:
+    if not ANSWER_PACK_DIR:
+        return None
+    return PackSet(ANSWER_PACK_DIR, namespace)
@@ -0,0 +1,83 @@
+import importlib.util
+from typing import Any, Dict, Iterator, List, Optional
+
+from codec import dumps, loads
+
+# Wire format shared by answer_service and answer_client.
+#
+#   POST /v1/ask      {"question", "class", "subject", "session"?} -> {"answer"}
+#   POST /v1/stream   same request -> a stream of frames {"d": delta} ... {"end": {...}}
+#                     or {"error": message}
+#   POST /v1/batch    {"items": [request, ...]} -> {"results": [{"answer"} | {"error"}, ...]}
+#   GET  /v1/stats    usage, limiter, router and hedge counters of the worker that answers
+#   GET  /healthz
+#
+# Bodies are compact JSON (stream frames one per line) or, when the msgpack package is
+# installed and the client asks for it, msgpack (stream frames back to back). Only the
+# Class and Subject travel (the service derives the Academic_Level from the Class): the
+# name and institution never leave the UI.
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+
+HAS_MSGPACK = importlib.util.find_spec("msgpack") is not None
+
+
+def codec_for(content_type: Optional[str]) -> str:
+    return MSGPACK if content_type and "msgpack" in content_type else JSON
+
+
+def stream_type(codec: str) -> str:
+    return MSGPACK if codec == MSGPACK else NDJSON
+
+
+def encode(obj: Any, codec: str = JSON) -> bytes:
+    if codec == MSGPACK:
+        import msgpack
+        return msgpack.packb(obj, use_bin_type=True)
+    return dumps(obj)
+
+
+def decode(data: bytes, codec: str = JSON) -> Any:
+    if codec == MSGPACK:
+        import msgpack
+        return msgpack.unpackb(data, raw=False)
+    return loads(data)
+
+
+# One stream frame on the wire
+def encode_frame(frame: Dict, codec: str = JSON) -> bytes:
+    return encode(frame, codec) if codec == MSGPACK else encode(frame) + b"\n"
+
+
+# Incremental decoder: feed response chunks, get the complete frames they finish
+class FrameReader:
+    def __init__(self, codec: str = JSON):
+        self.codec = codec
+        self._buffer = b""
+        if codec == MSGPACK:
+            import msgpack
+            self._unpacker = msgpack.Unpacker(raw=False)
+
+    def feed(self, chunk: bytes) -> Iterator[Dict]:
+        if self.codec == MSGPACK:
+            self._unpacker.feed(chunk)
+            yield from self._unpacker
+            return
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b"\n")
+        for line in lines:
+            if line:
+                yield loads(line)
+
+
+def request_body(question: str, profile, session: Optional[str] = None) -> Dict:
+    body = {"question": question, "class": profile.Class, "subject": profile.Subject}
+    if session:
+        body["session"] = session
+    return body
+
+
+def batch_body(items: List[Dict]) -> Dict:
+    return {"items": items}
@@ -0,0 +1,284 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ai_teacher_assistant import (StudentProfile, StreamTiming, answer_packs, ask_openai_stream_async,
+                                  get_academic_level, hedge, prewarm_async, router, speculation, usage_stats)
+from answer_protocol import codec_for, decode, encode, encode_frame, stream_type
+from cancellation import AnswerCancelled, CancelScope
+from conversation_memory import ConversationMemory
+from rate_limiter import limiter
+from session_store import RECENT_WINDOW, get_store
+
+# Answer service: one place that holds the OpenAI connection pool, rate limiter, answer
+# cache and conversation memory for every web frontend. A plain ASGI app (no framework),
+# served by uvicorn:
+#
+#   python answer_service.py --workers 4 --port 8000
+#
+# and used by the UIs through answer_client (set ANSWER_SERVICE_URL). The web processes
+# and the answer workers then scale separately. Protocol: see answer_protocol.
+#
+# Conversation memory is kept per session id in the worker that answers. Turns are
+# persisted by the frontends in the shared session store, so a worker that sees a session
+# for the first time, or whose copy is behind the store, reloads it from there.
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = int(os.getenv("SERVICE_MAX_BODY", str(4 * 1024 * 1024)))
+MAX_BATCH = int(os.getenv("SERVICE_MAX_BATCH", "1000"))
+# Conversation memories kept per worker (least recently used dropped first)
+MAX_SESSIONS = int(os.getenv("SERVICE_MAX_SESSIONS", "10000"))
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class SessionMemories:
+    def __init__(self, capacity: int = MAX_SESSIONS):
+        self.capacity = capacity
+        # session id -> (memory, turns of that session the memory has seen)
+        self._sessions: "OrderedDict[str, Tuple[ConversationMemory, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # The store reads run on a worker thread, so the event loop keeps serving other
+    # streams and a batch reads its sessions concurrently
+    async def get(self, session_id: str) -> ConversationMemory:
+        entry = self._sessions.get(session_id)
+        stored, turns = await asyncio.to_thread(_read_session, session_id, entry[1] if entry else None)
+        entry = self._sessions.get(session_id)
+        if turns is not None or entry is None:
+            memory = ConversationMemory()
+            memory.seed(reversed(turns or []))
+            entry = (memory, stored)
+        self._sessions[session_id] = entry
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.capacity:
+            self._sessions.popitem(last=False)
+        return entry[0]
+
+    # The frontend persists the turn just answered: expect one more in the store
+    def answered(self, session_id: str) -> None:
+        entry = self._sessions.get(session_id)
+        if entry is not None:
+            self._sessions[session_id] = (entry[0], entry[1] + 1)
+
+
+sessions = SessionMemories()
+
+
+# Stored turn count of a session, and its recent turns when the count is not the one seen
+def _read_session(session_id: str, seen: Optional[int]) -> Tuple[int, Optional[List[Dict]]]:
+    store = get_store()
+    stored = store.count_turns(session_id)
+    if stored == seen:
+        return stored, None
+    return stored, store.turns_before(session_id, None, RECENT_WINDOW)
+
+
+def parse_request(body: Dict) -> Tuple[str, StudentProfile, Optional[str]]:
+    if not isinstance(body, dict):
+        raise BadRequest("request body must be an object")
+    question = str(body.get("question") or "").strip()
+    if not question:
+        raise BadRequest("question is required")
+    missing = [k for k in ("class", "subject") if body.get(k) in (None, "")]
+    if missing:
+        raise BadRequest(f"missing field(s): {', '.join(missing)}")
+    try:
+        class_num = int(body["class"])
+    except (TypeError, ValueError):
+        raise BadRequest("class must be a number") from None
+    # The level is derived here, as in every frontend: a client-supplied one would go
+    # straight into the prompt, the cache key and the metric labels
+    profile = StudentProfile("", "", get_academic_level(class_num), class_num, str(body["subject"]))
+    return question, profile, body.get("session") or None
+
+
+async def _stream(question: str, profile: StudentProfile, session: Optional[str], timing: StreamTiming,
+                  scope: Optional[CancelScope] = None):
+    memory = await sessions.get(session) if session else None
+    return ask_openai_stream_async(question, profile, timing=timing, memory=memory, scope=scope)
+
+
+async def answer(body: Dict) -> Dict:
+    question, profile, session = parse_request(body)
+    parts = [delta async for delta in await _stream(question, profile, session, StreamTiming())]
+    if session:
+        sessions.answered(session)
+    return {"answer": "".join(parts).strip()}
+
+
+def stats() -> Dict:
+    packs = answer_packs()
+    return {"pid": os.getpid(), "usage": usage_stats.snapshot(), "limiter": limiter.stats(),
+            "router": router.stats.snapshot(), "hedge": hedge.snapshot(), "sessions": len(sessions),
+            "packs": packs.stats() if packs is not None else None,
+            "prefetch": speculation.snapshot() if speculation is not None else None}
+
+
+async def _read_body(receive) -> bytes:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("client disconnected")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise BadRequest("request body too large")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _respond(send, status: int, obj: Dict, codec: str) -> None:
+    body = encode(obj, codec)
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", codec.encode()), (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _wait_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _stream_response(send, receive, body: Dict, codec: str) -> None:
+    question, profile, session = parse_request(body)
+    timing = StreamTiming()
+    start = time.perf_counter()
+    scope = CancelScope()
+    stream = await _stream(question, profile, session, timing, scope)
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", stream_type(codec).encode())]})
+    # Stop generating (and release the upstream request) as soon as the client goes away,
+    # even while still waiting for the first token
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    disconnected.add_done_callback(lambda _: scope.cancel())
+    try:
+        try:
+            async for delta in stream:
+                if disconnected.done():
+                    return
+                await send({"type": "http.response.body", "body": encode_frame({"d": delta}, codec),
+                            "more_body": True})
+            end = {"ttft": timing.ttft, "total": time.perf_counter() - start}
+            frame = {"end": end}
+            if session:
+                sessions.answered(session)
+        except AnswerCancelled:
+            return
+        except Exception as e:
+            logger.warning("stream failed: %s", e)
+            frame = {"error": f"{type(e).__name__}: {e}"}
+        await send({"type": "http.response.body", "body": encode_frame(frame, codec)})
+    finally:
+        disconnected.cancel()
+        await stream.aclose()
+
+
+async def _batch(body: Dict) -> Dict:
+    items = body.get("items") if isinstance(body, dict) else None
+    if not isinstance(items, list):
+        raise BadRequest("items must be a list")
+    if len(items) > MAX_BATCH:
+        raise BadRequest(f"at most {MAX_BATCH} items per batch")
+
+    async def one(item) -> Dict:
+        try:
+            return await answer(item)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    return {"results": await asyncio.gather(*(one(item) for item in items))}
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await prewarm_async()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    headers = dict(scope["headers"])
+    request_codec = codec_for(headers.get(b"content-type", b"").decode())
+    accept = headers.get(b"accept", b"").decode()
+    codec = codec_for(accept) if accept and accept != "*/*" else request_codec
+    method, path = scope["method"], scope["path"]
+
+    if method == "GET" and path == "/healthz":
+        await _respond(send, 200, {"ok": True}, codec)
+        return
+    if method == "GET" and path == "/v1/stats":
+        await _respond(send, 200, stats(), codec)
+        return
+    if path not in ("/v1/ask", "/v1/stream", "/v1/batch"):
+        await _respond(send, 404, {"error": f"no route {path}"}, codec)
+        return
+    if method != "POST":
+        await _respond(send, 405, {"error": "use POST"}, codec)
+        return
+
+    try:
+        body = decode(await _read_body(receive), request_codec)
+        if path == "/v1/stream":
+            await _stream_response(send, receive, body, codec)
+        elif path == "/v1/ask":
+            await _respond(send, 200, await answer(body), codec)
+        else:
+            await _respond(send, 200, await _batch(body), codec)
+    except ConnectionError:
+        return
+    except (BadRequest, ValueError) as e:
+        await _respond(send, 400, {"error": str(e)}, codec)
+    except Exception as e:
+        logger.exception("answer failed")
+        await _respond(send, 502, {"error": f"{type(e).__name__}: {e}"}, codec)
+
+
+# Each worker has its own limiter: split the process-wide quotas between them
+def split_quotas(workers: int) -> None:
+    for name, default in (("OPENAI_RPM_LIMIT", "500"), ("OPENAI_TPM_LIMIT", "200000"),
+                          ("MAX_CONCURRENCY", "32")):
+        total = float(os.getenv(name, default))
+        os.environ[name] = str(max(int(total // workers), 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer service for the web frontends")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", "1")))
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("answer_service needs uvicorn: pip install uvicorn")
+    if args.workers > 1:
+        split_quotas(args.workers)
+    uvicorn.run("answer_service:app", host=args.host, port=args.port, workers=args.workers,
+                log_level=os.getenv("SERVICE_LOG_LEVEL", "warning"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import os
+import csv
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Iterator, Tuple
+
+from ai_teacher_assistant import StudentProfile, get_academic_level, ask_openai_async, usage_stats
+
+# Answer a whole question file for many students.
+#
+#   python batch_answer.py questions.csv answers.jsonl --concurrency 16
+#
+# Each input row (CSV header or JSONL object) has Student_Name, Academic_Name, Class,
+# Subject and question. Answers are written to the output JSONL in input order, one
+# line per row, so the output file doubles as the checkpoint: re-running the same
+# command after a crash skips the rows that were already written.
+
+PROFILE_FIELDS = ("Student_Name", "Academic_Name", "Class", "Subject")
+
+
+def read_rows(path: str) -> Iterator[Dict[str, str]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_profile(row: Dict[str, str]) -> StudentProfile:
+    missing = [name for name in PROFILE_FIELDS + ("question",) if not str(row.get(name, "")).strip()]
+    if missing:
+        raise ValueError(f"missing field(s): {', '.join(missing)}")
+    class_num = int(row["Class"])
+    return StudentProfile(
+        Student_Name=str(row["Student_Name"]).strip(),
+        Academic_Name=str(row["Academic_Name"]).strip(),
+        Academic_Level=get_academic_level(class_num),
+        Class=class_num,
+        Subject=str(row["Subject"]).strip(),
+    )
+
+
+# Number of complete lines already in the output; a torn last line is cut off
+def resume_point(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+        return data.count(b"\n", 0, end)
+
+
+async def answer_row(index: int, row: Dict[str, str]) -> Dict:
+    result = {"index": index, **row}
+    try:
+        profile = build_profile(row)
+        result["Academic_Level"] = profile.Academic_Level
+        result["answer"] = await ask_openai_async(row["question"], profile)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+class Progress:
+    def __init__(self, every: int):
+        self.every = every
+        self.done = 0
+        self.errors = 0
+        self.start = time.perf_counter()
+        self.usage_start = usage_stats.snapshot()
+
+    def report(self, final: bool = False) -> Dict:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        usage = usage_stats.snapshot()
+        tokens = sum(usage[k] - self.usage_start[k] for k in ("prompt_tokens", "completion_tokens"))
+        stats = {
+            "answered": self.done,
+            "errors": self.errors,
+            "api_requests": usage["requests"] - self.usage_start["requests"],
+            "elapsed_s": round(elapsed, 2),
+            "questions_per_s": round(self.done / elapsed, 2),
+            "tokens_per_s": round(tokens / elapsed, 1),
+            "cached_prompt_tokens": usage["cached_prompt_tokens"] - self.usage_start["cached_prompt_tokens"],
+        }
+        label = "done" if final else "progress"
+        print(f"[{label}] " + json.dumps(stats), file=sys.stderr, flush=True)
+        return stats
+
+    def add(self, result: Dict) -> None:
+        self.done += 1
+        self.errors += "error" in result
+        if self.every and self.done % self.every == 0:
+            self.report()
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = 8,
+                    report_every: int = 100) -> Dict:
+    skip = resume_point(output_path)
+    if skip:
+        print(f"Resuming after {skip} already answered row(s)", file=sys.stderr)
+
+    queue: "asyncio.Queue[Tuple[int, Dict] | None]" = asyncio.Queue(maxsize=concurrency * 2)
+    # Rows read but not yet written; bounds the reorder buffer when one row is slow
+    window = asyncio.Semaphore(concurrency * 4)
+    finished: Dict[int, Dict] = {}
+    expected = skip
+    progress = Progress(report_every)
+
+    async def produce():
+        for index, row in enumerate(read_rows(input_path)):
+            if index < skip:
+                continue
+            await window.acquire()
+            await queue.put((index, row))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    # Write every result that is next in input order
+    def flush(out):
+        nonlocal expected
+        while expected in finished:
+            result = finished.pop(expected)
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            progress.add(result)
+            if progress.done % 100 == 0:
+                os.fsync(out.fileno())
+            window.release()
+            expected += 1
+
+    async def work(out):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, row = item
+            finished[index] = await answer_row(index, row)
+            flush(out)
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(work(out)) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            out.flush()
+            os.fsync(out.fileno())
+
+    return progress.report(final=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL/CSV file of student questions in bulk.")
+    parser.add_argument("input", help="questions file (.jsonl or .csv)")
+    parser.add_argument("output", help="answers file (.jsonl); re-run with the same path to resume")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions answered at once")
+    parser.add_argument("--report-every", type=int, default=100, help="print throughput every N rows (0 = only at the end)")
+    args = parser.parse_args()
+    asyncio.run(run_batch(args.input, args.output, args.concurrency, args.report_every))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# Lookup cost, page sharing and hot swap of precomputed answer packs (answer_pack).
+#
+#   python -m benchmarks.bench_answer_pack --entries 100000 --workers 4
+#
+# Builds a pack of synthetic answers (no API calls) in a temporary directory, then reports:
+#   lookup       per-lookup time for pack hits and misses, and for SQLite answer-cache
+#                disk hits (the next tier) on the same keys
+#   ask          a pack hit through the whole ask_openai path, and the API requests made
+#   workers      `workers` processes map the pack and touch every page: the resident and
+#                proportional (PSS) size of the mapping per process. PSS ~ RSS / workers
+#                means the pages are shared (Linux only)
+#   hot_swap     a new pack version renamed over the file while a thread reads it: time
+#                until the new answers are served, and lookups that failed meanwhile
+# Prints one JSON object per section.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import Dict, List, Optional
+
+from answer_cache import AnswerCache, cache_key
+from benchmarks.bench_end_to_end import percentile
+
+LEVELS = ("Primary", "Middle", "Matric", "Intermediate")
+SUBJECTS = ("Science", "Physics", "Chemistry", "Biology", "Mathematics", "English", "History", "Geography")
+ANSWER = ("Photosynthesis is how green plants make their own food. Leaves take in carbon dioxide from the air "
+          "and water from the roots, and use the energy of sunlight to turn them into glucose and oxygen. ")
+
+
+def question(n: int) -> str:
+    return f"Explain syllabus topic {n} with an example"
+
+
+def pack_entries(count: int, namespace: str, prompt_version: str, tag: str = "") -> Dict[str, str]:
+    model = namespace.rsplit("-v", 1)[0]
+    return {cache_key(question(n), LEVELS[n % len(LEVELS)], SUBJECTS[n % len(SUBJECTS)], model, prompt_version):
+            f"{tag}{ANSWER * (1 + n % 6)}" for n in range(count)}
+
+
+def timed_us(lookup, keys: List[str]) -> Dict[str, float]:
+    samples = []
+    for key in keys:
+        start = time.perf_counter()
+        lookup(key)
+        samples.append(time.perf_counter() - start)
+    return {"p50_us": round(percentile(samples, 50) * 1e6, 2), "p99_us": round(percentile(samples, 99) * 1e6, 2),
+            "mean_us": round(sum(samples) / len(samples) * 1e6, 2)}
+
+
+def bench_lookup(path: str, keys: List[str], lookups: int, directory: str) -> dict:
+    from answer_pack import AnswerPack
+
+    pack = AnswerPack(path)
+    hits = random.Random(1).choices(keys, k=lookups)
+    misses = [cache_key(f"unknown question {n}", "Matric", "Physics", "m", "0") for n in range(lookups)]
+    cache = AnswerCache(os.path.join(directory, "answers.sqlite3"), memory_size=1)
+    for key in hits:
+        cache.put(key, pack.get(key))
+    return {"section": "lookup", "entries": pack.entries, "pack_bytes": os.path.getsize(path),
+            "pack_hit": timed_us(pack.get, hits), "pack_miss": timed_us(pack.get, misses),
+            "sqlite_cache_hit": timed_us(cache.get, hits[::-1])}
+
+
+def bench_ask(core, lookups: int, entries: int) -> dict:
+    profile = core.StudentProfile("Bench", "Mock School", "", 0, "")
+    samples, before = [], core.usage_stats.snapshot()["requests"]
+    for n in range(lookups):
+        n %= entries
+        profile.Academic_Level, profile.Subject = LEVELS[n % len(LEVELS)], SUBJECTS[n % len(SUBJECTS)]
+        start = time.perf_counter()
+        answer = core.ask_openai(question(n), profile)
+        samples.append(time.perf_counter() - start)
+        assert answer, n
+    return {"section": "ask", "answers": lookups,
+            "p50_us": round(percentile(samples, 50) * 1e6, 2), "p99_us": round(percentile(samples, 99) * 1e6, 2),
+            "api_requests": core.usage_stats.snapshot()["requests"] - before,
+            "packs": core.answer_packs().stats()}
+
+
+# Resident and proportional size (kB) of the mapping of `path` in this process
+def mapping_kb(path: str) -> Optional[Dict[str, int]]:
+    try:
+        with open("/proc/self/smaps") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    sizes, inside = {"rss_kb": 0, "pss_kb": 0}, False
+    for line in lines:
+        fields = line.split()
+        if "-" in fields[0] and len(fields) >= 5:
+            inside = fields[-1] == path
+        elif inside and fields[0] in ("Rss:", "Pss:"):
+            sizes[fields[0][:-1].lower() + "_kb"] += int(fields[1])
+    return sizes
+
+
+def worker(path: str) -> None:
+    from answer_pack import AnswerPack
+
+    pack = AnswerPack(path)
+    # Touch every page, as a busy worker eventually does
+    data = pack._map
+    total = sum(data[i] for i in range(0, len(data), 4096))
+    print(json.dumps({"ready": total >= 0}), flush=True)
+    sys.stdin.readline()
+    print(json.dumps({"pid": os.getpid(), **(mapping_kb(os.path.realpath(path)) or {})}), flush=True)
+
+
+def bench_workers(path: str, workers: int) -> dict:
+    procs = [subprocess.Popen([sys.executable, "-m", "benchmarks.bench_answer_pack", "--worker", path],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    for proc in procs:
+        proc.stdout.readline()
+    # Measure while every worker still has the pack mapped
+    for proc in procs:
+        proc.stdin.write("\n")
+        proc.stdin.flush()
+    results = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+        proc.wait()
+    return {"section": "workers", "workers": workers, "pack_kb": os.path.getsize(path) // 1024,
+            "per_worker": results}
+
+
+def bench_hot_swap(path: str, namespace: str, entries: int, interval: float) -> dict:
+    from answer_pack import PackSet, write_pack
+
+    packs = PackSet(os.path.dirname(path), namespace, check_interval=interval)
+    keys = list(pack_entries(entries, namespace, namespace.rsplit("-v", 1)[1]))
+    stop, failures, lookups, seen = threading.Event(), [0], [0], {}
+
+    def reader():
+        n = 0
+        while not stop.is_set():
+            answer = packs.get(keys[n % len(keys)])
+            lookups[0] += 1
+            if answer is None:
+                failures[0] += 1
+            elif answer.startswith("v2 ") and "v2" not in seen:
+                seen["v2"] = time.perf_counter()
+            n += 1
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    time.sleep(0.2)
+    write_pack(path, pack_entries(entries, namespace, namespace.rsplit("-v", 1)[1], "v2 "),
+               {"version": "v2", "namespace": namespace})
+    swapped = time.perf_counter()
+    deadline = swapped + interval * 5 + 1
+    while "v2" not in seen and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    stop.set()
+    thread.join()
+    return {"section": "hot_swap", "check_interval_s": interval,
+            "new_version_after_ms": round((seen["v2"] - swapped) * 1e3, 1) if "v2" in seen else None,
+            "lookups": lookups[0], "failed_lookups": failures[0], "packs": packs.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lookup time, page sharing and hot swap of answer packs")
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--swap-interval", type=float, default=0.1, help="pack directory check interval (s)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker)
+        return
+
+    directory = tempfile.mkdtemp(prefix="answer-pack-bench-")
+    os.environ.update(ANSWER_PACK_DIR=directory, ANSWER_CACHE="0", OPENAI_API_KEY="unused")
+    import ai_teacher_assistant as core
+    from answer_pack import write_pack
+
+    namespace = f"{core.router.namespace}-v{core.PROMPT_VERSION}"
+    path = os.path.join(directory, "syllabus.pack")
+    entries = pack_entries(args.entries, namespace, core.PROMPT_VERSION)
+    start = time.perf_counter()
+    write_pack(path, entries, {"version": "v1", "namespace": namespace})
+    print(json.dumps({"section": "build", "entries": len(entries), "pack_bytes": os.path.getsize(path),
+                      "build_s": round(time.perf_counter() - start, 3)}), flush=True)
+    print(json.dumps(bench_lookup(path, list(entries), args.lookups, directory)), flush=True)
+    print(json.dumps(bench_ask(core, args.lookups, args.entries)), flush=True)
+    print(json.dumps(bench_workers(path, args.workers)), flush=True)
+    print(json.dumps(bench_hot_swap(path, namespace, args.entries, args.swap_interval)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# Load test of the answer service (answer_service.py): throughput and latency as the
+# number of uvicorn workers grows, offline, against the local mock OpenAI server.
+#
+#   python -m benchmarks.bench_answer_service --workers 1,2,4 --requests 2000 --concurrency 64
+#
+# For each worker count a fresh service is started (answer cache off, so every request
+# reaches the mock; quotas high enough that the client-side limiter is not the
+# bottleneck) and --requests distinct questions are streamed through /v1/stream by
+# --concurrency keep-alive connections. Prints one JSON object per worker count with
+# requests/s, p50/p95/p99 latency and time to first token, errors, and the speed-up over
+# the first worker count. The load generator and the mock each run in one process:
+# give the host more cores than workers, or the numbers stop scaling for that reason.
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from typing import Dict, List
+
+from answer_protocol import JSON, MSGPACK, FrameReader, codec_for, encode
+from benchmarks import mock_openai
+from benchmarks.bench_end_to_end import percentile, question
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("answer service exited during startup")
+        try:
+            with urllib.request.urlopen(url + "/healthz", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("answer service did not start in time")
+
+
+async def load(url: str, requests: int, concurrency: int, codec: str) -> Dict:
+    import httpx
+
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors = 0
+    numbers = iter(range(requests))
+    headers = {"content-type": codec, "accept": codec}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async def one(client, n: int) -> None:
+        nonlocal errors
+        body = encode({"question": question(n), "class": 9, "subject": "Science"}, codec)
+        start, first, complete = time.perf_counter(), None, False
+        try:
+            async with client.stream("POST", "/v1/stream", content=body, headers=headers) as response:
+                reader = FrameReader(codec_for(response.headers.get("content-type")))
+                async for chunk in response.aiter_bytes():
+                    for frame in reader.feed(chunk):
+                        if "d" in frame and first is None:
+                            first = time.perf_counter() - start
+                        complete |= "end" in frame
+        except httpx.HTTPError:
+            pass
+        if not complete:
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - start)
+        ttfts.append(first if first is not None else latencies[-1])
+
+    async def connection(client) -> None:
+        for n in numbers:
+            await one(client, n)
+
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(connection(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    def ms(value):
+        return round(value * 1e3, 1) if value is not None else None
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+        "latency_p50_ms": ms(percentile(latencies, 50)),
+        "latency_p95_ms": ms(percentile(latencies, 95)),
+        "latency_p99_ms": ms(percentile(latencies, 99)),
+        "ttft_p50_ms": ms(percentile(ttfts, 50)),
+        "ttft_p99_ms": ms(percentile(ttfts, 99)),
+        "elapsed_s": round(elapsed, 2),
+    }
+
+
+def run_service(workers: int, base_url: str, args) -> Dict:
+    directory = tempfile.mkdtemp(prefix="service-bench-")
+    port = free_port()
+    env = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=base_url, ANSWER_CACHE="0",
+               SESSION_DB_PATH=os.path.join(directory, "sessions.sqlite3"))
+    # Totals, split between the workers by answer_service
+    env.setdefault("OPENAI_RPM_LIMIT", str(10**6 * workers))
+    env.setdefault("OPENAI_TPM_LIMIT", str(10**9 * workers))
+    env.setdefault("MAX_CONCURRENCY", str(max(args.concurrency, 32) * workers))
+    service = subprocess.Popen([sys.executable, "answer_service.py", "--workers", str(workers), "--port", str(port)],
+                               env=env, stdout=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_ready(url, service)
+        return {"workers": workers, **asyncio.run(load(url, args.requests, args.concurrency, args.codec))}
+    finally:
+        service.terminate()
+        service.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer service throughput by worker count")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--codec", choices=(JSON, MSGPACK), default=JSON)
+    mock_openai.add_arguments(parser)
+    parser.set_defaults(ttft_median=0.05, tokens_per_s=400.0)
+    args = parser.parse_args()
+
+    mock = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_openai", "--port", "0",
+                             *mock_openai.mock_arguments(args)], stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = mock.stdout.readline().split()[-1]
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            result = run_service(workers, base_url, args)
+            baseline = baseline or result["requests_per_s"]
+            result["speedup"] = round(result["requests_per_s"] / baseline, 2) if baseline else None
+            print(json.dumps(result), flush=True)
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Cold-start time of each entry point: from process start to the first rendered page.
+#
+#   python -m benchmarks.bench_cold_start --runs 5
+#
+#   cli          python ai_teacher_assistant.py until the first prompt is printed
+#   ui.py, test.py, st_chatbot.py
+#                a fresh interpreter running the page once headlessly (streamlit.testing
+#                AppTest), Streamlit import included
+#   cl_chatbot.py
+#                `chainlit run --headless` until the server answers its first HTTP request
+# No API call is made (a dummy key and an unreachable base URL are used). Prints one
+# JSON object per entry point.
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+ENTRY_POINTS = ("cli", "ui.py", "test.py", "st_chatbot.py", "cl_chatbot.py")
+
+STREAMLIT_CHILD = """
+import sys
+from streamlit.testing.v1 import AppTest
+AppTest.from_file(sys.argv[1], default_timeout=120).run()
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cold_start_cli(env) -> float:
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "ai_teacher_assistant.py"], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, env=env)
+    try:
+        seen = b""
+        while b"Enter Student Name" not in seen:
+            byte = process.stdout.read(1)
+            if not byte:
+                raise RuntimeError("CLI exited before showing its first prompt")
+            seen += byte
+        return time.perf_counter() - start
+    finally:
+        process.kill()
+        process.wait()
+
+
+def cold_start_streamlit(path: str, env) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", STREAMLIT_CHILD, path], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def cold_start_chainlit(path: str, env, timeout: float = 120.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(["chainlit", "run", path, "--headless", "--port", str(port)], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("chainlit exited during startup")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1):
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("chainlit did not answer in time")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def measure(entry: str, env) -> float:
+    if entry == "cli":
+        return cold_start_cli(env)
+    if entry == "cl_chatbot.py":
+        return cold_start_chainlit(entry, env)
+    return cold_start_streamlit(entry, env)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time to first rendered page per entry point")
+    parser.add_argument("--entry-points", default=",".join(ENTRY_POINTS))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "cold-start"),
+               OPENAI_BASE_URL="http://127.0.0.1:9/v1")
+    for entry in args.entry_points.split(","):
+        try:
+            samples = [measure(entry, env) for _ in range(args.runs)]
+        except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+            print(json.dumps({"entry_point": entry, "error": str(e)}), flush=True)
+            continue
+        print(json.dumps({
+            "entry_point": entry,
+            "runs": args.runs,
+            "median_ms": round(statistics.median(samples) * 1e3, 1),
+            "min_ms": round(min(samples) * 1e3, 1),
+            "max_ms": round(max(samples) * 1e3, 1),
+        }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# End-to-end latency and throughput of the answer path, offline, against the local mock
+# OpenAI server (benchmarks/mock_openai.py).
+#
+#   python -m benchmarks.bench_end_to_end --requests 200 --concurrency 16 --output bench.json
+#
+# Each frontend runs in its own process (fresh settings, clients and peak RSS), the way
+# that frontend calls the core:
+#   cli        one student asking questions one after another (ask_openai_stream + memory)
+#   streamlit  one thread per browser session, streaming the answer and appending it to
+#              the session store's history, as the Streamlit apps do per question
+#   chainlit   asyncio sessions on one event loop (ask_openai_stream_async + memory + turn
+#              persisted), as the Chainlit handler does
+# Every question is distinct and the answer cache is off unless --cache is given, so all
+# requests reach the mock server. Reports p50/p95/p99 latency and TTFT, requests and
+# tokens per second, errors, peak RSS and the model-router mix (with MODEL_TIERS set),
+# one JSON object per frontend (and all of them in --output together with the git
+# revision, for comparing commits).
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import List, Optional
+
+from benchmarks import mock_openai
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FRONTENDS = ("cli", "streamlit", "chainlit")
+
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def question(n: int) -> str:
+    return f"Describe topic number {n} of the syllabus for the class"
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.ttfts: List[float] = []
+        self.errors = 0
+
+    def add(self, timing, total: float, error: bool) -> None:
+        with self.lock:
+            if error:
+                self.errors += 1
+                return
+            self.latencies.append(total)
+            if timing.ttft is not None:
+                self.ttfts.append(timing.ttft)
+
+
+def run_child(frontend: str, requests: int, concurrency: int) -> dict:
+    # Imported here: settings are read from the environment the parent prepared
+    import ai_teacher_assistant as core
+    from conversation_memory import ConversationMemory
+    from rate_limiter import limiter
+    from session_store import get_store
+
+    profile = core.StudentProfile("Bench", "Mock School", core.get_academic_level(9), 9, "Science")
+    store = get_store()
+    recorder = Recorder()
+
+    def ask(n: int, memory, history=None) -> None:
+        timing = core.StreamTiming()
+        start = time.perf_counter()
+        try:
+            answer = "".join(core.ask_openai_stream(question(n), profile, timing=timing, memory=memory))
+            if history is not None:
+                history.append(question(n), answer)
+            recorder.add(timing, time.perf_counter() - start, False)
+        except Exception:
+            recorder.add(timing, time.perf_counter() - start, True)
+
+    async def ask_async(n: int, memory, session_id: str) -> None:
+        timing = core.StreamTiming()
+        start = time.perf_counter()
+        try:
+            parts = [d async for d in core.ask_openai_stream_async(question(n), profile, timing=timing, memory=memory)]
+            store.append_turn(session_id, question(n), "".join(parts).strip())
+            recorder.add(timing, time.perf_counter() - start, False)
+        except Exception:
+            recorder.add(timing, time.perf_counter() - start, True)
+
+    start = time.perf_counter()
+    if frontend == "cli":
+        concurrency = 1
+        memory = ConversationMemory()
+        for n in range(requests):
+            ask(n, memory)
+    elif frontend == "streamlit":
+        def session(s: int) -> None:
+            memory, history = ConversationMemory(), store.history(f"streamlit-{s}")
+            for n in range(s, requests, concurrency):
+                ask(n, memory, history)
+
+        threads = [threading.Thread(target=session, args=(s,)) for s in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    else:
+        async def sessions():
+            async def session(s: int) -> None:
+                memory = ConversationMemory()
+                for n in range(s, requests, concurrency):
+                    await ask_async(n, memory, f"chainlit-{s}")
+
+            await asyncio.gather(*(session(s) for s in range(concurrency)))
+
+        asyncio.run(sessions())
+    elapsed = time.perf_counter() - start
+
+    usage = core.usage_stats.snapshot()
+
+    def ms(value):
+        return round(value * 1e3, 1) if value is not None else None
+
+    return {
+        "frontend": frontend,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": recorder.errors,
+        "latency_p50_ms": ms(percentile(recorder.latencies, 50)),
+        "latency_p95_ms": ms(percentile(recorder.latencies, 95)),
+        "latency_p99_ms": ms(percentile(recorder.latencies, 99)),
+        "ttft_p50_ms": ms(percentile(recorder.ttfts, 50)),
+        "ttft_p95_ms": ms(percentile(recorder.ttfts, 95)),
+        "ttft_p99_ms": ms(percentile(recorder.ttfts, 99)),
+        "requests_per_s": round(len(recorder.latencies) / elapsed, 2),
+        "completion_tokens_per_s": round(usage["completion_tokens"] / elapsed, 1),
+        "elapsed_s": round(elapsed, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "limiter": limiter.stats(),
+        "router": core.router.stats.snapshot(),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against a mock OpenAI server")
+    parser.add_argument("--frontends", default=",".join(FRONTENDS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--cache", action="store_true", help="keep the answer cache enabled")
+    parser.add_argument("--output", help="also write all results to this JSON file")
+    parser.add_argument("--child", choices=FRONTENDS, help=argparse.SUPPRESS)
+    mock_openai.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.requests, args.concurrency)), flush=True)
+        return
+
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_openai", "--port", "0",
+                               *mock_openai.mock_arguments(args)], stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = server.stdout.readline().split()[-1]
+        results = []
+        for frontend in args.frontends.split(","):
+            directory = tempfile.mkdtemp(prefix="e2e-bench-")
+            env = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=base_url,
+                       ANSWER_CACHE="1" if args.cache else "0",
+                       ANSWER_CACHE_PATH=os.path.join(directory, "answers.sqlite3"),
+                       SESSION_DB_PATH=os.path.join(directory, "sessions.sqlite3"))
+            # The mock has no quota: keep the client-side limiter from being the bottleneck
+            env.setdefault("OPENAI_RPM_LIMIT", "1000000")
+            env.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+            child = subprocess.run([sys.executable, "-m", "benchmarks.bench_end_to_end", "--child", frontend,
+                                    "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                                   env=env, capture_output=True, text=True, check=True)
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"revision": git_revision(), "mock": mock_openai.config_from_args(args).as_dict(),
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
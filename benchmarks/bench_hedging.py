@@ -0,0 +1,150 @@
+# Tail latency with and without hedged requests, offline, against two local mock OpenAI
+# servers (benchmarks/mock_openai.py): the primary and the hedge backup, where a few
+# percent of requests stall (--slow-rate, --slow-ttft) on top of a log-normal TTFT.
+#
+#   python -m benchmarks.bench_hedging --requests 400 --concurrency 8 --slow-rate 0.02
+#
+# The same questions are answered twice, each run in a fresh process: hedging off, then
+# on (HEDGE_BASE_URL pointing at the backup mock). Prints p50/p95/p99 time to first token
+# and total latency, extra upstream requests and the hedge counters per run, then one line
+# with the p99 improvement. --sync uses the thread-per-session path of the Streamlit apps
+# instead of asyncio sessions.
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import subprocess
+
+from benchmarks import mock_openai
+from benchmarks.bench_end_to_end import percentile, question
+
+
+def run_child(requests: int, concurrency: int, sync: bool) -> dict:
+    import ai_teacher_assistant as core
+
+    profile = core.StudentProfile("Bench", "Mock School", core.get_academic_level(9), 9, "Science")
+    lock = threading.Lock()
+    ttfts, latencies, errors = [], [], [0]
+
+    def record(timing, start: float, error: bool) -> None:
+        with lock:
+            if error:
+                errors[0] += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+                ttfts.append(timing.ttft)
+
+    def ask(n: int) -> None:
+        timing, start = core.StreamTiming(), time.perf_counter()
+        try:
+            "".join(core.ask_openai_stream(question(n), profile, timing=timing))
+            record(timing, start, False)
+        except Exception:
+            record(timing, start, True)
+
+    async def ask_async(n: int) -> None:
+        timing, start = core.StreamTiming(), time.perf_counter()
+        try:
+            [d async for d in core.ask_openai_stream_async(question(n), profile, timing=timing)]
+            record(timing, start, False)
+        except Exception:
+            record(timing, start, True)
+
+    start = time.perf_counter()
+    if sync:
+        def session(s: int) -> None:
+            for n in range(s, requests, concurrency):
+                ask(n)
+
+        threads = [threading.Thread(target=session, args=(s,)) for s in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    else:
+        async def sessions():
+            async def session(s: int) -> None:
+                for n in range(s, requests, concurrency):
+                    await ask_async(n)
+
+            await asyncio.gather(*(session(s) for s in range(concurrency)))
+
+        asyncio.run(sessions())
+    elapsed = time.perf_counter() - start
+
+    def ms(samples, p):
+        value = percentile(samples, p)
+        return round(value * 1e3, 1) if value is not None else None
+
+    hedge = core.hedge.snapshot()
+    return {
+        "hedging": core.hedge.enabled,
+        "requests": requests,
+        "errors": errors[0],
+        "ttft_p50_ms": ms(ttfts, 50), "ttft_p95_ms": ms(ttfts, 95), "ttft_p99_ms": ms(ttfts, 99),
+        "latency_p50_ms": ms(latencies, 50), "latency_p95_ms": ms(latencies, 95),
+        "latency_p99_ms": ms(latencies, 99),
+        "extra_requests_pct": round(100 * hedge["hedged"] / requests, 2),
+        "elapsed_s": round(elapsed, 2),
+        "hedge": hedge,
+    }
+
+
+def start_mock(args, seed: int):
+    argv = mock_openai.mock_arguments(args)
+    if args.seed is None:
+        argv += ["--seed", str(seed)]
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_openai", "--port", "0", *argv],
+                              stdout=subprocess.PIPE, text=True)
+    return server, server.stdout.readline().split()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p99 latency with and without hedged requests, against mock servers")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sync", action="store_true", help="thread-per-session sync path instead of asyncio")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    mock_openai.add_arguments(parser)
+    parser.set_defaults(slow_rate=0.02, slow_ttft=8.0, answer_tokens=40, tokens_per_s=400.0)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.requests, args.concurrency, args.sync)), flush=True)
+        return
+
+    primary, primary_url = start_mock(args, 1)
+    backup, backup_url = start_mock(args, 2)
+    try:
+        results = []
+        for hedging in (False, True):
+            env = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=primary_url, ANSWER_CACHE="0",
+                       HEDGE_BASE_URL=backup_url if hedging else "")
+            # The mock has no quota: keep the client-side limiter from being the bottleneck
+            env.setdefault("OPENAI_RPM_LIMIT", "1000000")
+            env.setdefault("OPENAI_TPM_LIMIT", "1000000000")
+            child = subprocess.run([sys.executable, "-m", "benchmarks.bench_hedging", "--child",
+                                    "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                                    *(["--sync"] if args.sync else [])],
+                                   env=env, capture_output=True, text=True, check=True)
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    finally:
+        for server in (primary, backup):
+            server.terminate()
+            server.wait()
+
+    off, on = results
+    print(json.dumps({
+        "ttft_p99_improvement_pct": round(100 * (1 - on["ttft_p99_ms"] / off["ttft_p99_ms"]), 1),
+        "latency_p99_improvement_pct": round(100 * (1 - on["latency_p99_ms"] / off["latency_p99_ms"]), 1),
+        "extra_requests_pct": on["extra_requests_pct"],
+    }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Rerun time of the chat-history section at growing history lengths.
+#
+#   python -m benchmarks.bench_history_render --turns 10,1000,10000
+#
+# Runs a minimal Streamlit page headlessly (streamlit.testing AppTest) against a session
+# store pre-filled with N turns, and times reruns with the paged history_view against
+# the previous rendering (one expander per turn held in st.session_state).
+# Prints one JSON object per (mode, turns).
+import os
+import json
+import time
+import argparse
+import statistics
+import tempfile
+
+from streamlit.testing.v1 import AppTest
+
+from session_store import SessionStore
+
+APP = """
+import streamlit as st
+from session_store import SessionStore
+from history_view import show_history
+
+if "chat_history" not in st.session_state:
+    store = SessionStore({path!r})
+    if {mode!r} == "paged":
+        st.session_state.chat_history = store.history("bench")
+    else:
+        turns = store.turns_before("bench", None, 10**9)
+        st.session_state.chat_history = [dict(question=t["question"], answer=t["answer"]) for t in reversed(turns)]
+
+st.subheader("📚 Previous Questions & Answers")
+history = st.session_state.chat_history
+if {mode!r} == "paged":
+    show_history(history)
+else:
+    for i, chat in enumerate(reversed(history), 1):
+        with st.expander(f"Q{{len(history) - i + 1}}: {{chat['question'][:60]}}"):
+            st.markdown(f"**❓ Question:** {{chat['question']}}")
+            st.markdown(f"**💡 Answer:** {{chat['answer']}}")
+"""
+
+QUESTION = "Why does ice float on water even though it is a solid?"
+ANSWER = "Ice is less dense than liquid water because its molecules form an open hexagonal lattice. " * 6
+
+
+def run(mode: str, turns: int, reruns: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="history-bench-"), "sessions.sqlite3")
+    SessionStore(path).append_turns("bench", ((f"{QUESTION} #{n}", ANSWER) for n in range(1, turns + 1)))
+
+    app = AppTest.from_string(APP.format(path=path, mode=mode), default_timeout=600)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    return {
+        "mode": mode,
+        "turns": turns,
+        "first_run_ms": round(first * 1e3, 1),
+        "rerun_p50_ms": round(statistics.median(timings) * 1e3, 1),
+        "rerun_max_ms": round(max(timings) * 1e3, 1),
+        "expanders": len(app.expander),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat-history rendering")
+    parser.add_argument("--turns", default="10,1000,10000")
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--modes", default="paged,full")
+    args = parser.parse_args()
+
+    for mode in args.modes.split(","):
+        for turns in (int(n) for n in args.turns.split(",")):
+            print(json.dumps(run(mode, turns, args.reruns)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
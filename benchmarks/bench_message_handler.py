@@ -0,0 +1,90 @@
+# Per-message overhead of the chatbot.py handler before the answer is requested:
+# recognising a typed JSON profile and building the prompt for an ordinary question.
+#
+#   python -m benchmarks.bench_message_handler --messages 200000
+#
+#   parse_every_message  the old handler: json.loads on every message (a question raises
+#                        and is caught) and the system prompt rebuilt for every question
+#   shape_check          profile_message.parse_profile (prefix/shape check before any
+#                        parse) and the per-(level, subject) prefix built once
+# Prints one JSON object per strategy and message kind with the mean microseconds per
+# message. No API call is made.
+import json
+import time
+import random
+import argparse
+from typing import Callable, Dict, List
+
+from ai_teacher_assistant import StudentProfile, build_messages, get_academic_level
+from profile_message import PROFILE_EXAMPLE, ProfileError, parse_profile
+from prompt_templates import _prefix, get_template
+
+PROFILE = StudentProfile("Aisha", "City High", get_academic_level(10), 10, "Physics")
+
+MESSAGES = {
+    "short_question": ["What is inertia?", "Define velocity", "why is the sky blue", "explain it simpler"],
+    "long_question": [
+        "A car accelerates uniformly from rest to 20 m/s in 5 seconds. Calculate the acceleration, the "
+        "distance covered, and explain which of Newton's laws applies and why the passengers lean back.",
+        "Compare the wave and particle models of light, describing at least two experiments that support "
+        "each model and what they tell us about the nature of light at different scales.",
+    ],
+    "brace_question": ["Is {1, 2, 3} a set of natural numbers?", "{x | x > 2} what does this notation mean?"],
+    "profile": [PROFILE_EXAMPLE],
+}
+
+
+def parse_every_message(text: str) -> None:
+    try:
+        data = json.loads(text)
+        if all(k in data for k in ("student_name", "student_class", "subject")):
+            return
+    except Exception:
+        pass
+    template = get_template()
+    prefix = _prefix.__wrapped__(template, PROFILE.Academic_Level, PROFILE.Subject)
+    [*prefix, {"role": "user", "content": f"[Class {PROFILE.Class}] {text.strip()}"}]
+
+
+def shape_check(text: str) -> None:
+    try:
+        if parse_profile(text) is not None:
+            return
+    except ProfileError:
+        return
+    build_messages(text, PROFILE)
+
+
+STRATEGIES: Dict[str, Callable[[str], None]] = {
+    "parse_every_message": parse_every_message,
+    "shape_check": shape_check,
+}
+
+
+def time_per_message(handler: Callable[[str], None], messages: List[str]) -> float:
+    start = time.perf_counter_ns()
+    for text in messages:
+        handler(text)
+    return (time.perf_counter_ns() - start) / len(messages) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-message overhead of the chatbot.py handler")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Warm both paths (imports, prefix cache) before timing
+    for handler in STRATEGIES.values():
+        for samples in MESSAGES.values():
+            handler(samples[0])
+    for kind, samples in MESSAGES.items():
+        messages = [rng.choice(samples) for _ in range(args.messages)]
+        for name, handler in STRATEGIES.items():
+            print(json.dumps({"strategy": name, "message": kind, "messages": args.messages,
+                              "us_per_message": round(time_per_message(handler, messages), 3)}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
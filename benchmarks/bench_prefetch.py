@@ -0,0 +1,138 @@
+# Does speculative follow-up prefetch pay off? Offline, against the local mock OpenAI server
+# (benchmarks/mock_openai.py).
+#
+#   python -m benchmarks.bench_prefetch --sessions 8 --rounds 4 --read-time 6
+#
+# Each session (a thread, as in the Streamlit apps) asks a new question, reads the answer
+# for --read-time seconds, then asks the next one: an obvious follow-up ("give me an
+# example", "I don't understand", "practice questions") or a new topic, drawn with the
+# same seed in both runs. The run is done twice, each in a fresh process: prefetch off,
+# then on (SPECULATIVE_PREFETCH=1). Prints per run the time to first token of follow-ups
+# and of all questions, upstream requests and tokens, and the prefetch counters, then one
+# line with the follow-up TTFT gain and the token overhead.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+
+from benchmarks import mock_openai
+from benchmarks.bench_end_to_end import percentile, question
+
+# (question, share of next questions); the rest are new topics
+FOLLOW_UPS = (("Can you give me an example?", 0.35), ("I don't understand, explain it simpler", 0.2),
+              ("Give me some practice questions", 0.1))
+
+
+def next_question(rng: random.Random, n: int) -> str:
+    draw = rng.random()
+    for text, share in FOLLOW_UPS:
+        if draw < share:
+            return text
+        draw -= share
+    return question(n)
+
+
+def run_child(sessions: int, rounds: int, read_time: float, seed: int) -> dict:
+    import ai_teacher_assistant as core
+    from conversation_memory import ConversationMemory
+
+    lock = threading.Lock()
+    follow_up_ttfts, ttfts, errors = [], [], [0]
+
+    def session(s: int) -> None:
+        rng = random.Random(seed * 1000 + s)
+        profile = core.StudentProfile("Bench", "Mock School", core.get_academic_level(9 + s % 3), 9 + s % 3,
+                                      ("Science", "Physics", "Biology")[s % 3])
+        memory = ConversationMemory()
+        text = question(s * 100)
+        for r in range(rounds):
+            timing = core.StreamTiming()
+            try:
+                "".join(core.ask_openai_stream(text, profile, timing=timing, memory=memory))
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            else:
+                with lock:
+                    ttfts.append(timing.ttft)
+                    if r and text != question(s * 100 + r):
+                        follow_up_ttfts.append(timing.ttft)
+            time.sleep(read_time * (0.5 + rng.random()))
+            text = next_question(rng, s * 100 + r + 1)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(s,)) for s in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    def ms(samples, p):
+        value = percentile(samples, p)
+        return round(value * 1e3, 1) if value is not None else None
+
+    usage = core.usage_stats.snapshot()
+    return {
+        "prefetch": core.speculation is not None,
+        "questions": len(ttfts) + errors[0],
+        "follow_ups": len(follow_up_ttfts),
+        "errors": errors[0],
+        "follow_up_ttft_p50_ms": ms(follow_up_ttfts, 50), "follow_up_ttft_p95_ms": ms(follow_up_ttfts, 95),
+        "ttft_p50_ms": ms(ttfts, 50), "ttft_p95_ms": ms(ttfts, 95),
+        "api_requests": usage["requests"],
+        "tokens": usage["prompt_tokens"] + usage["completion_tokens"],
+        "elapsed_s": round(time.perf_counter() - start, 2),
+        "prefetch_stats": core.speculation.snapshot() if core.speculation is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow-up latency and token cost with and without speculative prefetch")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=4, help="questions per session")
+    parser.add_argument("--read-time", type=float, default=6.0, help="mean seconds spent reading an answer")
+    parser.add_argument("--session-tokens", type=int, default=8000, help="PREFETCH_SESSION_TOKENS")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    mock_openai.add_arguments(parser)
+    parser.set_defaults(ttft_median=0.6, tokens_per_s=60.0, answer_tokens=120, seed=7)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.sessions, args.rounds, args.read_time, args.seed)), flush=True)
+        return
+
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_openai", "--port", "0",
+                               *mock_openai.mock_arguments(args)], stdout=subprocess.PIPE, text=True)
+    base_url = server.stdout.readline().split()[-1]
+    try:
+        results = []
+        for prefetch in (False, True):
+            env = dict(os.environ, OPENAI_API_KEY="mock", OPENAI_BASE_URL=base_url, ANSWER_CACHE="0",
+                       ANSWER_PACK_DIR="", SPECULATIVE_PREFETCH="1" if prefetch else "0",
+                       PREFETCH_SESSION_TOKENS=str(args.session_tokens))
+            child = subprocess.run([sys.executable, "-m", "benchmarks.bench_prefetch", "--child",
+                                    "--sessions", str(args.sessions), "--rounds", str(args.rounds),
+                                    "--read-time", str(args.read_time), "--seed", str(args.seed)],
+                                   env=env, capture_output=True, text=True, check=True)
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    finally:
+        server.terminate()
+        server.wait()
+
+    off, on = results
+    print(json.dumps({
+        "follow_up_ttft_p50_improvement_pct": round(100 * (1 - on["follow_up_ttft_p50_ms"] / off["follow_up_ttft_p50_ms"]), 1),
+        "extra_tokens_pct": round(100 * (on["tokens"] / off["tokens"] - 1), 1),
+        "extra_requests_pct": round(100 * (on["api_requests"] / off["api_requests"] - 1), 1),
+        "hit_rate": round(on["prefetch_stats"]["hit_rate"], 3),
+    }), flush=True)
+
+
+if __name__ == "__main__":
+    main()
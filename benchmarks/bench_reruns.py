@@ -0,0 +1,88 @@
+# Server CPU and browser payload per interaction in the Streamlit app, with and without
+# fragments (partial reruns).
+#
+#   python -m benchmarks.bench_reruns --turns 200
+#
+# Drives ui.py headlessly (streamlit.testing AppTest) with UI_METRICS=1: open the page,
+# submit a question, page the history. The question is pre-seeded in a throwaway answer
+# cache, so no API call is made. Each run of the page or of a fragment records its CPU
+# time and the bytes of delta messages it produced (ui_metrics.measure). Prints one
+# JSON object per (fragments on/off, interaction).
+import os
+import sys
+import json
+import tempfile
+import argparse
+import subprocess
+
+QUESTION = "Describe the water cycle for a science lesson"
+ANSWER = "Water evaporates, condenses into clouds and falls back as rain or snow. " * 8
+
+
+def run(turns: int) -> None:
+    from streamlit.testing.v1 import AppTest
+
+    from ai_teacher_assistant import StudentProfile, _answer_key, get_academic_level
+    from answer_cache import get_cache
+    from session_store import get_store
+
+    profile = StudentProfile("Ayesha", "City School", get_academic_level(9), 9, "Science")
+    store = get_store()
+    store.save_profile("bench", profile)
+    store.append_turns("bench", ((f"Question {n} about plants and animals", ANSWER) for n in range(1, turns + 1)))
+    get_cache().put(_answer_key(QUESTION, profile), ANSWER)
+
+    app = AppTest.from_file("ui.py", default_timeout=60)
+    app.query_params["sid"] = "bench"
+    app.session_state["current_option"] = "ask"
+
+    def step(name, action):
+        seen = len(app.session_state["ui_metrics"]) if "ui_metrics" in app.session_state else 0
+        action()
+        records = list(app.session_state["ui_metrics"])[seen:]
+        # Nested scopes: a full run ("app") already includes its fragments
+        top = [r for r in records if r["scope"] == "app"] or records
+        print(json.dumps({
+            "fragments": os.environ["UI_FRAGMENTS"] != "0",
+            "interaction": name,
+            "scopes": [r["scope"] for r in records],
+            "cpu_ms": round(sum(r["cpu_ms"] for r in top), 2),
+            "payload_bytes": sum(r["payload_bytes"] for r in top),
+        }), flush=True)
+
+    def button(label):
+        return next(b for b in app.button if b.label == label)
+
+    step("open page", app.run)
+    step("ask question", lambda: (app.text_area[0].input(QUESTION), button("🚀 Get Answer").click(), app.run()))
+    step("load older history", lambda: (button("Load older ➡️").click(), app.run()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-interaction cost of the Streamlit app")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run(args.turns)
+        return
+    # Settings are read at import time, so each variant runs in its own process
+    for fragments in ("0", "1"):
+        directory = tempfile.mkdtemp(prefix="rerun-bench-")
+        env = dict(
+            os.environ,
+            UI_METRICS="1",
+            UI_FRAGMENTS=fragments,
+            OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "bench"),
+            OPENAI_BASE_URL="http://127.0.0.1:9/v1",
+            SESSION_DB_PATH=os.path.join(directory, "sessions.sqlite3"),
+            ANSWER_CACHE_PATH=os.path.join(directory, "answers.sqlite3"),
+            ANSWER_CACHE="1",
+        )
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_reruns", "--child", "--turns", str(args.turns)],
+                       env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
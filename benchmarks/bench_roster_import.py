@@ -0,0 +1,97 @@
+# Roster import throughput and memory (roster_import.py) on a generated roster.
+#
+#   python -m benchmarks.bench_roster_import --rows 1000000 --chunk-sizes 10000,100000
+#
+# Writes a synthetic CSV roster (about 3% duplicate students, 1% bad Class values, 0.5%
+# empty subjects), then imports it once per chunk size, each time in a fresh process and
+# into an empty store, and reports rows/s and peak RSS: memory should follow the chunk
+# size, not the roster size. Also times Class -> Academic_Level for every row with
+# get_academic_level in a loop vs the NumPy lookup. Prints one JSON object per result.
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+from benchmarks.bench_end_to_end import peak_rss_mb
+
+SUBJECTS = ("Mathematics", "Physics", "Chemistry", "Biology", "English", "Urdu", "History", "Computer Science")
+SCHOOLS = tuple(f"School {n}" for n in range(200))
+
+
+def write_roster(path: str, rows: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("Student_Name", "Academic_Name", "Class", "Subject"))
+        for n in range(rows):
+            roll = rng.random()
+            student = rng.randrange(n) if n and roll < 0.03 else n
+            rng_student = random.Random(student)
+            class_num = str(rng_student.randint(1, 20)) if roll >= 0.01 else rng.choice(("", "ten", "9.5"))
+            subject = rng_student.choice(SUBJECTS) if not 0.01 <= roll < 0.015 else ""
+            writer.writerow((f"Student {student}", rng_student.choice(SCHOOLS), class_num, subject))
+
+
+def run_child(path: str, chunk_size: int) -> dict:
+    from roster_import import import_roster
+    from session_store import SessionStore
+
+    store = SessionStore(os.path.join(tempfile.mkdtemp(prefix="roster-bench-"), "profiles.sqlite3"))
+    start = time.perf_counter()
+    stats = import_roster(path, store, chunk_size, report=False)
+    elapsed = time.perf_counter() - start
+    return {"chunk_size": chunk_size, **stats, "elapsed_s": round(elapsed, 2),
+            "rows_per_s": round(stats["rows"] / elapsed), "peak_rss_mb": peak_rss_mb()}
+
+
+def bench_classification(rows: int) -> dict:
+    from ai_teacher_assistant import get_academic_level
+    from roster_import import academic_levels
+
+    classes = np.random.default_rng(0).integers(-1, 22, rows)
+    as_list = classes.tolist()
+    start = time.perf_counter()
+    [get_academic_level(c) for c in as_list]
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    academic_levels(classes)
+    vectorized = time.perf_counter() - start
+    return {"classification_rows": rows, "scalar_ms": round(scalar * 1e3, 1),
+            "vectorized_ms": round(vectorized * 1e3, 1), "speedup": round(scalar / vectorized, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roster import throughput and peak memory per chunk size")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-sizes", default="10000,100000")
+    parser.add_argument("--roster", help="existing roster to import instead of a generated one")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.roster, args.child)), flush=True)
+        return
+
+    print(json.dumps(bench_classification(args.rows)), flush=True)
+    path = args.roster
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="roster-bench-"), "roster.csv")
+        start = time.perf_counter()
+        write_roster(path, args.rows)
+        print(json.dumps({"generated_rows": args.rows, "roster_mb": round(os.path.getsize(path) / 2**20, 1),
+                          "generate_s": round(time.perf_counter() - start, 1)}), flush=True)
+    for chunk_size in (int(c) for c in args.chunk_sizes.split(",")):
+        child = subprocess.run([sys.executable, "-m", "benchmarks.bench_roster_import", "--roster", path,
+                                "--child", str(chunk_size)], capture_output=True, text=True, check=True)
+        print(child.stdout.strip().splitlines()[-1], flush=True)
+
+
+if __name__ == "__main__":
+    main()
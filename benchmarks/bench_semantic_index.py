@@ -0,0 +1,165 @@
+# Accuracy and lookup latency of the near-duplicate index (semantic_index).
+#
+#   python -m benchmarks.bench_semantic_index --sizes 1000,10000,100000,1000000
+#
+# accuracy   the real embedder on labelled question pairs. The first question of every
+#            pair is stored in one partition, then the second is looked up: a paraphrase
+#            should hit its own pair, and any hit for a non-paraphrase (a different
+#            number, operator, interrogative or topic) is a false hit, i.e. a wrong answer
+#            served. Reported at SEMANTIC_THRESHOLD and at a few other thresholds, with the
+#            false hits and missed paraphrases at the configured one.
+# scale      lookup latency per corpus size. Lookup cost does not depend on what the
+#            vectors encode, so stored rows are random unit vectors; recall@1 of a stored
+#            row plus noise checks that the right row comes back.
+# Prints one JSON object per threshold and per corpus size.
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from semantic_index import SEMANTIC_THRESHOLD, Partition, SemanticIndex, normalize_rows
+
+# (stored question, asked question)
+PARAPHRASES = (
+    ("What is photosynthesis?", "explain photosynthesis pls"),
+    ("What is photosynthesis?", "Photosynthesis?"),
+    ("Define osmosis", "what is osmosis"),
+    ("What is Newton's third law?", "explain newtons third law"),
+    ("What is the formula of water?", "tell me the formula of water"),
+    ("Why do plants need sunlight?", "why do plants need sunlight"),
+    ("Why is the sky blue?", "Why is the sky blue? please explain"),
+    ("How does a rainbow form?", "how does a rainbow form"),
+    ("How do vaccines work?", "Can you tell me how do vaccines work?"),
+    ("What is 2+5", "what is 2 + 5"),
+    ("What is 12 * 3?", "12*3"),
+    ("Solve x^2 - 4 = 0", "solve x^2 - 4 = 0 please"),
+    ("What is the capital of Pakistan?", "capital of pakistan"),
+    ("Describe the water cycle", "Explain the water cycle"),
+    ("What are prime numbers?", "explain prime numbers to me"),
+    ("What is the speed of light?", "tell me about the speed of light"),
+    ("Who was Allama Iqbal?", "who was allama iqbal"),
+    ("When did World War 2 end?", "when did world war 2 end?"),
+    ("What is an adjective?", "Explain an adjective"),
+    ("What is the Pythagorean theorem?", "Explain the pythagorean theorem please"),
+)
+NON_PARAPHRASES = (
+    ("What is 2+5", "what is 2*5"),
+    ("What is 2+5", "what is 2-5"),
+    ("What is 2+5", "what is 3+5"),
+    ("What is 12 * 3?", "What is 12 / 3?"),
+    ("Solve x^2 - 4 = 0", "Solve x^2 - 9 = 0"),
+    ("When did World War 2 end?", "When did World War 1 end?"),
+    ("What is 10% of 50?", "What is 20% of 50?"),
+    ("Why do plants need sunlight?", "How do plants need sunlight?"),
+    ("Why is the sky blue?", "When is the sky blue?"),
+    ("How does a rainbow form?", "Why does a rainbow form?"),
+    ("Who was Allama Iqbal?", "Where was Allama Iqbal born?"),
+    ("Why do we have seasons?", "When do we have seasons?"),
+    ("What is the capital of Pakistan?", "What is the capital of India?"),
+    ("What is mitosis?", "What is meiosis?"),
+    ("What is an adjective?", "What is an adverb?"),
+    ("What is the speed of light?", "What is the speed of sound?"),
+    ("What is the atomic number of carbon?", "What is the atomic mass of carbon?"),
+    ("Define osmosis", "Define diffusion"),
+    ("What is kinetic energy?", "What is potential energy?"),
+    ("What are prime numbers?", "What are composite numbers?"),
+)
+THRESHOLDS = (0.7, 0.8, 0.85, 0.9, 0.95)
+
+
+def accuracy(threshold: float, verbose: bool) -> dict:
+    index = SemanticIndex(threshold=threshold)
+    stored = {pair[0] for pair in PARAPHRASES + NON_PARAPHRASES}
+    for question in sorted(stored):
+        index.add("Matric", "Science", question, question)
+
+    missed, false_hits = [], []
+    for stored_question, asked in PARAPHRASES:
+        match = index.search("Matric", "Science", asked)
+        if match is None or match[0] != stored_question:
+            missed.append([asked, match[0] if match else None, round(match[2], 3) if match else None])
+    for _, asked in NON_PARAPHRASES:
+        match = index.search("Matric", "Science", asked)
+        if match is not None:
+            false_hits.append([asked, match[0], round(match[2], 3)])
+
+    result = {
+        "section": "accuracy",
+        "threshold": threshold,
+        "paraphrase_hit_rate": round(1 - len(missed) / len(PARAPHRASES), 3),
+        "false_hit_rate": round(len(false_hits) / len(NON_PARAPHRASES), 3),
+    }
+    if verbose:
+        result.update(missed=missed, false_hits=false_hits)
+    return result
+
+
+def percentile(samples, p):
+    return float(np.percentile(np.asarray(samples), p))
+
+
+def scale(size: int, dim: int, queries: int, noise: float, mmap: bool, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    directory = tempfile.mkdtemp(prefix="semantic-bench-") if mmap else None
+    part = Partition(dim, directory)
+
+    start = time.perf_counter()
+    chunk = 100_000
+    for lo in range(0, size, chunk):
+        n = min(chunk, size - lo)
+        vectors = normalize_rows(rng.standard_normal((n, dim), dtype=np.float32))
+        part.append(vectors, [(f"q{lo + i}", "") for i in range(n)], log=False)
+    build = time.perf_counter() - start
+
+    compact = None
+    if mmap:
+        start = time.perf_counter()
+        part.compact()
+        compact = time.perf_counter() - start
+
+    stored = part.vectors()
+    targets = rng.integers(0, size, queries)
+    probes = normalize_rows(stored[targets] + noise * rng.standard_normal((queries, dim), dtype=np.float32))
+
+    latencies, correct = [], 0
+    for target, probe in zip(targets, probes):
+        t0 = time.perf_counter()
+        entry, _ = part.search(probe)
+        latencies.append(time.perf_counter() - t0)
+        correct += entry is not None and entry[0] == f"q{target}"
+
+    return {
+        "section": "scale",
+        "size": size,
+        "dim": dim,
+        "mmap": mmap,
+        "build_s": round(build, 3),
+        "compact_s": round(compact, 3) if compact is not None else None,
+        "recall_at_1": correct / queries,
+        "lookup_p50_ms": round(percentile(latencies, 50) * 1e3, 3),
+        "lookup_p95_ms": round(percentile(latencies, 95) * 1e3, 3),
+        "lookup_p99_ms": round(percentile(latencies, 99) * 1e3, 3),
+        "matrix_mb": round(size * dim * 4 / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate question index")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=int(os.getenv("SEMANTIC_DIM", "512")))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--mmap", action="store_true", help="compact into a memory-mapped file before querying")
+    args = parser.parse_args()
+
+    for threshold in sorted(set(THRESHOLDS) | {SEMANTIC_THRESHOLD}):
+        print(json.dumps(accuracy(threshold, threshold == SEMANTIC_THRESHOLD)), flush=True)
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        print(json.dumps(scale(size, args.dim, args.queries, args.noise, args.mmap)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Write throughput of the session store and the RAM held per 10k open sessions.
+#
+#   python -m benchmarks.bench_session_store --sessions 10000 --turns 50 --threads 8
+#
+# Writes: `threads` workers append turns to their own sessions in one shared store file.
+# Memory: tracemalloc of 10k in-memory histories, as the frontends used to keep them
+# (every turn in a list), versus SessionHistory (only the recent window in RAM).
+# Prints one JSON object.
+import os
+import json
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+from session_store import SessionStore
+
+QUESTION = "Explain photosynthesis in simple words with an example from daily life."
+ANSWER = "Plants use sunlight, water and carbon dioxide to make their own food. " * 12
+
+
+def bench_writes(store: SessionStore, threads: int, writes: int) -> dict:
+    per_thread = writes // threads
+
+    def worker(n: int):
+        for i in range(per_thread):
+            store.append_turn(f"writer-{n}", QUESTION, ANSWER)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return {"writes": per_thread * threads, "threads": threads, "writes_per_s": round(per_thread * threads / elapsed)}
+
+
+def measure(build) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def bench_memory(store: SessionStore, sessions: int, turns: int, window: int) -> dict:
+    for s in range(sessions):
+        store.append_turns(f"s{s}", ((f"{QUESTION} #{seq}", f"{ANSWER} #{seq}") for seq in range(1, turns + 1)))
+
+    # Fresh strings per turn, like answers arriving from the API
+    in_lists = measure(lambda: [
+        [{"question": f"{QUESTION} #{seq}", "answer": f"{ANSWER} #{seq}", "timestamp": seq} for seq in range(1, turns + 1)]
+        for _ in range(sessions)
+    ])
+    start = time.perf_counter()
+    windowed = measure(lambda: [store.history(f"s{s}", window) for s in range(sessions)])
+    load = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "window": window,
+        "list_mb": round(in_lists / 2**20, 1),
+        "windowed_mb": round(windowed / 2**20, 1),
+        "windowed_load_s": round(load, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the durable session store")
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--window", type=int, default=int(os.getenv("SESSION_RECENT_WINDOW", "20")))
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=20_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="session-bench-")
+    store = SessionStore(os.path.join(directory, "sessions.sqlite3"))
+    result = bench_writes(store, args.threads, args.writes)
+    result.update(bench_memory(store, args.sessions, args.turns, args.window))
+    result["db_mb"] = round(sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 2**20, 1)
+    print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Check that cancelling an answer really stops it upstream, against the local mock OpenAI
+# server (benchmarks/mock_openai.py), which counts the streams still open.
+#
+#   python -m benchmarks.check_cancellation   (or python benchmarks/check_cancellation.py)
+#
+# Each scenario starts an answer (answer_client.AnswerHandle, local mode), cancels it the
+# way a frontend would, and then checks that the mock saw the connection close, that no
+# limiter slot is still held and that the cut-off request was counted in the usage
+# statistics. Scenarios: cancel() while waiting for the first token and mid-stream, from
+# a thread (Streamlit) and from the event loop (Chainlit stop, answer service disconnect);
+# the generator closed by a Streamlit rerun; a Chainlit task cancelled; and two sessions
+# sharing one upstream request, which must survive the first cancel. Prints one JSON
+# object per scenario; exits with 1 if any fails.
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import subprocess
+import urllib.request
+from itertools import count
+from typing import Callable, Dict
+
+# The app modules live in the repository root, which is not on the path when this file
+# is run as a script
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_questions = count()
+
+
+def mock_streams(base_url: str) -> Dict[str, int]:
+    with urllib.request.urlopen(base_url + "/mock/stats", timeout=5) as response:
+        return json.loads(response.read())
+
+
+def wait_closed(base_url: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if mock_streams(base_url)["open"] == 0:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def new_handle():
+    import answer_client
+    from ai_teacher_assistant import StudentProfile
+
+    profile = StudentProfile("Check", "Mock School", "Middle", 9, "Science")
+    return answer_client.AnswerHandle(f"Explain topic {next(_questions)} for the check", profile)
+
+
+# Thread consuming a handle (a Streamlit session); returns (thread, deltas received)
+def consume(handle):
+    deltas = []
+    thread = threading.Thread(target=lambda: deltas.extend(handle), daemon=True)
+    thread.start()
+    return thread, deltas
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def thread_before_first_token(base_url: str) -> None:
+    handle = new_handle()
+    thread, _ = consume(handle)
+    wait_for(lambda: mock_streams(base_url)["open"] == 1)
+    handle.cancel()
+    thread.join(5)
+
+
+def thread_mid_stream(deltas_before: int) -> None:
+    handle = new_handle()
+    thread, deltas = consume(handle)
+    wait_for(lambda: len(deltas) >= deltas_before)
+    handle.cancel()
+    thread.join(5)
+
+
+def streamlit_rerun(deltas_before: int) -> None:
+    # write_stream is interrupted by the rerun and its generator is closed
+    stream = iter(new_handle())
+    for _ in range(deltas_before):
+        next(stream)
+    stream.close()
+
+
+async def _async_consume(handle, deltas):
+    async for delta in handle:
+        deltas.append(delta)
+
+
+# deltas_before=0: cancelled while the mock holds back the first token
+def async_cancel(base_url: str, deltas_before: int) -> None:
+    async def run():
+        handle, deltas = new_handle(), []
+        task = asyncio.create_task(_async_consume(handle, deltas))
+        while len(deltas) < deltas_before or not deltas_before and mock_streams(base_url)["open"] == 0:
+            await asyncio.sleep(0.005)
+        handle.cancel()
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(run())
+
+
+def chainlit_task_cancelled(deltas_before: int) -> None:
+    async def run():
+        handle, deltas = new_handle(), []
+        task = asyncio.create_task(_async_consume(handle, deltas))
+        while len(deltas) < deltas_before:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+
+
+def coalesced(base_url: str) -> bool:
+    first = new_handle()
+    second = new_handle()
+    second.question = first.question
+    threads = [consume(first), consume(second)]
+    wait_for(lambda: all(deltas for _, deltas in threads))
+    first.cancel()
+    threads[0][0].join(5)
+    time.sleep(0.3)
+    # The other session is still reading: the shared upstream request must go on
+    survived = mock_streams(base_url)["open"] == 1 and threads[1][0].is_alive()
+    second.cancel()
+    threads[1][0].join(5)
+    return survived
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that cancelled answers close their upstream connections")
+    parser.add_argument("--ttft", type=float, default=1.5, help="mock time to first token (s)")
+    parser.add_argument("--close-timeout", type=float, default=1.0,
+                        help="seconds the mock may take to see the connection closed")
+    args = parser.parse_args()
+
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_openai", "--port", "0",
+                               "--ttft-median", str(args.ttft), "--ttft-sigma", "0",
+                               "--tokens-per-s", "20", "--answer-tokens", "400"],
+                              stdout=subprocess.PIPE, text=True, cwd=ROOT)
+    failed = False
+    try:
+        base_url = server.stdout.readline().split()[-1]
+        os.environ.update(OPENAI_API_KEY="mock", OPENAI_BASE_URL=base_url, ANSWER_CACHE="0")
+        os.environ.pop("ANSWER_SERVICE_URL", None)
+        import ai_teacher_assistant as core
+        from rate_limiter import limiter
+
+        scenarios = {
+            "thread_cancel_before_first_token": lambda: thread_before_first_token(base_url),
+            "thread_cancel_mid_stream": lambda: thread_mid_stream(5),
+            "streamlit_rerun_closes_generator": lambda: streamlit_rerun(5),
+            "async_cancel_before_first_token": lambda: async_cancel(base_url, 0),
+            "async_cancel_mid_stream": lambda: async_cancel(base_url, 5),
+            "chainlit_task_cancelled": lambda: chainlit_task_cancelled(5),
+        }
+        for name, scenario in scenarios.items():
+            before = core.usage_stats.snapshot()["cut_off"]
+            scenario()
+            cancelled = time.perf_counter()
+            closed = wait_closed(base_url, args.close_timeout)
+            closed_ms = round((time.perf_counter() - cancelled) * 1e3, 1)
+            # The cut-off request is settled right after its connection drops
+            wait_for(lambda: limiter.stats()["in_flight"] == 0, 1.0)
+            result = {
+                "scenario": name,
+                "connection_closed": closed,
+                "closed_after_ms": closed_ms if closed else None,
+                "limiter_in_flight": limiter.stats()["in_flight"],
+                "usage_cut_off": core.usage_stats.snapshot()["cut_off"] - before,
+            }
+            result["ok"] = closed and result["limiter_in_flight"] == 0 and result["usage_cut_off"] == 1
+            failed |= not result["ok"]
+            print(json.dumps(result), flush=True)
+
+        survived = coalesced(base_url)
+        closed = wait_closed(base_url, args.close_timeout)
+        result = {"scenario": "coalesced_survives_first_cancel", "shared_request_survived": survived,
+                  "connection_closed": closed, "ok": survived and closed}
+        failed |= not result["ok"]
+        print(json.dumps(result), flush=True)
+        print(json.dumps({"mock_streams": mock_streams(base_url), "usage": core.usage_stats.snapshot()}), flush=True)
+    finally:
+        server.terminate()
+        server.wait()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
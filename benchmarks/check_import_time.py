@@ -0,0 +1,70 @@
+# Import-time budget for the core modules, measured with `python -X importtime`.
+#
+#   python -m benchmarks.check_import_time --budget-ms 150
+#
+# Each module is imported in a fresh interpreter (median of --runs). The check fails
+# (exit status 1) when a module's cumulative import time is over budget, or when it
+# pulls in one of the heavy packages that must only load on first use (the OpenAI SDK,
+# httpx, NumPy, tiktoken). Prints one JSON object per module; suitable for CI.
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Tuple
+
+MODULES = ("ai_teacher_assistant", "answer_cache", "rate_limiter", "single_flight", "prompt_templates",
+           "conversation_memory", "session_store", "telemetry", "batch_answer", "model_router",
+           "answer_client", "profile_message", "codec", "hedging", "cancellation", "answer_pack", "prefetch")
+HEAVY = ("openai", "httpx", "numpy", "tiktoken")
+
+
+# (cumulative microseconds of `module`, top-level packages imported while importing it)
+def import_profile(module: str) -> Tuple[int, set]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    cumulative, packages = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        name = name.strip()
+        packages.add(name.split(".")[0])
+        if name == module:
+            cumulative = int(total)
+    return cumulative, packages
+
+
+def check(module: str, runs: int, budget_ms: float) -> Dict:
+    samples, packages = [], set()
+    for _ in range(runs):
+        cumulative, packages = import_profile(module)
+        samples.append(cumulative)
+    heavy = sorted(packages.intersection(HEAVY))
+    import_ms = statistics.median(samples) / 1000
+    return {
+        "module": module,
+        "import_ms": round(import_ms, 1),
+        "budget_ms": budget_ms,
+        "heavy_imports": heavy,
+        "ok": import_ms <= budget_ms and not heavy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time budget of the core modules")
+    parser.add_argument("--modules", default=",".join(MODULES))
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules.split(","):
+        result = check(module, args.runs, args.budget_ms)
+        failed |= not result["ok"]
+        print(json.dumps(result), flush=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
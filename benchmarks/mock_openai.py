@@ -0,0 +1,242 @@
+# Local stand-in for the OpenAI chat completions API, for benchmarks without network access.
+#
+#   python -m benchmarks.mock_openai --port 8765 --ttft-median 0.4 --tokens-per-s 60 --error-rate 0.02
+#
+# Serves POST /v1/chat/completions (streaming SSE or plain JSON, with usage) and answers
+# anything else with 200, which is enough for prewarm. Time to first token follows a
+# log-normal distribution around --ttft-median, except for the --slow-rate fraction of
+# requests that stall for --slow-ttft seconds; tokens then arrive at --tokens-per-s.
+# Injected failures: 429 with retry-after-ms (--error-rate), 500 (--server-error-rate)
+# and streams cut off halfway (--drop-rate). Streams send their headers at once and then
+# wait for the first token, like the real API, and stop as soon as the client hangs up;
+# GET /mock/stats counts streams opened, still open and abandoned by the client.
+# Prints "listening on <base url>" once ready.
+import json
+import math
+import time
+import random
+import select
+import socket
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+WORDS = ("the", "energy", "plant", "water", "light", "cell", "force", "number", "equal", "because",
+         "example", "step", "result", "so", "we", "get", "first", "then", "finally", "answer")
+
+
+class MockConfig:
+    def __init__(self, ttft_median: float = 0.3, ttft_sigma: float = 0.5, tokens_per_s: float = 80.0,
+                 answer_tokens: int = 150, error_rate: float = 0.0, server_error_rate: float = 0.0,
+                 drop_rate: float = 0.0, seed: Optional[int] = None, slow_rate: float = 0.0,
+                 slow_ttft: float = 10.0):
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_s = tokens_per_s
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.drop_rate = drop_rate
+        self.slow_rate = slow_rate
+        self.slow_ttft = slow_ttft
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.streams = {"opened": 0, "open": 0, "client_closed": 0}
+
+    def draw(self):
+        with self.lock:
+            ttft = self.ttft_median * math.exp(self.random.gauss(0.0, self.ttft_sigma)) if self.ttft_median else 0.0
+            roll = self.random.random()
+            drop = self.random.random() < self.drop_rate
+            if self.random.random() < self.slow_rate:
+                ttft = self.slow_ttft
+        if roll < self.error_rate:
+            failure = 429
+        elif roll < self.error_rate + self.server_error_rate:
+            failure = 500
+        else:
+            failure = None
+        return ttft, failure, drop
+
+    def count(self, name: str, delta: int = 1) -> None:
+        with self.lock:
+            self.streams[name] += delta
+
+    def as_dict(self):
+        return {k: v for k, v in vars(self).items() if k not in ("random", "lock", "streams")}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: MockConfig = MockConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    # Sleep, but return early (raising ConnectionResetError) if the client hangs up
+    def _wait(self, seconds: float) -> None:
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            readable, _, _ = select.select([self.connection], [], [], remaining)
+            if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                raise ConnectionResetError("client closed the connection")
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/mock/stats"):
+            with self.config.lock:
+                self._send_json(200, dict(self.config.streams))
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self._send_json(200, {})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+            return
+
+        config = self.config
+        ttft, failure, drop = config.draw()
+        if failure == 429:
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}},
+                            {"retry-after-ms": "200"})
+            return
+        if failure == 500:
+            self._send_json(500, {"error": {"message": "Internal error (mock)", "type": "server_error"}})
+            return
+
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4 + 1
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": config.answer_tokens,
+                 "total_tokens": prompt_tokens + config.answer_tokens,
+                 "prompt_tokens_details": {"cached_tokens": 0}}
+        model = body.get("model", "mock")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            text = " ".join(WORDS[i % len(WORDS)] for i in range(config.answer_tokens))
+            time.sleep(ttft + (config.answer_tokens / config.tokens_per_s if config.tokens_per_s else 0))
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta: dict, finish: Optional[str] = None, with_usage: Optional[dict] = None) -> None:
+            chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                     "usage": with_usage}
+            self._send_chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+
+        interval = 1.0 / config.tokens_per_s if config.tokens_per_s else 0.0
+        cut = config.answer_tokens // 2 if drop else None
+        config.count("opened")
+        config.count("open")
+        try:
+            self._wait(ttft)
+            event({"role": "assistant", "content": ""})
+            for i in range(config.answer_tokens):
+                if i == cut:
+                    # Simulated upstream failure: drop the connection mid-body
+                    self.close_connection = True
+                    return
+                event({"content": ("" if i == 0 else " ") + WORDS[i % len(WORDS)]})
+                if interval:
+                    self._wait(interval)
+            event({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event(None, with_usage=usage)
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away (cancelled request)
+            self.close_connection = True
+            config.count("client_closed")
+        finally:
+            config.count("open", -1)
+
+
+def serve(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft-median", type=float, default=0.3, help="median time to first token (s)")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="log-normal spread of the TTFT")
+    parser.add_argument("--tokens-per-s", type=float, default=80.0)
+    parser.add_argument("--answer-tokens", type=int, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="fraction answered with 500")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of streams cut off halfway")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that stall")
+    parser.add_argument("--slow-ttft", type=float, default=10.0, help="time to first token of a stalled request (s)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(args.ttft_median, args.ttft_sigma, args.tokens_per_s, args.answer_tokens,
+                      args.error_rate, args.server_error_rate, args.drop_rate, args.seed,
+                      args.slow_rate, args.slow_ttft)
+
+
+def mock_arguments(args) -> list:
+    return [
+        "--ttft-median", str(args.ttft_median), "--ttft-sigma", str(args.ttft_sigma),
+        "--tokens-per-s", str(args.tokens_per_s), "--answer-tokens", str(args.answer_tokens),
+        "--error-rate", str(args.error_rate), "--server-error-rate", str(args.server_error_rate),
+        "--drop-rate", str(args.drop_rate), "--slow-rate", str(args.slow_rate), "--slow-ttft", str(args.slow_ttft),
+        *(["--seed", str(args.seed)] if args.seed is not None else []),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI chat completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = serve(config_from_args(args), args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"listening on http://{host}:{port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
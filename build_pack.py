@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from answer_cache import cache_key
+from answer_pack import write_pack
+from batch_answer import read_rows
+from prompt_templates import PROMPT_VERSION
+from ai_teacher_assistant import StudentProfile, ask_openai_async, get_academic_level, router, usage_stats
+
+# Build a precomputed answer pack (see answer_pack) from a question list.
+#
+#   python build_pack.py syllabus-science.csv .cache/packs/science.pack --concurrency 8
+#
+# Each row (CSV header or JSONL object) has Class, Subject and question; rows that already
+# have an answer (e.g. reviewed batch_answer output) are packed as they are, the others
+# are answered through the normal pipeline, so answers already in the cache or in a pack
+# cost no API call and a re-run after a failure only pays for the missing ones. Questions
+# are keyed like the answer cache (normalized question, Academic_Level, Subject, model,
+# prompt version): repeats are packed once, and the pack only serves the model and prompt
+# version it was built with. The pack is written next to the output and renamed over it,
+# so running apps pick up the new version within ANSWER_PACK_CHECK_INTERVAL.
+
+
+# (cache key, profile, question, answer or None) for one row
+def parse_row(row: Dict) -> Tuple[str, StudentProfile, str, Optional[str]]:
+    missing = [name for name in ("Class", "Subject", "question") if not str(row.get(name, "")).strip()]
+    if missing:
+        raise ValueError(f"missing field(s): {', '.join(missing)}")
+    class_num = int(row["Class"])
+    profile = StudentProfile("", "", get_academic_level(class_num), class_num, str(row["Subject"]).strip())
+    question = str(row["question"]).strip()
+    key = cache_key(question, profile.Academic_Level, profile.Subject, router.namespace, PROMPT_VERSION)
+    return key, profile, question, str(row.get("answer") or "").strip() or None
+
+
+async def build_pack(input_path: str, output_path: str, version: str, concurrency: int = 8) -> Dict:
+    start = time.perf_counter()
+    usage_start = usage_stats.snapshot()
+    entries: Dict[str, str] = {}
+    pending: Dict[str, Tuple[StudentProfile, str]] = {}
+    errors: List[str] = []
+    rows = 0
+    for index, row in enumerate(read_rows(input_path)):
+        rows += 1
+        try:
+            key, profile, question, answer = parse_row(row)
+        except ValueError as e:
+            errors.append(f"row {index}: {e}")
+            continue
+        if answer is not None:
+            entries[key] = answer
+        elif key not in entries:
+            pending[key] = (profile, question)
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def answer(key: str, profile: StudentProfile, question: str) -> None:
+        async with slots:
+            try:
+                text = await ask_openai_async(question, profile)
+            except Exception as e:
+                errors.append(f"{question!r}: {type(e).__name__}: {e}")
+                return
+        if text:
+            entries[key] = text
+
+    await asyncio.gather(*(answer(key, *item) for key, item in pending.items() if key not in entries))
+    write_pack(output_path, entries, {
+        "version": version,
+        "namespace": f"{router.namespace}-v{PROMPT_VERSION}",
+        "source": os.path.basename(input_path),
+        "built": time.time(),
+    })
+
+    for error in errors:
+        print(f"[error] {error}", file=sys.stderr)
+    usage = usage_stats.snapshot()
+    stats = {
+        "rows": rows,
+        "answers": len(entries),
+        "errors": len(errors),
+        "api_requests": usage["requests"] - usage_start["requests"],
+        "pack_bytes": os.path.getsize(output_path),
+        "version": version,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+    print("[done] " + json.dumps(stats), file=sys.stderr, flush=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a question list into a memory-mapped answer pack.")
+    parser.add_argument("input", help="questions file (.jsonl or .csv) with Class, Subject, question")
+    parser.add_argument("output", help="pack file to write, e.g. .cache/packs/science.pack")
+    parser.add_argument("--version", default=time.strftime("%Y%m%d-%H%M%S"), help="version label stored in the pack")
+    parser.add_argument("--concurrency", type=int, default=8, help="questions answered at once")
+    args = parser.parse_args()
+    stats = asyncio.run(build_pack(args.input, args.output, args.version, args.concurrency))
+    sys.exit(1 if stats["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import socket
+import threading
+import contextvars
+from typing import Callable, List, Optional
+
+# Cancelling an answer that nobody will read any more (a Streamlit rerun or closed tab, a
+# Chainlit stop or disconnect, a hedge that lost the race). A CancelScope is handed to the
+# code producing the answer; cancel() runs its callbacks at once, from any thread. The
+# upstream call registers one that shuts down its HTTP connection, so the provider stops
+# generating (and billing) and the reading thread wakes up immediately, even while it is
+# still waiting for the first token.
+#
+# Sync upstream calls find their scope in a context variable, set by the thread that
+# produces the answer (single_flight, hedging); async ones are cancelled with their task.
+
+
+class AnswerCancelled(Exception):
+    pass
+
+
+class CancelScope:
+    def __init__(self, parent: Optional["CancelScope"] = None):
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.cancelled = False
+        if parent is not None:
+            parent.on_cancel(self.cancel)
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    # Runs `callback` on cancel (right away if already cancelled); returns the unregister function
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return lambda: self._discard(callback)
+        callback()
+        return lambda: None
+
+    def _discard(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise AnswerCancelled()
+
+
+_current: contextvars.ContextVar[Optional[CancelScope]] = contextvars.ContextVar("cancel_scope", default=None)
+
+
+def current() -> Optional[CancelScope]:
+    return _current.get()
+
+
+def enter(scope: Optional[CancelScope]) -> None:
+    _current.set(scope)
+
+
+# Wake a thread blocked reading `response` (httpx) and drop its connection. Closing a socket
+# does not interrupt a blocked read on every platform; shutting it down does. HTTP/2
+# connections carry other requests too, so they are left to close at the next chunk.
+def abort_response(response) -> None:
+    if getattr(response, "http_version", "HTTP/1.1") != "HTTP/1.1":
+        return
+    network = response.extensions.get("network_stream")
+    sock = network.get_extra_info("socket") if network is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
@@ -1,49 +1,89 @@
-
-import os
 import chainlit as cl
-from ai_teacher_assistant import StudentProfile, map_class_to_academic_level, build_system_prompt, teacher_answer_question
+from ai_teacher_assistant import StudentProfile
+from prompt_templates import get_template
+from conversation_memory import ConversationMemory
+from session_store import get_store
+from profile_message import PROFILE_EXAMPLE, ProfileError, parse_profile
+import answer_client
+import telemetry
 
 # A very small stateful UI. Chainlit will show a chat-like interface.
+# The student sets a profile by typing it as JSON; every other message is a question
+# answered for that profile. The profile lives in cl.user_session (and the shared
+# session store), so each chat keeps its own student.
+#
+#   chainlit run chatbot.py
+
+
+# Set the session's profile and build its (level, subject) prompt prefix now, so the
+# first question does not pay for it
+def set_profile(profile: StudentProfile) -> None:
+    cl.user_session.set("student_profile", profile)
+    get_template().prefix(profile.Academic_Level, profile.Subject)
+    get_store().save_profile(cl.user_session.get("id"), profile)
+
 
 @cl.on_chat_start
 async def start():
-    await cl.Message("Welcome to AI Teacher Assistant (Chainlit UI). Click the button to set up a student profile.").send()
+    cl.user_session.set("memory", ConversationMemory())
+    saved = get_store().load_profile(cl.user_session.get("id"))
+    if saved:
+        set_profile(StudentProfile(**saved))
+        await cl.Message(f"Welcome back! Profile: {saved['Student_Name']} ({saved['Academic_Level']}, "
+                         f"{saved['Subject']}). Ask your question.").send()
+    else:
+        await cl.Message(
+            "Welcome to AI Teacher Assistant (Chainlit UI). Click the button to set up a student profile.",
+            actions=[cl.Action(name="create_profile", payload={}, label="Create Profile")],
+        ).send()
+    # First session in this process opens the API connection while the student types
+    await answer_client.prewarm_async()
 
 
-@cl.action(name="Create Profile")
-async def create_profile_action(obj, **kwargs):
-    # In a real UI you'd collect inputs with forms; chainlit's UI forms are omitted here for brevity.
-    # We'll prompt the user to type a JSON profile in chat, then parse it.
-    await cl.Message("Please type your profile as JSON, for example:\n{\n  \"student_name\": \"Aisha\",\n  \"academic_name\": \"City High\",\n  \"student_class\": 10,\n  \"subject\": \"Physics\"\n}\n").send()
+@cl.action_callback("create_profile")
+async def create_profile_action(action: cl.Action):
+    # Chainlit forms are omitted for brevity: the profile is typed into the chat as JSON
+    await cl.Message(f"Please type your profile as JSON, for example:\n```json\n{PROFILE_EXAMPLE}\n```").send()
 
 
 @cl.on_message
-async def main(message: str):
-    text = message
-    # Attempt to detect a JSON profile first
+async def main(message: cl.Message):
+    with telemetry.timed("chainlit", "chatbot_message"):
+        await handle_message(message.content)
+
+
+async def handle_message(text: str):
+    # Profiles first: a cheap shape check, so ordinary questions are never parsed as JSON
     try:
-        data = json.loads(text)
-        if all(k in data for k in ("student_name", "student_class", "subject")):
-            profile = StudentProfile(
-                student_name=data.get("student_name"),
-                academic_name=data.get("academic_name", "Unknown"),
-                student_class=int(data.get("student_class")),
-                academic_level=map_class_to_academic_level(int(data.get("student_class"))),
-                subject=data.get("subject"),
-                age=data.get("age")
-            )
-            await cl.Message(f"Profile set: {profile}").send()
-            return
-    except Exception:
-        pass
-
-    # Otherwise treat the message as a question and respond
-    # NOTE: chainlit handlers can call synchronous functions but prefer async; for simplicity we call sync function
+        profile = parse_profile(text)
+    except ProfileError as e:
+        await cl.Message(f"⚠️ That looks like a profile, but {e}.").send()
+        return
+    if profile is not None:
+        if cl.user_session.get("student_profile") is not None:
+            # Another student: start their conversation fresh
+            cl.user_session.get("memory").clear()
+            get_store().clear_turns(cl.user_session.get("id"))
+        set_profile(profile)
+        await cl.Message(f"✅ Profile set: {profile.Student_Name} ({profile.Academic_Level}, class "
+                         f"{profile.Class}), subject {profile.Subject}. Ask your question.").send()
+        return
+
+    profile = cl.user_session.get("student_profile")
+    if profile is None:
+        await cl.Message(f"Please set your profile first, for example:\n```json\n{PROFILE_EXAMPLE}\n```").send()
+        return
+
+    answer = cl.Message(content="")
+    parts = []
     try:
-        # 'profile' would normally be stored per-session; here we use a placeholder
-        # If you want full session state, integrate with a small DB or chainlit's state storage (not shown here).
-        dummy_profile = StudentProfile("Student", "Unknown", 10, "Matric", "General")
-        answer = teacher_answer_question(dummy_profile, text)
-        await cl.Message(answer).send()
+        async for delta in answer_client.stream_answer_async(text, profile, session=cl.user_session.get("id"),
+                                                             memory=cl.user_session.get("memory")):
+            parts.append(delta)
+            await answer.stream_token(delta)
     except Exception as e:
-        await cl.Message(f"Error processing question: {e}").send()
+        await answer.stream_token(f"\n\n❌ Error processing question: {e}")
+        await answer.send()
+        return
+    await answer.send()
+    get_store().append_turn(cl.user_session.get("id"), text, "".join(parts).strip())
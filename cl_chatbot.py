@@ -1,6 +1,9 @@
 import chainlit as cl
-import json
-from ai_teacher_assistant import StudentProfile, get_academic_level, ask_openai
+from ai_teacher_assistant import StudentProfile, get_academic_level
+import answer_client
+from conversation_memory import ConversationMemory
+from session_store import get_store
+import telemetry
 
 # Helper: Profile --> readable string 
 def format_profile(profile: StudentProfile) -> str:
@@ -28,14 +31,21 @@ async def start():
     cl.user_session.set("step", "name")
     cl.user_session.set("temp_data", {})
     cl.user_session.set("student_profile", None)
+    cl.user_session.set("memory", ConversationMemory())
 
     await cl.Message(
         content="👋 Welcome! Let's build your student profile.\nPlease enter your Name:"
     ).send()
+    # First session in this process opens the API connection while the student types
+    await answer_client.prewarm_async()
 
-# Handle messages
+# Handle messages (timed per step when telemetry is enabled)
 @cl.on_message
 async def main(message: cl.Message):
+    with telemetry.timed("chainlit", cl.user_session.get("step") or "start"):
+        await handle_message(message)
+
+async def handle_message(message: cl.Message):
     step = cl.user_session.get("step")
     temp_data = cl.user_session.get("temp_data")
     student_profile: StudentProfile = cl.user_session.get("student_profile")
@@ -75,6 +85,7 @@ async def main(message: cl.Message):
 
             cl.user_session.set("student_profile", student_profile)
             cl.user_session.set("step", "menu")
+            get_store().save_profile(cl.user_session.get("id"), student_profile)
 
             await cl.Message(content="✅ Profile Created:\n" + format_profile(student_profile)).send()
             await cl.Message(content=menu_text()).send()
@@ -95,6 +106,8 @@ async def main(message: cl.Message):
                 # Reset student
                 cl.user_session.set("student_profile", None)
                 cl.user_session.set("temp_data", {})
+                cl.user_session.get("memory").clear()
+                get_store().clear_turns(cl.user_session.get("id"))
                 cl.user_session.set("step", "name")
                 await cl.Message(content="🔄 Switching Student... Enter Name:").send()
 
@@ -102,6 +115,8 @@ async def main(message: cl.Message):
                 # Restart session
                 cl.user_session.set("student_profile", None)
                 cl.user_session.set("temp_data", {})
+                cl.user_session.get("memory").clear()
+                get_store().clear_turns(cl.user_session.get("id"))
                 cl.user_session.set("step", "name")
                 await cl.Message(content="🚀 Starting new session...\nPlease enter your Name:").send()
 
@@ -112,8 +127,18 @@ async def main(message: cl.Message):
                 await cl.Message(content="⚠️ Invalid choice, select 1-5.").send()
 
         elif step == "ask":
-            answer = ask_openai(message.content, student_profile)
-            await cl.Message(content=f"🧑‍🏫 Answer:\n{answer}").send()
+            answer_msg = cl.Message(content="🧑‍🏫 Answer:\n")
+            parts = []
+            handle = answer_client.AnswerHandle(message.content, student_profile, session=cl.user_session.get("id"),
+                                                memory=cl.user_session.get("memory"))
+            cl.user_session.set("answer", handle)
+            async for delta in handle:
+                parts.append(delta)
+                await answer_msg.stream_token(delta)
+            await answer_msg.send()
+            # Keep the transcript in the shared session store instead of this worker's memory
+            if not handle.cancelled:
+                get_store().append_turn(cl.user_session.get("id"), message.content, "".join(parts).strip())
             cl.user_session.set("step", "menu")
             await cl.Message(content=menu_text()).send()
 
@@ -121,5 +146,20 @@ async def main(message: cl.Message):
             student_profile.Subject = message.content.strip()
             cl.user_session.set("student_profile", student_profile)
             cl.user_session.set("step", "menu")
+            get_store().save_profile(cl.user_session.get("id"), student_profile)
             await cl.Message(content=f"✅ Subject updated to {student_profile.Subject}").send()
             await cl.Message(content=menu_text()).send()
+
+# Stop button or closed chat: stop the answer being generated, upstream too
+def cancel_answer():
+    handle = cl.user_session.get("answer")
+    if handle is not None and not handle.finished:
+        handle.cancel()
+
+@cl.on_stop
+async def stop():
+    cancel_answer()
+
+@cl.on_chat_end
+async def end():
+    cancel_answer()
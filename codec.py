@@ -0,0 +1,67 @@
+import json
+import importlib.util
+from typing import Any, Dict, Sequence, Union
+
+# Serialization for the hot paths: stored profiles, roster rows, chat turns and the answer
+# service protocol. Uses the fastest JSON library installed (msgspec, then orjson, then the
+# standard library); all three produce compact UTF-8 JSON that any of them can read.
+#
+# Profiles and turns are written as positional arrays in field order
+# (["Aisha", "City High", "Matric", 10, "Physics"]) instead of objects: no repeated keys
+# to write, parse or store. Readers still accept the object form written before.
+# `python wp.py` compares this against Pydantic, TypedDict and dataclass + asdict.
+
+if importlib.util.find_spec("msgspec") is not None:
+    import msgspec
+
+    BACKEND = "msgspec"
+    _encode = msgspec.json.encode
+    _decode = msgspec.json.decode
+elif importlib.util.find_spec("orjson") is not None:
+    import orjson
+
+    BACKEND = "orjson"
+    _encode = orjson.dumps
+    _decode = orjson.loads
+else:
+    BACKEND = "json"
+
+    def _encode(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _decode = json.loads
+
+PROFILE_FIELDS = ("Student_Name", "Academic_Name", "Academic_Level", "Class", "Subject")
+TURN_FIELDS = ("seq", "question", "answer", "created")
+
+
+def dumps(obj: Any) -> bytes:
+    return _encode(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    return _decode(data)
+
+
+def encode_profile(profile) -> bytes:
+    return _encode([profile.Student_Name, profile.Academic_Name, profile.Academic_Level, profile.Class,
+                    profile.Subject])
+
+
+def encode_profile_values(values: Sequence) -> bytes:
+    return _encode(list(values))
+
+
+# Profile fields as a dict (callers build their StudentProfile from it)
+def decode_profile(data: Union[bytes, str]) -> Dict:
+    value = _decode(data)
+    return value if isinstance(value, dict) else dict(zip(PROFILE_FIELDS, value))
+
+
+def encode_turn(turn: Dict) -> bytes:
+    return _encode([turn["seq"], turn["question"], turn["answer"], turn["created"]])
+
+
+def decode_turn(data: Union[bytes, str]) -> Dict:
+    value = _decode(data)
+    return value if isinstance(value, dict) else dict(zip(TURN_FIELDS, value))
@@ -0,0 +1,163 @@
+import os
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Per-session conversation context with a hard token ceiling. Recent turns are sent
+# verbatim; once they outgrow the window, the oldest ones are folded into a running
+# summary by a background worker, so the request that triggers it never waits for the
+# summarization call. Instances are plain objects: keep one in st.session_state or
+# cl.user_session.
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "300"))
+# Turns always kept verbatim when older ones are summarized
+KEEP_RECENT_TURNS = int(os.getenv("KEEP_RECENT_TURNS", "2"))
+
+_summarizer_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summarize")
+
+_WORDS = re.compile(r"[a-z0-9]+")
+# Words that point back at the conversation
+_REFERS = frozenset("it its that this those these them they their above previous earlier last same".split())
+# Words a follow-up is made of besides those: asking for more, simpler, again, ...
+_FOLLOW_UP_WORDS = frozenset(
+    "a an the is are was were be do does did can could would will should you u i me my we please pls plz "
+    "of to in on at for with about from by and or but so not dont didnt doesnt still really just "
+    "what whats why how which who where when give tell show make explain repeat say mean means meaning understand get "
+    "more another other again example examples instance simpler easier simple bit little one some few "
+    "continue further elaborate detail details detailed deeper words terms language way clarify "
+    "practice question questions exercise exercises quiz".split()
+)
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("o200k_base")
+
+
+# Token count of a piece of text (tiktoken when installed, else ~4 characters per token)
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+# Questions that only make sense after the last turn: made of follow-up words alone
+# ("explain further", "why?", "another example"), or pointing back at it ("why does it
+# happen?") with at most two words that the last turn did not mention. Anything naming a
+# new topic is answered without the conversation, so it can hit the answer cache.
+def is_follow_up(question: str, previous: str = "") -> bool:
+    words = _WORDS.findall(question.lower().replace("'", ""))
+    topic = [w for w in words if w not in _REFERS and w not in _FOLLOW_UP_WORDS]
+    if not topic:
+        return bool(words)
+    if not any(w in _REFERS for w in words):
+        return False
+    known = {w.rstrip("s") for w in _WORDS.findall(previous.lower().replace("'", ""))}
+    return sum(w.rstrip("s") not in known for w in topic) <= 2
+
+
+class ConversationMemory:
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, summary_budget: int = SUMMARY_TOKEN_BUDGET,
+                 keep_recent: int = KEEP_RECENT_TURNS):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.keep_recent = keep_recent
+        # Turns not yet covered by the summary; folded ones are dropped
+        self.turns: List[Dict[str, str]] = []
+        self.summary = ""
+        self._pending = False
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_pending"] = False
+        return state
+
+    def __setstate__(self, state):
+        # Older pickles kept summarized turns at the front of the list
+        state["turns"] = state["turns"][state.pop("summarized", 0):]
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.turns = []
+            self.summary = ""
+
+    # Restore from stored turns (oldest first) when a saved session is reopened
+    def seed(self, turns: Iterable[Dict[str, str]]) -> None:
+        with self._lock:
+            self.turns = [{"question": t["question"], "answer": t["answer"]} for t in turns]
+            self.summary = ""
+
+    # Messages to insert before the question; [] when the question stands on its own
+    def context_for(self, question: str) -> List[Dict[str, str]]:
+        with self._lock:
+            last = self.turns[-1] if self.turns else None
+        if last is None or not is_follow_up(question, f"{last['question']} {last['answer']}"):
+            return []
+        return self.context_messages()
+
+    # Summary plus as many recent turns as fit in the budget, newest kept first
+    def context_messages(self) -> List[Dict[str, str]]:
+        with self._lock:
+            summary, recent = self.summary, list(self.turns)
+        used = count_tokens(summary) if summary else 0
+        kept: List[Dict[str, str]] = []
+        for turn in reversed(recent):
+            cost = count_tokens(turn["question"]) + count_tokens(turn["answer"])
+            if used + cost > self.budget:
+                break
+            used += cost
+            kept.append(turn)
+        messages = []
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+        for turn in reversed(kept):
+            messages.append({"role": "user", "content": turn["question"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+        return messages
+
+    def add_turn(self, question: str, answer: str,
+                 summarize: Optional[Callable[[str, List[Dict[str, str]]], str]] = None) -> None:
+        with self._lock:
+            self.turns.append({"question": question, "answer": answer})
+            size = sum(count_tokens(t["question"]) + count_tokens(t["answer"]) for t in self.turns)
+            if summarize is None or self._pending or size <= self.budget * 3 // 4:
+                return
+            upto = len(self.turns) - self.keep_recent
+            if upto <= 0:
+                return
+            self._pending = True
+            summary, batch = self.summary, self.turns[:upto]
+        _summarizer_pool.submit(self._fold, summarize, summary, batch)
+
+    def _fold(self, summarize, summary: str, batch: List[Dict[str, str]]) -> None:
+        try:
+            new_summary = summarize(summary, batch)
+            words = new_summary.split()
+            # Keep the summary itself inside its budget even if the model ran long
+            while words and count_tokens(" ".join(words)) > self.summary_budget:
+                words = words[: len(words) * 9 // 10]
+            with self._lock:
+                # Unless the conversation was cleared or reseeded meanwhile, the summary
+                # now covers the batch: drop it, so memory stays bounded by the window
+                if all(a is b for a, b in zip(self.turns, batch)) and len(self.turns) >= len(batch):
+                    self.summary = " ".join(words)
+                    del self.turns[: len(batch)]
+        except Exception as e:
+            logger.warning("conversation summary failed: %s", e)
+        finally:
+            self._pending = False
@@ -0,0 +1,246 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+
+import cancellation
+from cancellation import CancelScope
+
+# Hedged upstream requests, to cut the tail latency caused by the occasional very slow
+# completion. When a backup backend is configured (HEDGE_MODEL: another model, and/or
+# HEDGE_BASE_URL: another endpoint such as a local OpenAI-compatible server), a request
+# whose first token has not arrived by the hedge deadline is sent again to the backup.
+# Whichever answer starts first is streamed; the other is cancelled. The deadline is the
+# HEDGE_PERCENTILE of recent first-token times for that model (HEDGE_DELAY until there are
+# enough samples), so only the slowest few percent are hedged, and HEDGE_BUDGET caps the
+# extra requests as a fraction of all requests: a slow upstream is never hit with twice
+# the load.
+
+logger = logging.getLogger(__name__)
+
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+# Deadline (s) before HEDGE_MIN_SAMPLES first-token times are known, and the lower bound after
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "2.0"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# Extra requests allowed, as a fraction of requests (0.05 = at most 5% more upstream calls)
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))
+
+_END = object()
+
+
+def percentile(samples, p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))]
+
+
+class HedgePolicy:
+    def __init__(self, enabled: bool, percentile: float = HEDGE_PERCENTILE, budget: float = HEDGE_BUDGET,
+                 delay: float = HEDGE_DELAY, min_delay: float = HEDGE_MIN_DELAY,
+                 min_samples: int = HEDGE_MIN_SAMPLES, window: int = 500):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.delay = delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self._lock = threading.Lock()
+        self._ttfts: Dict[str, Deque[float]] = {}
+        # Hedges earned: +budget per request, -1 per hedge; a few may be saved up for a burst
+        self._credit = 1.0
+        self._max_credit = max(1.0, budget * 100)
+        self.requests = 0
+        self.hedged = 0
+        self.backup_wins = 0
+        self.over_budget = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    # Seconds to wait for the first token of `model` before hedging
+    def deadline(self, model: str) -> float:
+        with self._lock:
+            samples = self._ttfts.get(model)
+            if not samples or len(samples) < self.min_samples:
+                return self.delay
+            return max(self.min_delay, percentile(samples, self.percentile))
+
+    def begin(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._credit = min(self._max_credit, self._credit + self.budget)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                self.over_budget += 1
+                return False
+            self._credit -= 1.0
+            self.hedged += 1
+            return True
+
+    # ttft: time to the first token used, a lower bound for the primary's when the backup won
+    def observe(self, model: str, ttft: float, backup_won: bool) -> None:
+        with self._lock:
+            self._ttfts.setdefault(model, deque(maxlen=self.window)).append(ttft)
+            self.latencies.append(ttft)
+            if backup_won:
+                self.backup_wins += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            p99 = percentile(self.latencies, 99)
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+                "backup_wins": self.backup_wins,
+                "over_budget": self.over_budget,
+                "deadline_s": {m: round(max(self.min_delay, percentile(s, self.percentile)), 3)
+                               for m, s in self._ttfts.items() if len(s) >= self.min_samples},
+                "ttft_p99_s": round(p99, 3) if p99 is not None else None,
+            }
+
+
+def _first(stream: Iterator[str], index: int, events: "queue.Queue", losers: set, lock: threading.Lock) -> None:
+    try:
+        event = (index, next(stream, _END), None)
+    except BaseException as e:
+        event = (index, None, e)
+    with lock:
+        lost = index in losers
+        if not lost:
+            events.put(event)
+    if lost:
+        # Lost the race while waiting: stop it now (closes the HTTP stream, frees the slot)
+        stream.close()
+
+
+# Sync race: each candidate waits for its first token on a helper thread, under its own
+# CancelScope; the winner is then read by the caller. Cancelling a loser's scope drops its
+# connection, and its helper closes it.
+def race(model: str, primary: Callable[[], Iterator[str]], backup: Callable[[], Iterator[str]],
+         policy: HedgePolicy) -> Iterator[str]:
+    start = time.perf_counter()
+    policy.begin()
+    events: "queue.Queue" = queue.Queue()
+    losers: set = set()
+    lock = threading.Lock()
+    streams: List[Iterator[str]] = []
+    scopes: List[CancelScope] = []
+    parent = cancellation.current()
+
+    def launch(factory: Callable[[], Iterator[str]]) -> None:
+        scopes.append(CancelScope(parent))
+        context = contextvars.copy_context()
+        context.run(cancellation.enter, scopes[-1])
+        streams.append(factory())
+        threading.Thread(target=context.run, args=(_first, streams[-1], len(streams) - 1, events, losers, lock),
+                         daemon=True).start()
+
+    launch(primary)
+    winner, first, error, waiting = None, None, None, 1
+    timeout: Optional[float] = policy.deadline(model)
+    while winner is None and waiting:
+        try:
+            index, first, failure = events.get(timeout=timeout)
+        except queue.Empty:
+            timeout = None
+            if policy.allow():
+                logger.info("hedge: no first token from %s after %.2fs, trying the backup", model,
+                            time.perf_counter() - start)
+                launch(backup)
+                waiting += 1
+            continue
+        waiting -= 1
+        if failure is not None:
+            error = error or failure
+            # A failed primary before the deadline fails the request, as without hedging
+            if len(streams) == 1:
+                break
+            continue
+        winner = index
+
+    with lock:
+        losers.update(i for i in range(len(streams)) if i != winner)
+    for index in losers:
+        scopes[index].cancel()
+    # Losers that answered before they were marked: their helpers are done, close them here
+    while not events.empty():
+        index, _, failure = events.get_nowait()
+        if failure is None:
+            streams[index].close()
+    if winner is None:
+        raise error
+    policy.observe(model, time.perf_counter() - start, winner == 1)
+    stream = streams[winner]
+    try:
+        if first is not _END:
+            yield first
+        yield from stream
+    finally:
+        stream.close()
+
+
+async def _next(stream: AsyncIterator[str]):
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+# Async race: the loser is cancelled wherever it is (queued in the limiter or waiting for
+# its first token), which closes its HTTP stream and releases its limiter slot at once.
+async def race_async(model: str, primary: Callable[[], AsyncIterator[str]],
+                     backup: Callable[[], AsyncIterator[str]], policy: HedgePolicy) -> AsyncIterator[str]:
+    start = time.perf_counter()
+    policy.begin()
+    streams = [primary()]
+    tasks = {asyncio.ensure_future(_next(streams[0])): 0}
+    winner, first, error = None, None, None
+    try:
+        timeout: Optional[float] = policy.deadline(model)
+        while winner is None and tasks:
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                timeout = None
+                if policy.allow():
+                    logger.info("hedge: no first token from %s after %.2fs, trying the backup", model,
+                                time.perf_counter() - start)
+                    streams.append(backup())
+                    tasks[asyncio.ensure_future(_next(streams[1]))] = 1
+                continue
+            for task in sorted(done, key=tasks.get):
+                index = tasks.pop(task)
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                if winner is None:
+                    winner, first = index, task.result()
+            if winner is None and len(streams) == 1:
+                break
+        if winner is None:
+            raise error
+        await _cancel(tasks)
+        policy.observe(model, time.perf_counter() - start, winner == 1)
+        if first is not _END:
+            yield first
+        async for delta in streams[winner]:
+            yield delta
+    finally:
+        await _cancel(tasks)
+        for stream in streams:
+            await stream.aclose()
+
+
+async def _cancel(tasks: Dict) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    tasks.clear()
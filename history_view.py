@@ -0,0 +1,60 @@
+import os
+from functools import lru_cache
+from typing import Tuple
+
+import streamlit as st
+
+from session_store import SessionHistory
+
+# Paged chat-history rendering for the Streamlit apps. A rerun builds expanders for one
+# page only, whatever the length of the session. Older pages are read from the session
+# store when the student asks for them, and each entry's label and Markdown are
+# formatted once and then reused on later reruns. The sidebar profile card is cached here
+# too: a cache defined in the app script itself is rebuilt by every rerun.
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+
+
+# (expander label, question Markdown, answer Markdown) for one history entry
+@lru_cache(maxsize=4096)
+def entry_parts(number: int, question: str, answer: str) -> Tuple[str, str, str]:
+    short = question[:60] + "..." if len(question) > 60 else question
+    return f"Q{number}: {short}", f"**❓ Question:** {question}", f"**💡 Answer:** {answer}"
+
+
+# Sidebar profile text, formatted once per distinct profile (values: astuple(profile))
+@lru_cache(maxsize=256)
+def profile_card(values: tuple) -> str:
+    name, institution, level, class_num, subject = values
+    return f"**Name:** {name}\n**Institution:** {institution}\n**Level:** {level}\n**Class:** {class_num}\n**Subject:** {subject}"
+
+
+def show_history(history: SessionHistory, page_size: int = HISTORY_PAGE_SIZE) -> None:
+    state = st.session_state
+    if state.get("history_total") != len(history):
+        # A new or cleared turn shifts every page: go back to the newest one
+        state.history_total = len(history)
+        state.history_cursors = [None]
+    # history_cursors[k] is the seq that page k starts below (None = newest page)
+    cursors = state.history_cursors
+    offset = (len(cursors) - 1) * page_size
+    turns = history.page(cursors[-1], page_size)
+
+    for i, turn in enumerate(turns):
+        label, question, answer = entry_parts(len(history) - offset - i, turn["question"], turn["answer"])
+        with st.expander(label):
+            st.markdown(question)
+            st.markdown(answer)
+
+    shown = offset + len(turns)
+    if len(history) > page_size:
+        st.caption(f"Showing questions {offset + 1}–{shown} of {len(history)}, newest first.")
+    # Callbacks move the cursor before the next run, so one click costs one rerun
+    # (of the enclosing fragment only, when there is one)
+    col1, col2 = st.columns(2)
+    with col1:
+        if len(cursors) > 1:
+            st.button("⬅️ Newer", use_container_width=True, on_click=cursors.pop)
+    with col2:
+        if shown < len(history) and turns:
+            st.button("Load older ➡️", use_container_width=True, on_click=cursors.append, args=(turns[-1]["seq"],))
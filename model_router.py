@@ -0,0 +1,136 @@
+import os
+import re
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Sequence
+
+# Picks the model for each question. MODEL_TIERS lists models from cheapest to largest;
+# a local complexity score (Academic_Level, subject, wording) picks the starting tier.
+# The first few hundred characters of a cheaper tier's answer are held back and checked:
+# a hedging or refusing answer, or one that ends far too short for the level, is dropped
+# and the question goes to the next tier, so the student only ever sees one answer.
+# With a single tier (the default: MODEL_NAME) routing is off and nothing is held back.
+
+logger = logging.getLogger(__name__)
+
+# Score below THRESHOLDS[i] starts at tier i; anything higher starts at the last tier
+ROUTER_THRESHOLDS = [float(t) for t in os.getenv("ROUTER_THRESHOLDS", "0.4,0.75").split(",")]
+# Characters of a cheaper tier's answer checked before it is shown
+PROBE_CHARS = int(os.getenv("ROUTER_PROBE_CHARS", "240"))
+
+LEVEL_WEIGHT = {
+    "Primary": 0.0, "Secondary": 0.15, "Middle": 0.25, "Matric": 0.35, "Intermediate": 0.5,
+    "Graduation": 0.65, "Master": 0.8, "Ph.D": 0.9, "High Level": 0.6,
+}
+# Shortest acceptable complete answer (words) per level
+MIN_WORDS = {"Primary": 8, "Secondary": 15, "Middle": 20, "Matric": 25}
+DEFAULT_MIN_WORDS = 40
+
+_TECHNICAL_SUBJECT = re.compile(
+    r"math|physic|chemi|computer|program|statistic|econom|engineer|account|calculus|algebra", re.IGNORECASE)
+_HARD_WORDS = re.compile(
+    r"\b(prove|proof|derive|derivation|compare|contrast|analy[sz]e|evaluate|critically|justify|"
+    r"methodolog\w*|research|theorem|algorithm|optimi[sz]\w*|implications?|trade-?offs?|mechanism|"
+    r"differentiate|integrate|complexity)\b",
+    re.IGNORECASE,
+)
+_MATH = re.compile(r"[=^√∫∑]|\d+\s*[-+*/x×÷]\s*\d+")
+_DOUBT = re.compile(
+    r"\b(i'?m not sure|i am not sure|i don'?t know|i do not know|i cannot|i can'?t|as an ai|"
+    r"unable to (answer|help)|not able to answer|beyond my)\b",
+    re.IGNORECASE,
+)
+
+
+# Cheap local estimate in [0, 1] of how hard a question is to answer well
+def estimate_complexity(question: str, level: str, subject: str) -> float:
+    words = len(question.split())
+    score = 0.5 * LEVEL_WEIGHT.get(level, 0.6)
+    score += 0.2 * min(words / 60, 1.0)
+    score += 0.15 * min(len(_HARD_WORDS.findall(question)), 2)
+    if _TECHNICAL_SUBJECT.search(subject):
+        score += 0.1
+    # A bare sum ("what is 2+5") is easy; equations with several operations are not
+    if _MATH.search(question) and words > 8:
+        score += 0.05
+    if question.count("?") > 1:
+        score += 0.05
+    return min(score, 1.0)
+
+
+def is_doubtful(text: str) -> bool:
+    return bool(_DOUBT.search(text))
+
+
+def too_short(text: str, level: str) -> bool:
+    return len(text.split()) < MIN_WORDS.get(level, DEFAULT_MIN_WORDS)
+
+
+@dataclass(frozen=True)
+class Route:
+    tier: int
+    model: str
+    score: float
+
+
+class RouterStats:
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.routed: Dict[str, int] = {}
+        self.answered: Dict[str, int] = {}
+        self.escalations = 0
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.window = window
+
+    def record(self, route: Route, model: str, escalations: int, latency: float) -> None:
+        with self._lock:
+            self.routed[route.model] = self.routed.get(route.model, 0) + 1
+            self.answered[model] = self.answered.get(model, 0) + 1
+            self.escalations += escalations
+            self.latencies.setdefault(model, deque(maxlen=self.window)).append(latency)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            total = sum(self.routed.values())
+            p50 = {m: sorted(l)[len(l) // 2] for m, l in self.latencies.items() if l}
+            return {
+                "routed": dict(self.routed),
+                "answered": dict(self.answered),
+                "escalations": self.escalations,
+                "escalation_rate": self.escalations / total if total else 0.0,
+                "latency_p50_s": {m: round(v, 3) for m, v in p50.items()},
+            }
+
+
+class ModelRouter:
+    def __init__(self, tiers: Sequence[str], thresholds: Sequence[float] = ROUTER_THRESHOLDS):
+        self.tiers: List[str] = list(tiers)
+        self.thresholds = list(thresholds)[: len(self.tiers) - 1]
+        self.stats = RouterStats()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.tiers) > 1
+
+    # Part of the answer-cache key: answers from a routed setup are not mixed with
+    # answers cached under a single model
+    @property
+    def namespace(self) -> str:
+        return self.tiers[0] if not self.enabled else "route:" + ",".join(self.tiers)
+
+    def route(self, question: str, level: str, subject: str) -> Route:
+        score = estimate_complexity(question, level, subject)
+        tier = next((i for i, t in enumerate(self.thresholds) if score < t), len(self.tiers) - 1)
+        return Route(tier, self.tiers[tier], score)
+
+    def is_last(self, tier: int) -> bool:
+        return tier >= len(self.tiers) - 1
+
+    def record(self, route: Route, level: str, subject: str, tier: int, latency: float) -> None:
+        escalations = tier - route.tier
+        self.stats.record(route, self.tiers[tier], escalations, latency)
+        logger.info("route: level=%s subject=%s score=%.2f start=%s answered_by=%s escalations=%d total=%.3fs",
+                    level, subject, route.score, route.model, self.tiers[tier], escalations, latency)
+
@@ -0,0 +1,256 @@
+import os
+import re
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cancellation
+from cancellation import CancelScope
+
+# Speculative follow-up answers (optional, SPECULATIVE_PREFETCH=1). While the student reads
+# an answer, the follow-ups most often asked at that Academic_Level and Subject ("give an
+# example", "explain it simpler", ...) are answered in the background, in the context of
+# the conversation, and served at once if the next question is one of them.
+#
+# It only spends what would otherwise sit idle: a prefetch starts only when the rate
+# limiter has headroom (no one queued, under PREFETCH_MAX_SHARE of its concurrency and
+# tokens/min), gives its slot up as soon as a real request waits, and every session has a
+# strict PREFETCH_SESSION_TOKENS budget (estimated at ~4 characters per token; a stream
+# that would exceed it is cut off). When the student asks anything else, the unused
+# prefetches are dropped and any still generating are aborted upstream. snapshot() shows
+# whether it pays off: hit rate, follow-ups covered, and tokens served vs spent.
+#
+# State is per ConversationMemory (the per-session object every frontend already
+# passes), held weakly, so a session that goes away takes its prefetches with it.
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "0") == "1"
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "2"))
+PREFETCH_SESSION_TOKENS = int(os.getenv("PREFETCH_SESSION_TOKENS", "8000"))
+PREFETCH_MAX_SHARE = float(os.getenv("PREFETCH_MAX_SHARE", "0.5"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "8"))
+# Completion tokens a prefetch must be able to afford before it is started
+PREFETCH_MIN_COMPLETION = 100
+
+# (name, question sent upstream, how students ask it), most common first
+FOLLOW_UPS: Tuple[Tuple[str, str, "re.Pattern"], ...] = tuple(
+    (name, question, re.compile(pattern)) for name, question, pattern in (
+        ("example", "Give an example of that.", r"\b(examples?|instance)\b"),
+        ("simpler", "Explain that again in simpler words.",
+         r"\b(simpler|easier|simple|dont understand|didnt understand|dont get|confused|confusing)\b"),
+        ("practice", "Give me a few practice questions on this.", r"\b(practice|exercises?|quiz|test me|mcqs?)\b"),
+        ("detail", "Explain that in more detail.", r"\b(more|detail|details|detailed|elaborate|further|deeper)\b"),
+    )
+)
+
+_WORDS = re.compile(r"[a-z0-9]+")
+# Words a follow-up may use besides its keywords; anything else names a new topic
+# ("give an example of Newton's third law" is a new question, not a follow-up)
+_REFERRING = frozenset(
+    "a an the another one some few more of on about for with to in that this it these those them above "
+    "give me show tell explain make can could would you u i please pls plz again now also and or "
+    "do dont didnt not get understand so still really bit little words terms language way simple simpler "
+    "easier examples example instance practice question questions exercise exercises quiz test mcq mcqs "
+    "detail details detailed elaborate further deeper".split()
+)
+
+
+# Name of the follow-up `question` asks for, if it is one of FOLLOW_UPS
+def match_follow_up(question: str) -> Optional[str]:
+    text = " ".join(_WORDS.findall(question.lower().replace("'", "")))
+    if not text or any(word not in _REFERRING for word in text.split()):
+        return None
+    for name, _, pattern in FOLLOW_UPS:
+        if pattern.search(text):
+            return name
+    return None
+
+
+# How often each follow-up came next, per (Academic_Level, Subject) and overall
+class FollowUpModel:
+    def __init__(self):
+        self._counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, level: str, subject: str, name: str) -> None:
+        with self._lock:
+            for key in ((level, subject.strip().lower()), ("", "")):
+                counts = self._counts.setdefault(key, {})
+                counts[name] = counts.get(name, 0) + 1
+
+    # The k likeliest follow-ups: this level and subject first, then overall, then FOLLOW_UPS order
+    def predict(self, level: str, subject: str, k: int) -> List[Tuple[str, str]]:
+        with self._lock:
+            local = dict(self._counts.get((level, subject.strip().lower()), {}))
+            overall = dict(self._counts.get(("", ""), {}))
+        ranked = sorted(range(len(FOLLOW_UPS)), key=lambda i: (-local.get(FOLLOW_UPS[i][0], 0),
+                                                               -overall.get(FOLLOW_UPS[i][0], 0), i))
+        return [FOLLOW_UPS[i][:2] for i in ranked[:k]]
+
+
+class _Prefetch:
+    def __init__(self, name: str, question: str, last_turn: Dict[str, str], context: List[Dict[str, str]],
+                 level: str, subject: str):
+        self.name = name
+        self.question = question
+        # Valid only while this is still the last turn of the conversation
+        self.last_turn = last_turn
+        self.context = context
+        self.level = level
+        self.subject = subject
+        self.scope = CancelScope()
+        self.answer: Optional[str] = None
+        self.tokens = 0
+
+
+class _Session:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spent = 0
+        # Bumped by every question: prefetches queued for an older turn are not started
+        self.epoch = 0
+        self.pending: Dict[str, _Prefetch] = {}
+
+
+class Prefetcher:
+    # build(question, profile, context) -> messages; stream(question, profile, messages) -> deltas
+    def __init__(self, build: Callable, stream: Callable[..., Iterator[str]], limiter,
+                 top_k: int = PREFETCH_TOP_K, budget: int = PREFETCH_SESSION_TOKENS,
+                 share: float = PREFETCH_MAX_SHARE, workers: int = PREFETCH_WORKERS):
+        self.build = build
+        self.stream = stream
+        self.limiter = limiter
+        self.top_k = top_k
+        self.budget = budget
+        self.share = share
+        self.model = FollowUpModel()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._sessions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ("follow_ups", "scheduled", "generated", "hits", "late", "misses", "wasted", "skipped_busy",
+             "skipped_budget", "budget_cut", "preempted", "failed", "tokens_spent", "tokens_served"), 0)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    # Every question of a session goes through here first: returns the prefetched answer
+    # when the question is the follow-up it was prepared for, and drops the others
+    def take(self, memory, question: str, profile) -> Optional[str]:
+        name = match_follow_up(question)
+        if name is not None:
+            self._count("follow_ups")
+            self.model.record(profile.Academic_Level, profile.Subject, name)
+        session = self._sessions.get(memory)
+        pending: Dict[str, _Prefetch] = {}
+        if session is not None:
+            with session.lock:
+                session.epoch += 1
+                pending, session.pending = session.pending, {}
+        answer, late = None, False
+        for entry in pending.values():
+            usable = (entry.name == name and entry.level == profile.Academic_Level
+                      and entry.subject == profile.Subject and memory.turns and memory.turns[-1] is entry.last_turn)
+            if usable and entry.answer is not None:
+                answer = entry.answer
+                self._count("hits")
+                self._count("tokens_served", entry.tokens)
+                continue
+            # Still generating: too late for this question, and useless for the next ones
+            late = late or usable
+            if entry.answer is not None:
+                self._count("wasted")
+            entry.scope.cancel()
+        if answer is not None:
+            logger.info("prefetch hit: %s (%s, %s)", name, profile.Academic_Level, profile.Subject)
+        elif name is not None:
+            self._count("late" if late else "misses")
+        return answer
+
+    # After an answer: queue the likeliest follow-ups for this conversation
+    def schedule(self, memory, profile) -> None:
+        if not memory.turns:
+            return
+        session = self._sessions.get(memory)
+        if session is None:
+            session = self._sessions.setdefault(memory, _Session())
+        profile = replace(profile)
+        last_turn = memory.turns[-1]
+        with session.lock:
+            if session.spent + PREFETCH_MIN_COMPLETION > self.budget:
+                return
+            epoch = session.epoch
+            for name, question in self.model.predict(profile.Academic_Level, profile.Subject, self.top_k):
+                entry = _Prefetch(name, question, last_turn, memory.context_for(question),
+                                  profile.Academic_Level, profile.Subject)
+                session.pending[name] = entry
+                self._count("scheduled")
+                self._pool.submit(self._run, session, epoch, entry, profile)
+
+    def _run(self, session: _Session, epoch: int, entry: _Prefetch, profile) -> None:
+        if session.epoch != epoch or entry.scope.cancelled:
+            return
+        if not self.limiter.has_headroom(self.share):
+            self._drop(session, entry, "skipped_busy")
+            return
+        messages = self.build(entry.question, profile, entry.context)
+        prompt = sum(len(m["content"]) for m in messages) // 4
+        with session.lock:
+            affordable = session.spent + prompt + PREFETCH_MIN_COMPLETION <= self.budget
+            if affordable:
+                session.spent += prompt
+        if not affordable:
+            self._drop(session, entry, "skipped_budget")
+            return
+        entry.tokens, chars, parts = prompt, 0, []
+        cancellation.enter(entry.scope)
+        stream = self.stream(entry.question, profile, messages)
+        try:
+            for delta in stream:
+                parts.append(delta)
+                chars += len(delta)
+                cost = prompt + chars // 4 - entry.tokens
+                with session.lock:
+                    over = session.spent + cost > self.budget
+                    session.spent += cost
+                entry.tokens += cost
+                if over:
+                    self._drop(session, entry, "budget_cut")
+                    return
+                # Low priority: give the slot back to a student who is waiting for one
+                if not self.limiter.has_headroom(1.0):
+                    self._drop(session, entry, "preempted")
+                    return
+            entry.answer = "".join(parts).strip() or None
+            self._count("generated")
+        except Exception as e:
+            if not entry.scope.cancelled:
+                logger.warning("prefetch failed: %s", e)
+                self._drop(session, entry, "failed")
+        finally:
+            stream.close()
+            cancellation.enter(None)
+            self._count("tokens_spent", entry.tokens)
+
+    # This prefetch will not produce an answer: forget it, so its follow-up counts as a miss
+    def _drop(self, session: _Session, entry: _Prefetch, reason: str) -> None:
+        self._count(reason)
+        with session.lock:
+            if session.pending.get(entry.name) is entry:
+                del session.pending[entry.name]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["sessions"] = len(self._sessions)
+        # Prefetched answers that were used, follow-ups answered instantly, and useful tokens
+        stats["hit_rate"] = stats["hits"] / stats["generated"] if stats["generated"] else 0.0
+        stats["coverage"] = stats["hits"] / stats["follow_ups"] if stats["follow_ups"] else 0.0
+        stats["token_efficiency"] = (stats["tokens_served"] / stats["tokens_spent"]
+                                     if stats["tokens_spent"] else 0.0)
+        return stats
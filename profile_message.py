@@ -0,0 +1,56 @@
+import json
+from typing import Optional
+
+from ai_teacher_assistant import StudentProfile, get_academic_level
+
+# Profiles typed into the chat as JSON (chatbot.py). Nearly every message is an ordinary
+# question, so a message is only handed to json.loads when its shape says it can be a
+# profile object: braces at both ends and the required keys present as substrings.
+# Questions that merely contain braces ("is {1, 2} a set?") fail the check in a few
+# string operations instead of raising and catching a JSONDecodeError.
+
+REQUIRED_KEYS = ("student_name", "student_class", "subject")
+
+PROFILE_EXAMPLE = """{
+  "student_name": "Aisha",
+  "academic_name": "City High",
+  "student_class": 10,
+  "subject": "Physics"
+}"""
+
+
+class ProfileError(ValueError):
+    pass
+
+
+def looks_like_profile(text: str) -> bool:
+    text = text.strip()
+    return (text[:1] == "{" and text[-1:] == "}"
+            and all(f'"{key}"' in text for key in REQUIRED_KEYS))
+
+
+# The profile in `text`, or None when it is an ordinary message. Raises ProfileError for
+# a message that is clearly meant as a profile but is not a valid one.
+def parse_profile(text: str) -> Optional[StudentProfile]:
+    if not looks_like_profile(text):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise ProfileError(f"could not read the profile JSON: {e}") from None
+    if not isinstance(data, dict):
+        return None
+    missing = [key for key in REQUIRED_KEYS if not str(data.get(key) or "").strip()]
+    if missing:
+        raise ProfileError(f"missing field(s): {', '.join(missing)}")
+    try:
+        class_num = int(data["student_class"])
+    except (TypeError, ValueError):
+        raise ProfileError("student_class must be a number") from None
+    return StudentProfile(
+        Student_Name=str(data["student_name"]).strip(),
+        Academic_Name=str(data.get("academic_name") or "Unknown").strip(),
+        Academic_Level=get_academic_level(class_num),
+        Class=class_num,
+        Subject=str(data["subject"]).strip(),
+    )
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+# Prompt templates, kept short: input tokens are paid on every request. Each request
+# starts with the same brief instructions, then one line for its (level, subject) with only
+# the guidance that applies to it, then the volatile part (class + question). The shared
+# prefix stays far below the 1,024 tokens OpenAI needs before it caches anything, so it is
+# sized for cost, not for the provider cache.
+# Bump PROMPT_VERSION whenever any text here changes; it is part of the answer-cache key.
+
+PROMPT_VERSION = "3"
+
+STATIC_INSTRUCTIONS = ("You are a patient teacher assistant. Answer the question asked, correctly and at the "
+                       "student's level; say so if unsure. Use short paragraphs and Markdown, and show the "
+                       "working for calculations.")
+
+LEVEL_GUIDANCE = {
+    "Primary": "Very simple words and short sentences, under 120 words, with an everyday example.",
+    "Secondary": "Simple language, under 200 words; define new terms and give one example.",
+    "Middle": "Clear, under 250 words; correct terms, the reason behind rules and a worked example.",
+    "Matric": "Exam-oriented, under 300 words; expected definitions and formulas, one common mistake.",
+    "Intermediate": "Rigorous but accessible, under 400 words; proper notation, assumptions and limits.",
+    "Graduation": "University level, under 500 words; theory behind the method and trade-offs.",
+    "Master": "Advanced and concise; current methods, limitations and open questions.",
+    "Ph.D": "Research level; methodology, competing approaches and open problems.",
+}
+DEFAULT_LEVEL_GUIDANCE = "Treat the student as an advanced adult learner."
+
+# (words in the subject name, guidance), first match wins
+SUBJECT_GUIDANCE = (
+    (("math", "algebra", "geometry", "calculus", "statistic"), "Substitute step by step, keep units and check the result."),
+    (("physics",), "Start from the governing law and give SI units."),
+    (("chem",), "Use balanced equations."),
+    (("bio",), "Explain structure with function and processes as steps."),
+    (("computer", "programming", "coding"), "Give a small runnable code example."),
+    (("english", "urdu", "language", "literature", "grammar"), "Use example sentences; outline essays, don't write them."),
+    (("history", "geography", "social", "civics", "pakistan studies"), "Give dates, places, causes and effects."),
+    (("islam", "religion", "ethics"), "Be respectful, quote sources accurately and note where scholars differ."),
+)
+
+
+def _guidance(level: str, subject: str) -> str:
+    lowered = subject.lower()
+    lines = [LEVEL_GUIDANCE.get(level, DEFAULT_LEVEL_GUIDANCE)]
+    lines += [text for words, text in SUBJECT_GUIDANCE if any(w in lowered for w in words)][:1]
+    return " ".join(lines)
+
+
+SUMMARY_INSTRUCTIONS = """Summarize this tutoring conversation for the teacher assistant \
+that continues it. Keep the topics covered, what the student found difficult, and any \
+definitions or examples already given. At most 120 words, plain text, no preamble."""
+
+
+@dataclass(frozen=True)
+class Template:
+    version: str
+    static: str
+
+    # Messages shared by every question of one (level, subject): cached per process
+    def prefix(self, level: str, subject: str) -> Tuple[Dict[str, str], ...]:
+        return _prefix(self, level, subject.strip())
+
+    # context: earlier conversation (summary / turns) placed after the stable prefix
+    def messages(self, level: str, subject: str, class_num: int, question: str,
+                 context: Sequence[Dict[str, str]] = ()) -> List[Dict[str, str]]:
+        return [*self.prefix(level, subject), *context,
+                {"role": "user", "content": f"[Class {class_num}] {question.strip()}"}]
+
+    def cache_key(self, level: str, subject: str) -> str:
+        return f"v{self.version}:{level}:{subject.strip().lower()}"
+
+
+@lru_cache(maxsize=1024)
+def _prefix(template: Template, level: str, subject: str) -> Tuple[Dict[str, str], ...]:
+    return (
+        {"role": "system", "content": template.static},
+        {"role": "system", "content": f"Academic_Level: {level}. Subject: {subject}. "
+                                      f"{_guidance(level, subject)}"},
+    )
+
+
+TEMPLATES = {PROMPT_VERSION: Template(PROMPT_VERSION, STATIC_INSTRUCTIONS)}
+
+
+def get_template(version: str = PROMPT_VERSION) -> Template:
+    return TEMPLATES[version]
@@ -0,0 +1,297 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+# Client-side limiter shared by every OpenAI call in the process (sync and async).
+# Callers wait in FIFO order for: a free concurrency slot, the requests/min bucket and
+# the tokens/min bucket. Concurrency adapts AIMD-style: it grows by ~1 per window of
+# healthy requests and halves on a 429, and Retry-After pauses everyone. Server errors
+# (5xx, dropped connections, timeouts) are retried with backoff by the failed caller alone.
+
+logger = logging.getLogger(__name__)
+
+RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", "500"))
+TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "32"))
+# Time to first token above this counts as overload and shrinks concurrency
+TARGET_LATENCY = float(os.getenv("LIMITER_TARGET_LATENCY", "5"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+# Completion tokens assumed when reserving tokens/min before the answer is known
+COMPLETION_ESTIMATE = int(os.getenv("LIMITER_COMPLETION_ESTIMATE", "500"))
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until `amount` is available (0 when it is available now)
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    # Correct a reservation once the real usage is known (may go negative = debt)
+    def adjust(self, delta: float) -> None:
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class Permit:
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.acquired = time.monotonic()
+        self.released = False
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+# 5xx responses and failed or timed-out connections (the SDK's own retries are off)
+def is_transient(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status >= 500
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APIConnectionError)
+
+
+# Exponential backoff with jitter, capped at 30s
+def backoff(attempt: int) -> float:
+    return min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+# Delay requested by a 429 response, if any (retry-after-ms, then retry-after seconds or date)
+def retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = RPM_LIMIT, tpm: float = TPM_LIMIT,
+                 max_concurrency: int = MAX_CONCURRENCY, min_concurrency: int = 1,
+                 target_latency: float = TARGET_LATENCY, max_retries: int = MAX_RETRIES):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.queued = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._tickets = itertools.count()
+        self._queue: deque = deque()
+        self._async_waiters: list = []
+
+    # Caller holds the lock. Returns 0 when the permit was granted, else seconds to wait
+    def _try_acquire(self, ticket: int, tokens: int) -> float:
+        if self._queue[0] != ticket:
+            return float("inf")
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.limit):
+            return float("inf")
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.in_flight += 1
+        self._queue.popleft()
+        self._wake()
+        return 0.0
+
+    # Caller holds the lock
+    def _wake(self) -> None:
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _enqueue(self) -> int:
+        ticket = next(self._tickets)
+        self._queue.append(ticket)
+        if len(self._queue) > 1 or self.in_flight >= int(self.limit):
+            self.queued += 1
+        return ticket
+
+    def _abandon(self, ticket: int) -> None:
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._wake()
+
+    def acquire(self, tokens: int) -> Permit:
+        with self._cond:
+            ticket = self._enqueue()
+            try:
+                while True:
+                    wait = self._try_acquire(ticket, tokens)
+                    if wait == 0:
+                        return Permit(tokens)
+                    # Re-check at least once a second in case a wake-up was missed
+                    self._cond.wait(min(wait, 1.0))
+            except BaseException:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    self._wake()
+                raise
+
+    async def acquire_async(self, tokens: int) -> Permit:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            ticket = self._enqueue()
+        try:
+            while True:
+                future = loop.create_future()
+                with self._lock:
+                    wait = self._try_acquire(ticket, tokens)
+                    if wait == 0:
+                        return Permit(tokens)
+                    self._async_waiters.append((loop, future))
+                try:
+                    await asyncio.wait_for(future, timeout=min(wait, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(ticket)
+            raise
+
+    # latency: time to first token; used_tokens: real prompt + completion tokens
+    def release(self, permit: Permit, used_tokens: Optional[int] = None,
+                latency: Optional[float] = None) -> None:
+        with self._lock:
+            if permit.released:
+                return
+            permit.released = True
+            self.in_flight -= 1
+            if used_tokens is not None:
+                self.tokens.adjust(used_tokens - permit.tokens)
+            if latency is not None:
+                if latency > self.target_latency:
+                    self.limit = max(self.min_concurrency, self.limit * 0.9)
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._wake()
+
+    def on_rate_limited(self, error: BaseException, attempt: int) -> float:
+        delay = retry_after(error)
+        if delay is None:
+            delay = backoff(attempt)
+        with self._lock:
+            self.rate_limited += 1
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self._wake()
+        logger.warning("OpenAI rate limit hit; pausing %.1fs, concurrency now %d", delay, int(self.limit))
+        return delay
+
+    # Delay before retrying a failed `create`, or None when it should be raised
+    def _retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        if attempt >= self.max_retries:
+            return None
+        if is_rate_limited(error):
+            self.on_rate_limited(error, attempt)
+            return 0.0
+        if not is_transient(error):
+            return None
+        delay = backoff(attempt)
+        with self._lock:
+            self.server_errors += 1
+        logger.warning("OpenAI request failed (%s); retrying in %.1fs", type(error).__name__, delay)
+        return delay
+
+    # Acquire a permit and run `create`, retrying 429s and transient server errors;
+    # the caller must release the permit
+    def open(self, create: Callable, tokens: int):
+        for attempt in itertools.count():
+            permit = self.acquire(tokens)
+            try:
+                return create(), permit
+            # BaseException: a cancelled call (hedge loser, closed client) must free its slot too
+            except BaseException as e:
+                self.release(permit)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def open_async(self, create: Callable, tokens: int):
+        for attempt in itertools.count():
+            permit = await self.acquire_async(tokens)
+            try:
+                return await create(), permit
+            except BaseException as e:
+                self.release(permit)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    # Spare capacity for optional work (speculative prefetch): nobody waiting, no 429 pause,
+    # and less than `share` of the concurrency limit and of the tokens/min budget in use
+    def has_headroom(self, share: float) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            return (not self._queue and now >= self.blocked_until and self.in_flight < int(self.limit * share)
+                    and self.tokens.wait_time(self.tokens.capacity * (1 - share), now) == 0)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "concurrency_limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "waiting": len(self._queue),
+                "queued_total": self.queued,
+                "rate_limited_total": self.rate_limited,
+                "server_errors_total": self.server_errors,
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+# Rough token count for the tokens/min reservation (about 4 characters per token)
+def estimate_tokens(messages) -> int:
+    return sum(len(m["content"]) for m in messages) // 4 + COMPLETION_ESTIMATE
+
+
+limiter = RateLimiter()
@@ -0,0 +1,213 @@
+import csv
+import sys
+import json
+import time
+import argparse
+from itertools import compress, islice
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import codec
+from ai_teacher_assistant import get_academic_level
+from session_store import SessionStore, get_store
+
+# Import a school roster into the profile store.
+#
+#   python roster_import.py roster.csv --chunk-size 50000 --rejects rejects.jsonl
+#
+# Rows (CSV header, Excel first row or JSONL keys) have Student_Name, Academic_Name,
+# Class and Subject, like batch_answer input. The file is streamed in chunks, so memory
+# depends on --chunk-size, not on the roster size. Each chunk is validated as arrays:
+# Class is parsed and mapped to Academic_Level with one NumPy table lookup (the table is
+# built from get_academic_level, so both always agree), invalid rows (empty fields, a
+# Class that is not a whole number from CLASS_MIN to CLASS_MAX) are found with masks and
+# set aside with a reason, duplicates within the chunk are dropped (the last row wins),
+# and the rest is upserted into the store in one transaction. Duplicates across chunks
+# or earlier imports share a student key, so they update the same profile.
+
+FIELDS = ("Student_Name", "Academic_Name", "Class", "Subject")
+# Classes a profile may have, as in the Streamlit profile form
+CLASS_MIN, CLASS_MAX = 1, 20
+
+# Academic_Level by class number, up to CLASS_MAX
+CLASS_LEVELS = np.array([get_academic_level(c) for c in range(CLASS_MAX + 1)], dtype=object)
+
+NOT_WHOLE = "Class is not a whole number"
+OUT_OF_RANGE = f"Class is not between {CLASS_MIN} and {CLASS_MAX}"
+# Reason for rows with empty fields, indexed by a bit mask (1: name, 2: institution, 4: subject)
+EMPTY_REASONS = np.array(["empty field(s): " + ", ".join(
+    field for bit, field in enumerate(("Student_Name", "Academic_Name", "Subject")) if code >> bit & 1)
+    for code in range(8)], dtype=object)
+
+
+# Academic_Level for an array of class numbers; classes outside the table get the level
+# of its nearest end, so callers mask out-of-range classes themselves
+def academic_levels(classes: np.ndarray) -> np.ndarray:
+    return np.take(CLASS_LEVELS, classes, mode="clip")
+
+
+# Float array of class numbers; NaN where a value is not a number
+def parse_classes(values: Sequence[str]) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        return np.array([_to_float(v) for v in values], dtype=np.float64)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def student_key(name: str, institution: str, class_num: int, subject: str) -> str:
+    return "|".join((" ".join(institution.lower().split()), " ".join(name.lower().split()),
+                     str(class_num), " ".join(subject.lower().split())))
+
+
+def _csv_rows(path: str) -> Iterator[Tuple]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        pick = _picker(header)
+        width = len(header)
+        for row in reader:
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            yield pick(row)
+
+
+def _excel_rows(path: str) -> Iterator[Tuple]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("reading Excel rosters needs openpyxl: pip install openpyxl") from None
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(c) if c is not None else "" for c in next(rows, ())]
+        pick = _picker(header)
+        for row in rows:
+            yield tuple("" if v is None else str(v) for v in pick(row))
+    finally:
+        workbook.close()
+
+
+def _jsonl_rows(path: str) -> Iterator[Tuple]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                yield tuple(str(data.get(name, "")) for name in FIELDS)
+
+
+def _picker(header: List[str]):
+    columns = [name.strip() for name in header]
+    missing = [name for name in FIELDS if name not in columns]
+    if missing:
+        raise ValueError(f"roster is missing column(s): {', '.join(missing)}")
+    return itemgetter(*(columns.index(name) for name in FIELDS))
+
+
+def read_rows(path: str) -> Iterator[Tuple]:
+    lower = path.lower()
+    if lower.endswith(".csv"):
+        return _csv_rows(path)
+    if lower.endswith((".xlsx", ".xlsm")):
+        return _excel_rows(path)
+    if lower.endswith((".jsonl", ".ndjson")):
+        return _jsonl_rows(path)
+    raise ValueError(f"unsupported roster format: {path}")
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[List[Tuple]]:
+    rows = read_rows(path)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Valid (student_key, profile JSON) pairs of one chunk, and the rejected rows with a reason
+def prepare_chunk(chunk: List[Tuple], first_row: int = 0) -> Tuple[List[Tuple[str, str]], List[Dict]]:
+    names, institutions, raw_classes, subjects = zip(*chunk)
+    names = [n.strip() for n in names]
+    institutions = [i.strip() for i in institutions]
+    subjects = [s.strip() for s in subjects]
+    classes = parse_classes(raw_classes)
+
+    whole = np.isfinite(classes) & (classes == np.floor(classes))
+    # Compared as floats before the cast, so a huge value cannot overflow int64
+    in_range = whole & (classes >= CLASS_MIN) & (classes <= CLASS_MAX)
+    # Bit mask of the empty fields per row, as in EMPTY_REASONS
+    empty = sum((np.fromiter(map(len, column), np.int64, len(column)) == 0) * bit
+                for bit, column in ((1, names), (2, institutions), (4, subjects)))
+    valid = in_range & (empty == 0)
+    class_nums = np.where(in_range, classes, 0).astype(np.int64)
+
+    bad = np.flatnonzero(~valid)
+    reasons = np.where(~whole[bad], NOT_WHOLE, np.where(~in_range[bad], OUT_OF_RANGE, EMPTY_REASONS[empty[bad]]))
+    rejects = [{"row": first_row + i, "reason": reason, **dict(zip(FIELDS, chunk[i]))}
+               for i, reason in zip(bad.tolist(), reasons.tolist())]
+
+    # Keys and stored values are strings built per row, from the valid rows only
+    names, institutions, subjects = (list(compress(column, valid)) for column in (names, institutions, subjects))
+    class_nums = class_nums[valid]
+    levels, class_nums = academic_levels(class_nums).tolist(), class_nums.tolist()
+    keys = map(student_key, names, institutions, class_nums, subjects)
+    values = (codec.encode_profile_values(row).decode("utf-8")
+              for row in zip(names, institutions, levels, class_nums, subjects))
+    students = dict(zip(keys, values))
+    return list(students.items()), rejects
+
+
+def import_roster(path: str, store: Optional[SessionStore] = None, chunk_size: int = 50000,
+                  rejects_path: Optional[str] = None, report: bool = True) -> Dict:
+    store = store if store is not None else get_store()
+    stats = {"rows": 0, "stored": 0, "rejected": 0, "duplicates_in_chunk": 0}
+    start = time.perf_counter()
+    rejects_file = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+    try:
+        for chunk in read_chunks(path, chunk_size):
+            students, rejects = prepare_chunk(chunk, stats["rows"])
+            store.save_students(students)
+            stats["rows"] += len(chunk)
+            stats["stored"] += len(students)
+            stats["rejected"] += len(rejects)
+            stats["duplicates_in_chunk"] += len(chunk) - len(rejects) - len(students)
+            if rejects_file is not None:
+                rejects_file.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rejects)
+            if report:
+                _report(stats, start, "progress")
+    finally:
+        if rejects_file is not None:
+            rejects_file.close()
+    stats["students_total"] = store.count_students()
+    if report:
+        _report(stats, start, "done")
+    return stats
+
+
+def _report(stats: Dict, start: float, label: str) -> None:
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    line = {**stats, "elapsed_s": round(elapsed, 2), "rows_per_s": round(stats["rows"] / elapsed)}
+    print(f"[{label}] " + json.dumps(line), file=sys.stderr, flush=True)
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Import a CSV/Excel/JSONL school roster into the profile store.")
+    parser.add_argument("roster", help="roster file (.csv, .xlsx or .jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows read, validated and written at a time")
+    parser.add_argument("--db", help="profile store (default: SESSION_DB_PATH)")
+    parser.add_argument("--rejects", help="write rejected rows with the reason to this JSONL file")
+    args = parser.parse_args(argv)
+    store = SessionStore(args.db) if args.db else None
+    import_roster(args.roster, store, args.chunk_size, args.rejects)
+
+
+if __name__ == "__main__":
+    main()
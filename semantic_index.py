@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from answer_cache import normalize_question
+
+# Near-duplicate question index. One partition per (Academic_Level, Subject); each
+# partition keeps L2-normalized question vectors in a float32 matrix so a lookup is a
+# single matrix-vector product. Large partitions live in a memory-mapped .npy file
+# written by compact(); rows added since the last compaction sit in an in-memory tail.
+# Several processes can share a partition directory: appends, loads and compactions
+# hold an flock on its lockfile, and compaction starts from the files rather than from
+# this process's view, so rows appended by other processes are kept.
+
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_THRESHOLD", "0.9"))
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", os.path.join(".cache", "semantic"))
+SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", "512"))
+
+# Words and numbers, plus arithmetic operators ("2+5" and "2*5" are different questions);
+# a hyphen between letters joins a word, anywhere else it is a minus
+_TOKENS = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*|[+*/^=<>%\u00d7\u00f7\u221a]|(?<![a-z])-|-(?![a-z])")
+_MATH = re.compile(r"[0-9]|[^a-z]")
+# Words that carry no meaning for matching "what is X" against "explain X pls"
+_FILLER = frozenset(
+    "a an the is are was were whats explain describe define tell me about please pls plz "
+    "can could you u i my of to in on for kindly give".split()
+)
+# Interrogatives that change what is asked ("how do plants ..." vs "why do plants ...");
+# a question with none of them asks "what"
+_INTERROGATIVES = frozenset("how why when where who whom whose which".split())
+
+
+# Feature-hashing embedder: words and word bigrams hashed into a fixed number of signed
+# buckets. Features are keyed by the question's interrogative and its numbers and operators,
+# so questions that differ in either do not share a feature and never score as near-duplicates
+class HashingEmbedder:
+    # Bumped when features change: vectors stored by another version are not comparable
+    version = 2
+
+    def __init__(self, dim: int = SEMANTIC_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKENS.findall(text.lower().replace("'", ""))
+        asks = next((t for t in tokens if t in _INTERROGATIVES), "what")
+        key = " ".join([asks] + [t for t in tokens if _MATH.match(t)])
+        words = [t for t in tokens if t not in _FILLER and t not in _INTERROGATIVES and t != "what"]
+        return [f"{key}|{f}" for f in words + [f"{a} {b}" for a, b in zip(words, words[1:])]]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return normalize_rows(out)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class Partition:
+    def __init__(self, dim: int, directory: Optional[str] = None):
+        self.dim = dim
+        self.directory = directory
+        self.entries: List[Tuple[str, str]] = []  # (question, answer), row-aligned with the vectors
+        self._base = np.empty((0, dim), dtype=np.float32)
+        self._tail = np.empty((64, dim), dtype=np.float32)
+        self._tail_size = 0
+        self._lock = threading.Lock()
+        self._embedder = None  # set by load(); compact() re-reads the files with it
+
+    def __len__(self) -> int:
+        return len(self._base) + self._tail_size
+
+    def append(self, vectors: np.ndarray, entries: Sequence[Tuple[str, str]], log: bool = True) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            needed = self._tail_size + len(vectors)
+            if needed > len(self._tail):
+                grown = np.empty((max(needed, 2 * len(self._tail)), self.dim), dtype=np.float32)
+                grown[: self._tail_size] = self._tail[: self._tail_size]
+                self._tail = grown
+            self._tail[self._tail_size: needed] = vectors
+            self._tail_size = needed
+            self.entries.extend(entries)
+            if log and self.directory:
+                with self._file_lock(), open(os.path.join(self.directory, "entries.jsonl"), "a",
+                                             encoding="utf-8") as f:
+                    f.write("".join(json.dumps([question, answer]) + "\n" for question, answer in entries))
+
+    # Closest (question, answer) and its cosine similarity, or (None, -1.0) when empty.
+    # The entries are taken with the vectors under the lock, so a row always names its own
+    # entry: compact() replaces both, and append() only adds rows after them
+    def search(self, query: np.ndarray) -> Tuple[Optional[Tuple[str, str]], float]:
+        best, best_score = -1, -1.0
+        with self._lock:
+            base, tail, entries = self._base, self._tail[: self._tail_size], self.entries
+        for offset, block in ((0, base), (len(base), tail)):
+            if len(block):
+                scores = block @ query
+                i = int(np.argmax(scores))
+                if scores[i] > best_score:
+                    best, best_score = offset + i, float(scores[i])
+        return (entries[best] if best >= 0 else None), best_score
+
+    def vectors(self) -> np.ndarray:
+        return np.concatenate([self._base, self._tail[: self._tail_size]])
+
+    # Exclusive lock on the partition directory, shared by every process using it
+    @contextmanager
+    def _file_lock(self):
+        if not self.directory or fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # Drop repeated questions (keeping the newest answer) and fold the tail into the
+    # memory-mapped base file. A loaded partition first re-reads the files, which hold
+    # every row appended by any process since the last compaction
+    def compact(self) -> int:
+        with self._lock, self._file_lock():
+            if self.directory and self._embedder is not None:
+                self._read(self._embedder)
+            newest: Dict[str, int] = {}
+            for i, (question, _) in enumerate(self.entries):
+                newest[normalize_question(question)] = i
+            keep = sorted(newest.values())
+            removed = len(self.entries) - len(keep)
+            matrix = self.vectors()[keep]
+            self.entries = [self.entries[i] for i in keep]
+            self._tail = np.empty((64, self.dim), dtype=np.float32)
+            self._tail_size = 0
+            if self.directory:
+                self._write(matrix)
+            else:
+                self._base = matrix
+            return removed
+
+    def _write(self, matrix: np.ndarray) -> None:
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        entries_path = os.path.join(self.directory, "entries.jsonl")
+        out = np.lib.format.open_memmap(vectors_path + ".tmp", mode="w+", dtype=np.float32,
+                                        shape=matrix.shape)
+        out[:] = matrix
+        out.flush()
+        del out
+        with open(entries_path + ".tmp", "w", encoding="utf-8") as f:
+            for entry in self.entries:
+                f.write(json.dumps(list(entry)) + "\n")
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(entries_path + ".tmp", entries_path)
+        self._base = np.load(vectors_path, mmap_mode="r")
+
+    # Memory-map the compacted vectors and re-embed rows appended after the last compaction
+    def load(self, embedder) -> None:
+        self._embedder = embedder
+        with self._lock, self._file_lock():
+            self._read(embedder)
+
+    # Replace the in-memory state with the files. Rows past the compacted base reuse this
+    # process's vectors where it already holds the same entry; the rest are embedded
+    def _read(self, embedder) -> None:
+        vectors_path = os.path.join(self.directory, "vectors.npy")
+        entries_path = os.path.join(self.directory, "entries.jsonl")
+        base = np.empty((0, self.dim), dtype=np.float32)
+        if os.path.exists(vectors_path):
+            base = np.load(vectors_path, mmap_mode="r")
+        entries: List[Tuple[str, str]] = []
+        if os.path.exists(entries_path):
+            with open(entries_path, encoding="utf-8") as f:
+                entries = [tuple(json.loads(line)) for line in f if line.strip()]
+        pending = entries[len(base):]
+        tail = np.empty((max(64, len(pending)), self.dim), dtype=np.float32)
+        if pending:
+            held = dict(zip(self.entries[len(self._base):], self._tail[: self._tail_size]))
+            missing = [i for i, entry in enumerate(pending) if entry not in held]
+            for i, entry in enumerate(pending):
+                if entry in held:
+                    tail[i] = held[entry]
+            if missing:
+                tail[missing] = embedder.embed([pending[i][0] for i in missing])
+        self._base, self._tail, self._tail_size = base, tail, len(pending)
+        self.entries = entries
+
+
+class SemanticIndex:
+    def __init__(self, embedder=None, threshold: float = SEMANTIC_THRESHOLD,
+                 directory: Optional[str] = None):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.directory = directory
+        self._partitions: Dict[Tuple[str, str], Partition] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def partition(self, level: str, subject: str) -> Partition:
+        key = (level, subject.strip().lower())
+        part = self._partitions.get(key)
+        if part is None:
+            with self._lock:
+                part = self._partitions.get(key)
+                if part is None:
+                    directory = None
+                    if self.directory:
+                        name = hashlib.sha1(json.dumps(key).encode("utf-8")).hexdigest()[:16]
+                        directory = os.path.join(self.directory, name)
+                        os.makedirs(directory, exist_ok=True)
+                    part = Partition(self.embedder.dim, directory)
+                    if directory:
+                        part.load(self.embedder)
+                    self._partitions[key] = part
+        return part
+
+    # Closest stored (question, answer, score) above the threshold
+    def search(self, level: str, subject: str, question: str) -> Optional[Tuple[str, str, float]]:
+        part = self.partition(level, subject)
+        if len(part):
+            entry, score = part.search(self.embedder.embed([question])[0])
+            if entry is not None and score >= self.threshold:
+                self.hits += 1
+                stored_question, answer = entry
+                return stored_question, answer, score
+        self.misses += 1
+        return None
+
+    def add(self, level: str, subject: str, question: str, answer: str) -> None:
+        self.partition(level, subject).append(self.embedder.embed([question]), [(question, answer)])
+
+    def compact(self) -> int:
+        return sum(part.compact() for part in list(self._partitions.values()))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "partitions": len(self._partitions),
+            "entries": sum(len(p) for p in self._partitions.values()),
+        }
+
+
+# One index per (model, prompt version) namespace per process
+@lru_cache(maxsize=None)
+def get_index(namespace: str) -> SemanticIndex:
+    directory = (os.path.join(SEMANTIC_INDEX_DIR, f"{namespace}-e{HashingEmbedder.version}")
+                 if SEMANTIC_INDEX_DIR else None)
+    return SemanticIndex(directory=directory)
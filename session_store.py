@@ -0,0 +1,215 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+import codec
+
+# Durable store for student profiles and Q&A turns, shared by every app process.
+# Turns are append-only rows indexed by (session_id, seq); clearing a history only moves
+# the session's start marker. Each open session keeps just a small window of recent
+# turns in RAM (SessionHistory) and pages older ones from SQLite on demand, so worker
+# memory no longer grows with every question, and a session survives restarts and can
+# be picked up by any worker. Profiles imported from school rosters (roster_import) are
+# kept in their own table, keyed by a normalized student key.
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(".cache", "sessions.sqlite3"))
+RECENT_WINDOW = int(os.getenv("SESSION_RECENT_WINDOW", "20"))
+
+
+class SessionStore:
+    def __init__(self, path: str = SESSION_DB_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                profile TEXT,
+                history_start INTEGER NOT NULL DEFAULT 0,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS turns (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS students (
+                student_key TEXT PRIMARY KEY,
+                profile TEXT NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID;
+            """
+        )
+        self._lock = threading.Lock()
+
+    def _touch(self, session_id: str) -> None:
+        self._db.execute(
+            "INSERT INTO sessions (session_id, updated) VALUES (?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET updated = excluded.updated",
+            (session_id, time.time()),
+        )
+
+    def save_profile(self, session_id: str, profile) -> None:
+        data = codec.encode_profile(profile).decode("utf-8") if profile is not None else None
+        with self._lock:
+            self._touch(session_id)
+            self._db.execute("UPDATE sessions SET profile = ? WHERE session_id = ?", (data, session_id))
+
+    # Returns the profile fields as a dict (callers build their StudentProfile from it)
+    def load_profile(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT profile FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return codec.decode_profile(row[0]) if row and row[0] else None
+
+    def append_turn(self, session_id: str, question: str, answer: str) -> Dict:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._touch(session_id)
+                (seq,) = self._db.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM turns WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT INTO turns (session_id, seq, question, answer, created) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, seq, question, answer, now),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"seq": seq, "question": question, "answer": answer, "created": now}
+
+    # Bulk import (transcripts, benchmarks): one transaction for all (question, answer) pairs
+    def append_turns(self, session_id: str, pairs: Iterable[Tuple[str, str]]) -> int:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._touch(session_id)
+                (first,) = self._db.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM turns WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                cursor = self._db.executemany(
+                    "INSERT INTO turns (session_id, seq, question, answer, created) VALUES (?, ?, ?, ?, ?)",
+                    ((session_id, seq, q, a, now) for seq, (q, a) in enumerate(pairs, first)),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    # Roster import: upsert (student_key, profile JSON) rows in one transaction
+    def save_students(self, rows: Iterable[Tuple[str, str]]) -> int:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._db.executemany(
+                    "INSERT INTO students (student_key, profile, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT (student_key) DO UPDATE SET profile = excluded.profile, updated = excluded.updated",
+                    ((key, profile, now) for key, profile in rows),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def load_student(self, student_key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT profile FROM students WHERE student_key = ?", (student_key,)).fetchone()
+        return codec.decode_profile(row[0]) if row else None
+
+    def count_students(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM students").fetchone()
+        return count
+
+    def _start(self, session_id: str) -> int:
+        row = self._db.execute("SELECT history_start FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    # Newest-first page of turns with seq < before (None = from the newest)
+    def turns_before(self, session_id: str, before: Optional[int], limit: int) -> List[Dict]:
+        with self._lock:
+            start = self._start(session_id)
+            rows = self._db.execute(
+                "SELECT seq, question, answer, created FROM turns "
+                "WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (session_id, start, before if before is not None else 2**62, limit),
+            ).fetchall()
+        return [{"seq": r[0], "question": r[1], "answer": r[2], "created": r[3]} for r in rows]
+
+    def count_turns(self, session_id: str) -> int:
+        with self._lock:
+            start = self._start(session_id)
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM turns WHERE session_id = ? AND seq >= ?", (session_id, start)
+            ).fetchone()
+        return count
+
+    def clear_turns(self, session_id: str) -> None:
+        with self._lock:
+            self._touch(session_id)
+            self._db.execute(
+                "UPDATE sessions SET history_start = "
+                "(SELECT COALESCE(MAX(seq), 0) + 1 FROM turns WHERE session_id = ?) WHERE session_id = ?",
+                (session_id, session_id),
+            )
+
+    def history(self, session_id: str, window: int = RECENT_WINDOW) -> "SessionHistory":
+        return SessionHistory(self, session_id, window)
+
+
+# One session's chat history: the last `window` turns in RAM, the rest on disk
+class SessionHistory:
+    def __init__(self, store: SessionStore, session_id: str, window: int = RECENT_WINDOW):
+        self.store = store
+        self.session_id = session_id
+        self.recent: Deque[Dict] = deque(reversed(store.turns_before(session_id, None, window)), maxlen=window)
+        self.total = store.count_turns(session_id)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def append(self, question: str, answer: str) -> Dict:
+        turn = self.store.append_turn(self.session_id, question, answer)
+        self.recent.append(turn)
+        self.total += 1
+        return turn
+
+    # Newest-first page of turns older than `before` (a seq), read from disk
+    def older(self, before: int, limit: int) -> List[Dict]:
+        return self.store.turns_before(self.session_id, before, limit)
+
+    # Newest-first page ending before `before` (None = the latest page); served from
+    # the in-memory window when it covers the page, so rendering page 1 never hits disk
+    def page(self, before: Optional[int], limit: int) -> List[Dict]:
+        if before is None and (limit <= len(self.recent) or len(self.recent) == self.total):
+            return list(reversed(self.recent))[:limit]
+        if before is None:
+            return self.store.turns_before(self.session_id, None, limit)
+        return self.older(before, limit)
+
+    def clear(self) -> None:
+        self.store.clear_turns(self.session_id)
+        self.recent.clear()
+        self.total = 0
+
+
+# One store (one SQLite connection) per process
+@lru_cache(maxsize=None)
+def get_store() -> SessionStore:
+    return SessionStore()
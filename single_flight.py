@@ -0,0 +1,209 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import cancellation
+from cancellation import CancelScope
+
+# Request coalescing: concurrent callers asking for the same key share one upstream
+# token stream. The first caller starts a producer (a thread or an asyncio task) that
+# buffers deltas; every caller, including late joiners, replays the buffer and then
+# follows it live. The producer is stopped as soon as the last caller goes away (its
+# upstream connection is aborted, see cancellation), and the key is released whether the
+# upstream call finishes, fails or is cancelled. A caller passing a CancelScope leaves
+# with AnswerCancelled when it is cancelled, even while waiting for the first token.
+
+
+class FlightStats:
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.abandoned = 0
+
+    def as_dict(self, in_flight: int) -> Dict[str, int]:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+            "in_flight": in_flight,
+        }
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self.scope = CancelScope()
+
+
+# For threads (Streamlit sessions, CLI)
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._flights: Dict[str, _Flight] = {}
+        self.stats = FlightStats()
+
+    def stream(self, key: str, factory: Callable[[], Iterator[str]],
+               scope: Optional[CancelScope] = None) -> Iterator[str]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.stats.leaders += 1
+                threading.Thread(target=self._produce, args=(key, flight, factory), daemon=True).start()
+            else:
+                self.stats.coalesced += 1
+            flight.subscribers += 1
+
+        seen = 0
+        unregister = scope.on_cancel(self._wake) if scope is not None else None
+        try:
+            while True:
+                with self._cond:
+                    while seen == len(flight.chunks) and not flight.done and not (scope and scope.cancelled):
+                        self._cond.wait()
+                    if scope is not None:
+                        scope.check()
+                    new = flight.chunks[seen:]
+                    seen += len(new)
+                    finished = flight.done and seen == len(flight.chunks)
+                yield from new
+                if finished:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            if unregister is not None:
+                unregister()
+            with self._lock:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.done
+                if abandoned:
+                    # Nobody is listening: stop the producer and let new callers start afresh
+                    flight.abandoned = True
+                    self.stats.abandoned += 1
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+            if abandoned:
+                flight.scope.cancel()
+
+    def _wake(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+    def _produce(self, key: str, flight: _Flight, factory: Callable[[], Iterator[str]]) -> None:
+        cancellation.enter(flight.scope)
+        source = None
+        try:
+            source = factory()
+            for chunk in source:
+                with self._cond:
+                    if flight.abandoned:
+                        break
+                    flight.chunks.append(chunk)
+                    self._cond.notify_all()
+        except BaseException as e:
+            flight.error = e
+            if not flight.abandoned:
+                self.stats.failed += 1
+        finally:
+            if source is not None:
+                source.close()
+            with self._cond:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.done = True
+                self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return self.stats.as_dict(len(self._flights))
+
+
+class _AsyncFlight(_Flight):
+    def __init__(self):
+        super().__init__()
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+# For asyncio callers (Chainlit, batch mode)
+class AsyncSingleFlight:
+    def __init__(self):
+        self._flights: Dict[Tuple[asyncio.AbstractEventLoop, str], _AsyncFlight] = {}
+        self.stats = FlightStats()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]],
+                     scope: Optional[CancelScope] = None) -> AsyncIterator[str]:
+        # Tasks cannot be shared across event loops, so flights are per loop
+        loop = asyncio.get_running_loop()
+        key = (loop, key)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _AsyncFlight()
+            self.stats.leaders += 1
+            flight.task = asyncio.create_task(self._produce(key, flight, factory))
+        else:
+            self.stats.coalesced += 1
+        flight.subscribers += 1
+
+        # cancel() may come from another thread: wake this loop's waiters from the loop itself
+        seen = 0
+        unregister = scope.on_cancel(lambda: loop.call_soon_threadsafe(flight.notify)) if scope is not None else None
+        try:
+            while True:
+                if scope is not None:
+                    scope.check()
+                if seen < len(flight.chunks):
+                    new = flight.chunks[seen:]
+                    seen += len(new)
+                    for chunk in new:
+                        yield chunk
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight.changed.wait()
+        finally:
+            if unregister is not None:
+                unregister()
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                flight.abandoned = True
+                self.stats.abandoned += 1
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    async def _produce(self, key: Tuple[asyncio.AbstractEventLoop, str], flight: _AsyncFlight,
+                       factory: Callable[[], AsyncIterator[str]]) -> None:
+        source = factory()
+        try:
+            async for chunk in source:
+                flight.chunks.append(chunk)
+                flight.notify()
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            flight.error = e
+            self.stats.failed += 1
+        finally:
+            await source.aclose()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done = True
+            flight.notify()
+
+    def snapshot(self) -> Dict[str, int]:
+        return self.stats.as_dict(len(self._flights))
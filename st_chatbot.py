@@ -1,7 +1,7 @@
 
 import streamlit as st
-import json
-from ai_teacher_assistant import StudentProfile, get_academic_level, ask_openai
+from ai_teacher_assistant import StudentProfile, get_academic_level
+import answer_client
 
 # ---------------------------
 # Helper Functions
@@ -15,6 +15,14 @@ def format_profile(profile: StudentProfile) -> str:
         f"📚 Subject: {profile.Subject}"
     )
 
+# Stream the answer; a failure is kept in the session (answer_error) for the page to show
+def stream_answer(question: str, profile: StudentProfile):
+    st.session_state.answer_error = None
+    try:
+        yield from answer_client.stream_answer(question, profile)
+    except Exception as e:
+        st.session_state.answer_error = e
+
 def menu_text():
     return [
         "Ask a Question",
@@ -30,6 +38,7 @@ def menu_text():
 def main():
     st.set_page_config(page_title="AI Teacher Assistant", page_icon="📚", layout="centered")
     st.title("🤖 AI Teacher Assistant")
+    answer_client.prewarm()
 
     # Session states
     if "student_profile" not in st.session_state:
@@ -76,8 +85,10 @@ def main():
             q = st.text_area("Enter your question:", key="question")
             if st.button("Get Answer"):
                 if q.strip():
-                    answer = ask_openai(q, st.session_state.student_profile)
-                    st.markdown(f"🧑‍🏫 **Answer:** {answer}")
+                    st.markdown("🧑‍🏫 **Answer:**")
+                    st.write_stream(stream_answer(q, st.session_state.student_profile))
+                    if st.session_state.answer_error is not None:
+                        st.error(f"❌ Error getting response: {st.session_state.answer_error}")
                 else:
                     st.warning("Please enter a question first.")
 
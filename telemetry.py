@@ -0,0 +1,205 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Optional, Tuple
+
+# Per-request metrics and traces. Both exporters are optional and off by default:
+#   METRICS_PORT=9464                 Prometheus endpoint (needs prometheus_client)
+#   OTEL_EXPORTER_OTLP_ENDPOINT=...   OTLP/HTTP traces (needs opentelemetry-sdk and
+#                                     opentelemetry-exporter-otlp-proto-http)
+# When neither is configured, start_request() returns None and every hook is a single
+# `if` on the hot path. Spans are built after the fact from the recorded timestamps, so
+# nothing has to follow the answer stream across threads, coalesced flights or yields.
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+# Subjects are free text: only the first N distinct ones get their own label value
+MAX_SUBJECTS = int(os.getenv("METRICS_MAX_SUBJECTS", "50"))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_metrics = None
+_tracer = None
+_subjects: Dict[str, str] = {}
+_subjects_lock = threading.Lock()
+
+
+class _Metrics:
+    def __init__(self, prometheus_client):
+        request = ["academic_level", "subject", "model"]
+        self.requests = prometheus_client.Counter(
+            "tutor_requests", "Answered questions", request + ["source", "error"])
+        self.latency = prometheus_client.Histogram(
+            "tutor_request_seconds", "Total answer time", request + ["source"], buckets=LATENCY_BUCKETS)
+        self.ttft = prometheus_client.Histogram(
+            "tutor_ttft_seconds", "Time to first token", request + ["source"], buckets=LATENCY_BUCKETS)
+        self.prompt_build = prometheus_client.Histogram(
+            "tutor_prompt_build_seconds", "Context, cache lookup and prompt assembly", ["model"],
+            buckets=FAST_BUCKETS)
+        self.queue_wait = prometheus_client.Histogram(
+            "tutor_queue_wait_seconds", "Wait for a rate-limiter permit", ["model"], buckets=LATENCY_BUCKETS)
+        self.tokens = prometheus_client.Counter(
+            "tutor_tokens", "OpenAI tokens", request + ["kind"])
+        self.handler = prometheus_client.Histogram(
+            "tutor_handler_seconds", "Frontend handler time, rendering included", ["frontend", "handler"],
+            buckets=LATENCY_BUCKETS)
+
+
+def _setup() -> None:
+    global _metrics, _tracer
+    if METRICS_PORT:
+        try:
+            import prometheus_client
+        except ImportError:
+            logger.warning("METRICS_PORT is set but prometheus_client is not installed; metrics disabled")
+        else:
+            _metrics = _Metrics(prometheus_client)
+            try:
+                prometheus_client.start_http_server(METRICS_PORT)
+            except OSError as e:
+                # Another worker of this app already serves the port
+                logger.warning("metrics endpoint not started on port %d: %s", METRICS_PORT, e)
+    if OTLP_ENDPOINT:
+        try:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but the OpenTelemetry SDK/exporter "
+                           "is not installed; tracing disabled")
+        else:
+            service = os.getenv("OTEL_SERVICE_NAME", "ai-teacher-assistant")
+            provider = TracerProvider(resource=Resource.create({"service.name": service}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+            _tracer = trace.get_tracer(__name__)
+
+
+_setup()
+ENABLED = _metrics is not None or _tracer is not None
+
+
+def _subject_label(subject: str) -> str:
+    subject = subject.strip().lower()
+    label = _subjects.get(subject)
+    if label is None:
+        with _subjects_lock:
+            label = _subjects.setdefault(subject, subject if len(_subjects) < MAX_SUBJECTS else "other")
+    return label
+
+
+def _ns(seconds: float) -> int:
+    return int(seconds * 1e9)
+
+
+# One answered question. Phases are offsets from `start` (time.perf_counter seconds).
+class RequestTrace:
+    __slots__ = ("labels", "start", "wall_start", "prompt_build", "upstream_start", "queue_wait", "usage",
+                 "source", "error")
+
+    def __init__(self, level: str, subject: str, model: str):
+        self.labels: Tuple[str, str, str] = (level, _subject_label(subject), model)
+        self.start = time.perf_counter()
+        self.wall_start = time.time_ns()
+        self.prompt_build: Optional[float] = None
+        self.upstream_start: Optional[float] = None
+        self.queue_wait: Optional[float] = None
+        self.usage = None
+        self.source = "openai"
+        self.error = ""
+
+    def built(self) -> None:
+        self.prompt_build = time.perf_counter() - self.start
+
+    def failed(self, error: BaseException) -> None:
+        cancelled = isinstance(error, GeneratorExit) or type(error).__name__ in ("CancelledError", "AnswerCancelled")
+        self.error = "cancelled" if cancelled else type(error).__name__
+
+
+def start_request(level: str, subject: str, model: str) -> Optional[RequestTrace]:
+    return RequestTrace(level, subject, model) if ENABLED else None
+
+
+# Token usage and permit wait of one upstream call. Called for every call, including
+# ones that answer no question directly (conversation summaries: trace is None).
+def record_upstream(trace: Optional[RequestTrace], model: str, started: float,
+                    queue_wait: Optional[float], usage) -> None:
+    if trace is not None:
+        trace.upstream_start = started - trace.start
+        trace.queue_wait = queue_wait
+        trace.usage = usage
+    if _metrics is None:
+        return
+    if queue_wait is not None:
+        _metrics.queue_wait.labels(model).observe(queue_wait)
+    if usage is not None:
+        labels = trace.labels if trace is not None else ("summary", "summary", model)
+        cached = 0
+        if usage.prompt_tokens_details is not None:
+            cached = usage.prompt_tokens_details.cached_tokens or 0
+        _metrics.tokens.labels(*labels, "prompt").inc(usage.prompt_tokens or 0)
+        _metrics.tokens.labels(*labels, "cached_prompt").inc(cached)
+        _metrics.tokens.labels(*labels, "completion").inc(usage.completion_tokens or 0)
+
+
+def finish_request(trace: RequestTrace, ttft: Optional[float], total: float) -> None:
+    if _metrics is not None:
+        _metrics.requests.labels(*trace.labels, trace.source, trace.error).inc()
+        if not trace.error:
+            _metrics.latency.labels(*trace.labels, trace.source).observe(total)
+            if ttft is not None:
+                _metrics.ttft.labels(*trace.labels, trace.source).observe(ttft)
+        if trace.prompt_build is not None:
+            _metrics.prompt_build.labels(trace.labels[2]).observe(trace.prompt_build)
+    if _tracer is not None:
+        _export_span(trace, ttft, total)
+
+
+def _export_span(trace: RequestTrace, ttft: Optional[float], total: float) -> None:
+    from opentelemetry import trace as otel
+    from opentelemetry.trace import Status, StatusCode
+
+    level, subject, model = trace.labels
+    attributes = {"academic_level": level, "subject": subject, "model": model, "answer.source": trace.source}
+    if trace.usage is not None:
+        attributes["tokens.prompt"] = trace.usage.prompt_tokens or 0
+        attributes["tokens.completion"] = trace.usage.completion_tokens or 0
+    t0 = trace.wall_start
+    span = _tracer.start_span("ask_openai", start_time=t0, attributes=attributes)
+    context = otel.set_span_in_context(span)
+    if trace.prompt_build is not None:
+        _tracer.start_span("prompt_build", context=context, start_time=t0).end(t0 + _ns(trace.prompt_build))
+    if trace.upstream_start is not None and trace.queue_wait is not None:
+        begin = t0 + _ns(trace.upstream_start)
+        _tracer.start_span("queue_wait", context=context, start_time=begin).end(begin + _ns(trace.queue_wait))
+    if ttft is not None:
+        span.add_event("first_token", timestamp=t0 + _ns(ttft))
+    if trace.error:
+        span.set_status(Status(StatusCode.ERROR, trace.error))
+    span.end(end_time=t0 + _ns(total))
+
+
+# Time a frontend handler (Chainlit message, Streamlit section), rendering included
+def timed(frontend: str, handler: str):
+    return _timed(frontend, handler) if ENABLED else nullcontext()
+
+
+@contextmanager
+def _timed(frontend: str, handler: str):
+    start, wall_start = time.perf_counter(), time.time_ns()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if _metrics is not None:
+            _metrics.handler.labels(frontend, handler).observe(elapsed)
+        if _tracer is not None:
+            span = _tracer.start_span(f"{frontend}.{handler}", start_time=wall_start)
+            span.end(end_time=wall_start + _ns(elapsed))
@@ -1,12 +1,15 @@
 # app.py
 import streamlit as st
-import json
-import os
-from dataclasses import dataclass, asdict
-# Note: Make sure you have the openai package installed that matches your usage
-# (the code uses `from openai import OpenAI` like your original).
-from openai import OpenAI
+import uuid
+from dataclasses import asdict, astuple
 from dotenv import load_dotenv
+from ai_teacher_assistant import StudentProfile, get_academic_level, get_settings
+import answer_client
+from conversation_memory import ConversationMemory
+from session_store import get_store
+from history_view import profile_card, show_history
+from ui_metrics import fragment, measure
+import telemetry
 
 # Local .env support
 load_dotenv()
@@ -14,95 +17,75 @@ load_dotenv()
 st.set_page_config(page_title="AI Teacher Assistant", page_icon="🧑‍🏫", layout="wide")
 
 def get_api_key():
-    # Prefer Streamlit secrets (cloud)
-    try:
-        # st.secrets behaves like a dict
-        return st.secrets["OPENAI_API_KEY"]
-    except Exception:
-        # Fallback to environment variable (local dev)
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            st.error("❌ OPENAI_API_KEY not found. Set it in Streamlit secrets or in a local .env file.")
-            st.info(
-                "For local dev: create a .env with OPENAI_API_KEY=your_key\n"
-                "For Streamlit Cloud: go to App Settings → Secrets and add the TOML entries."
-            )
-            st.stop()
-        return api_key
-
-def get_model_name():
-    try:
-        return st.secrets.get("MODEL_NAME", "gpt-4o-mini")
-    except Exception:
-        return os.getenv("MODEL_NAME", "gpt-4o-mini")
-
-# Initialize OpenAI client
-try:
-    client = OpenAI(api_key=get_api_key())
-    MODEL_NAME = get_model_name()
-except Exception as e:
-    st.error(f"❌ Failed to initialize OpenAI client: {e}")
-    st.stop()
-
-@dataclass
-class StudentProfile:
-    Student_Name: str
-    Academic_Name: str
-    Academic_Level: str
-    Class: int
-    Subject: str
-
-def get_academic_level(class_num: int) -> str:
-    if 1 <= class_num <= 5:
-        return "Primary"
-    elif 6 <= class_num <= 8:
-        return "Secondary"
-    elif class_num == 9:
-        return "Middle"
-    elif class_num == 10:
-        return "Matric"
-    elif class_num in [11, 12]:
-        return "Intermediate"
-    elif 13 <= class_num <= 16:
-        return "Graduation"
-    elif class_num == 17:
-        return "Master"
-    elif class_num == 18:
-        return "Ph.D"
-    else:
-        return "High Level"
-
-def ask_openai(question: str, profile: StudentProfile) -> str:
-    try:
-        prompt = (
-            f"You are a helpful teacher assistant. "
-            f"Student Profile: {json.dumps(asdict(profile))}.\n"
-            f"Student Question: {question}\n"
-            f"Please provide an educational answer appropriate for {profile.Academic_Level} level students studying {profile.Subject}."
+    # Resolved once per process (env / .env, then Streamlit secrets)
+    api_key = get_settings().api_key
+    if not api_key:
+        st.error("❌ OPENAI_API_KEY not found. Set it in Streamlit secrets or in a local .env file.")
+        st.info(
+            "For local dev: create a .env with OPENAI_API_KEY=your_key\n"
+            "For Streamlit Cloud: go to App Settings → Secrets and add the TOML entries."
         )
-
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are an experienced and patient teacher assistant who adapts explanations to student academic levels."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-        return response.choices[0].message.content.strip()
+        st.stop()
+    return api_key
+
+# Validate configuration, then open the API connection while the page renders (once per process).
+# With ANSWER_SERVICE_URL set, answers come from the answer service, which holds the key.
+if not answer_client.REMOTE:
+    get_api_key()
+answer_client.prewarm()
+
+# Stream the answer; a failure is kept in the session (answer_error) for the form to show,
+# and the partial answer is not saved. The handle stays in the session so the next run can
+# stop the answer upstream if this run was abandoned. Answers come from the shared engine:
+# its prompt templates and the API's default temperature and length apply, not the system
+# prompt, temperature=0.7 and max_tokens=1000 this app used to send itself.
+def stream_answer(question: str, profile: StudentProfile):
+    st.session_state.answer_handle = None
+    st.session_state.answer_error = None
+    try:
+        handle = answer_client.AnswerHandle(question, profile, session=st.session_state.session_id,
+                                            memory=st.session_state.memory)
+        st.session_state.answer_handle = handle
+        yield from handle
     except Exception as e:
-        return f"❌ Error getting response from AI: {e}"
+        st.session_state.answer_error = e
+
+# A rerun (another sidebar button) while an answer streams interrupts that run, and the
+# answer is never shown: make sure its upstream request stops too
+def cancel_abandoned_answer():
+    handle = st.session_state.get("answer_handle")
+    if handle is not None and not handle.finished:
+        handle.cancel()
+
+# Persist the current profile for this session
+def save_profile():
+    get_store().save_profile(st.session_state.session_id, st.session_state.profile)
 
 # Session state
+# Durable session: the id lives in the URL, so a reload or another worker resumes it
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = st.query_params.get("sid") or uuid.uuid4().hex
+    st.query_params["sid"] = st.session_state.session_id
 if 'profile' not in st.session_state:
-    st.session_state.profile = None
+    saved = get_store().load_profile(st.session_state.session_id)
+    st.session_state.profile = StudentProfile(**saved) if saved else None
 if 'current_option' not in st.session_state:
     st.session_state.current_option = "profile"
+# Only the latest turns are kept in memory; older ones stay in the session store
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = get_store().history(st.session_state.session_id)
+# Token-budgeted context for follow-up questions
+if 'memory' not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+    st.session_state.memory.seed(st.session_state.chat_history.recent)
 
 def main():
+    with measure("app"):
+        render_page()
+
+def render_page():
+    cancel_abandoned_answer()
+
     st.title("🧑‍🏫 AI Teacher Assistant")
     st.markdown("### Get personalized answers based on your academic level!")
     st.divider()
@@ -120,9 +103,8 @@ def main():
         st.divider()
 
         if st.session_state.profile:
-            pr = st.session_state.profile
             st.subheader("📖 Current Profile")
-            st.info(f"**Name:** {pr.Student_Name}\n**Institution:** {pr.Academic_Name}\n**Level:** {pr.Academic_Level}\n**Class:** {pr.Class}\n**Subject:** {pr.Subject}")
+            st.info(profile_card(astuple(st.session_state.profile)))
         else:
             st.warning("⚠️ No profile created yet!")
 
@@ -157,6 +139,7 @@ def show_profile_section():
             if name and academic_name and subject:
                 level = get_academic_level(class_num)
                 st.session_state.profile = StudentProfile(Student_Name=name, Academic_Name=academic_name, Academic_Level=level, Class=class_num, Subject=subject)
+                save_profile()
                 st.success("✅ Profile created/updated successfully!")
                 st.balloons()
                 st.subheader("📘 Profile Summary")
@@ -169,30 +152,42 @@ def show_ask_question_section():
     if st.session_state.profile:
         profile = st.session_state.profile
         st.success(f"🎯 Ready to answer questions for **{profile.Student_Name}** ({profile.Academic_Level} level)")
+        show_questions(profile)
+
+# One fragment for the form and the history: asking or paging reruns only this section,
+# and a new answer shows up in the history the same run
+@fragment
+def show_questions(profile: StudentProfile):
+    show_question_form(profile)
+    show_chat_history()
+
+def show_question_form(profile: StudentProfile):
+    with measure("ask"), telemetry.timed("streamlit", "ask_question"):
         with st.form("question_form"):
             question = st.text_area(f"Ask anything about {profile.Subject}:", placeholder=f"Type your {profile.Subject} question here...", height=100)
             ask_button = st.form_submit_button("🚀 Get Answer", use_container_width=True)
             if ask_button and question:
-                with st.spinner("🤔 AI Teacher is thinking..."):
-                    answer = ask_openai(question, profile)
-                st.session_state.chat_history.append({'question': question, 'answer': answer, 'timestamp': st.session_state.get('chat_count', 0) + 1})
-                st.session_state.chat_count = st.session_state.get('chat_count', 0) + 1
                 st.subheader("🧑‍🏫 Teacher's Answer:")
                 st.markdown(f"**Question:** {question}")
                 st.markdown("**Answer:**")
-                st.info(answer)
-
+                with st.container(border=True):
+                    answer = st.write_stream(stream_answer(question, profile)).strip()
+                # Only a completed answer becomes a turn of the history
+                if st.session_state.answer_error is not None:
+                    st.error(f"❌ Error getting response from AI: {st.session_state.answer_error}")
+                elif not st.session_state.answer_handle.cancelled:
+                    st.session_state.chat_history.append(question, answer)
+
+def show_chat_history():
+    with measure("history"):
         if st.session_state.chat_history:
             st.divider()
             st.subheader("📚 Previous Questions & Answers")
             if st.button("🗑️ Clear Chat History"):
-                st.session_state.chat_history = []
+                st.session_state.chat_history.clear()
+                st.session_state.memory.clear()
                 st.rerun()
-            for i, chat in enumerate(reversed(st.session_state.chat_history), 1):
-                label = f"Q{len(st.session_state.chat_history) - i + 1}: " + (chat['question'][:60] + "..." if len(chat['question']) > 60 else chat['question'])
-                with st.expander(label):
-                    st.markdown(f"**❓ Question:** {chat['question']}")
-                    st.markdown(f"**💡 Answer:** {chat['answer']}")
+            show_history(st.session_state.chat_history)
 
 def show_change_subject_section():
     st.header("📚 Change Subject")
@@ -206,6 +201,7 @@ def show_change_subject_section():
                 if st.form_submit_button("✅ Update Subject", use_container_width=True):
                     if new_subject:
                         st.session_state.profile.Subject = new_subject
+                        save_profile()
                         st.success(f"✅ Subject changed to: **{new_subject}**")
                         st.balloons()
                     else:
@@ -213,6 +209,7 @@ def show_change_subject_section():
             with col2:
                 if st.form_submit_button("🔄 Reset to Original", use_container_width=True):
                     st.session_state.profile.Subject = current_subject
+                    save_profile()
                     st.info("Subject reset to original value")
 
 def show_change_student_section():
@@ -222,7 +219,9 @@ def show_change_student_section():
     with col1:
         if st.button("✅ Create New Profile", use_container_width=True):
             st.session_state.profile = None
-            st.session_state.chat_history = []
+            save_profile()
+            st.session_state.chat_history.clear()
+            st.session_state.memory.clear()
             st.session_state.current_option = "profile"
             st.success("Ready to create new profile!")
             st.rerun()
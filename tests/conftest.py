@@ -0,0 +1,27 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import mock_openai  # noqa: E402
+
+
+# Mock OpenAI server in a background thread; yields its base url
+@pytest.fixture
+def mock_server():
+    servers = []
+
+    def start(config: mock_openai.MockConfig) -> str:
+        server = mock_openai.serve(config)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,30 @@
+import asyncio
+import threading
+
+import answer_service
+from session_store import SessionStore
+
+
+def test_session_memory_reads_the_store_off_the_event_loop(monkeypatch):
+    store = SessionStore(":memory:")
+    readers = []
+    count_turns = store.count_turns
+
+    def counting(session_id):
+        readers.append(threading.current_thread())
+        return count_turns(session_id)
+
+    monkeypatch.setattr(store, "count_turns", counting)
+    monkeypatch.setattr(answer_service, "get_store", lambda: store)
+    sessions = answer_service.SessionMemories()
+    store.append_turn("s1", "What is osmosis?", "Water moving through a membrane.")
+
+    memory = asyncio.run(sessions.get("s1"))
+    assert [t["question"] for t in memory.turns] == ["What is osmosis?"]
+    assert readers and threading.main_thread() not in readers
+
+    # Unchanged store: the same memory; a turn persisted elsewhere: reloaded
+    assert asyncio.run(sessions.get("s1")) is memory
+    store.append_turn("s1", "And diffusion?", "Particles spreading out.")
+    reloaded = asyncio.run(sessions.get("s1"))
+    assert [t["question"] for t in reloaded.turns] == ["What is osmosis?", "And diffusion?"]
@@ -0,0 +1,24 @@
+import os
+import sys
+import json
+import subprocess
+
+CHECK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                     "benchmarks", "check_cancellation.py")
+SCENARIOS = {"thread_cancel_before_first_token", "thread_cancel_mid_stream", "streamlit_rerun_closes_generator",
+             "async_cancel_before_first_token", "async_cancel_mid_stream", "chainlit_task_cancelled",
+             "coalesced_survives_first_cancel"}
+
+
+# The scenarios run in a fresh interpreter: the app modules read their settings (API base
+# url, answer cache) at import time, and they must point at the mock server
+def test_cancelled_answers_close_their_upstream_requests(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k != "ANSWER_SERVICE_URL"}
+    # A connection is dropped within milliseconds of cancel(); well before the first token
+    run = subprocess.run([sys.executable, CHECK, "--ttft", "1", "--close-timeout", "0.3"],
+                         capture_output=True, text=True, timeout=120, cwd=tmp_path, env=env)
+    results = {r["scenario"]: r for r in map(json.loads, run.stdout.splitlines()) if "scenario" in r}
+    assert set(results) == SCENARIOS, run.stderr
+    for name, result in results.items():
+        assert result["ok"], result
+    assert run.returncode == 0, run.stderr
@@ -0,0 +1,83 @@
+import asyncio
+
+import openai
+import pytest
+
+import rate_limiter
+from benchmarks import mock_openai
+from rate_limiter import RateLimiter
+
+
+# Answers the first `failures` requests with a 500
+class FailingFirst(mock_openai.MockConfig):
+    def __init__(self, failures: int):
+        super().__init__(ttft_median=0.0, tokens_per_s=0.0, answer_tokens=20)
+        self.failures = failures
+
+    def draw(self):
+        ttft, _, drop = super().draw()
+        with self.lock:
+            self.failures -= 1
+            failure = 500 if self.failures >= 0 else None
+        return ttft, failure, drop
+
+
+MESSAGES = [{"role": "user", "content": "What is osmosis?"}]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "backoff", lambda attempt: 0.0)
+
+
+def test_server_error_is_retried(mock_server):
+    client = openai.OpenAI(api_key="test", base_url=mock_server(FailingFirst(2)), max_retries=0)
+    limiter = RateLimiter(max_retries=3)
+    stream, permit = limiter.open(
+        lambda: client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, stream=True), 100)
+    answer = "".join(c.choices[0].delta.content or "" for c in stream if c.choices)
+    limiter.release(permit)
+    assert answer.strip()
+    assert limiter.stats()["server_errors_total"] == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_server_error_is_retried_async(mock_server):
+    client = openai.AsyncOpenAI(api_key="test", base_url=mock_server(FailingFirst(1)), max_retries=0)
+    limiter = RateLimiter(max_retries=3)
+
+    async def ask():
+        stream, permit = await limiter.open_async(
+            lambda: client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, stream=True), 100)
+        try:
+            return "".join([c.choices[0].delta.content or "" async for c in stream if c.choices])
+        finally:
+            limiter.release(permit)
+            await client.close()
+
+    assert asyncio.run(ask()).strip()
+    assert limiter.stats()["server_errors_total"] == 1
+
+
+def test_retries_are_capped(mock_server):
+    client = openai.OpenAI(api_key="test", base_url=mock_server(FailingFirst(5)), max_retries=0)
+    limiter = RateLimiter(max_retries=2)
+    with pytest.raises(openai.InternalServerError):
+        limiter.open(lambda: client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES), 100)
+    assert limiter.stats()["server_errors_total"] == 2
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_connection_errors_are_retried_and_client_errors_are_not():
+    limiter = RateLimiter(max_retries=3)
+    calls = []
+
+    def create():
+        calls.append(1)
+        if len(calls) == 1:
+            raise openai.APITimeoutError(request=None)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.open(create, 100)
+    assert len(calls) == 2
@@ -0,0 +1,44 @@
+import numpy as np
+
+from semantic_index import HashingEmbedder, Partition
+
+
+def loaded(directory, embedder):
+    part = Partition(embedder.dim, str(directory))
+    part.load(embedder)
+    return part
+
+
+def add(part, embedder, question):
+    part.append(embedder.embed([question]), [(question, f"answer to {question}")])
+
+
+# Two processes share a partition directory; each compacts from its own view
+def test_compaction_keeps_rows_appended_by_other_writers(tmp_path):
+    embedder = HashingEmbedder()
+    first, second = loaded(tmp_path, embedder), loaded(tmp_path, embedder)
+    add(first, embedder, "What is photosynthesis?")
+    add(second, embedder, "Why is the sky blue?")
+    add(first, embedder, "Define osmosis")
+    first.compact()
+    add(second, embedder, "What is the speed of light?")
+    second.compact()
+    add(first, embedder, "How do vaccines work?")
+
+    fresh = loaded(tmp_path, embedder)
+    questions = ["What is photosynthesis?", "Why is the sky blue?", "Define osmosis",
+                 "What is the speed of light?", "How do vaccines work?"]
+    assert sorted(q for q, _ in fresh.entries) == sorted(questions)
+    for question in questions:
+        entry, score = fresh.search(embedder.embed([question])[0])
+        assert entry == (question, f"answer to {question}")
+        assert np.isclose(score, 1.0)
+
+
+def test_compaction_keeps_the_newest_answer(tmp_path):
+    embedder = HashingEmbedder()
+    first, second = loaded(tmp_path, embedder), loaded(tmp_path, embedder)
+    first.append(embedder.embed(["Define osmosis"]), [("Define osmosis", "old")])
+    second.append(embedder.embed(["define osmosis"]), [("define osmosis", "new")])
+    assert first.compact() == 1
+    assert loaded(tmp_path, embedder).entries == [("define osmosis", "new")]
@@ -0,0 +1,57 @@
+import os
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Partial reruns and their cost for the Streamlit apps. Sections wrapped in `fragment`
+# rerun on their own when their widgets are used, instead of the whole page. With
+# UI_METRICS=1, `measure` logs the server CPU time and the bytes of delta messages sent
+# to the browser for every full run or fragment run, and keeps the latest ones in
+# st.session_state.ui_metrics. UI_FRAGMENTS=0 turns fragments back into plain functions,
+# so the two can be compared on the same code.
+
+logger = logging.getLogger(__name__)
+
+UI_METRICS = os.getenv("UI_METRICS", "0") == "1"
+UI_FRAGMENTS = os.getenv("UI_FRAGMENTS", "1") != "0"
+
+
+def fragment(func):
+    return st.fragment(func) if UI_FRAGMENTS else func
+
+
+# Wraps the session's message queue to count the bytes sent to the browser
+class _PayloadCounter:
+    def __init__(self, enqueue):
+        self.enqueue = enqueue
+        self.bytes = 0
+
+    def __call__(self, msg) -> None:
+        self.bytes += msg.ByteSize()
+        self.enqueue(msg)
+
+
+@contextmanager
+def measure(scope: str):
+    ctx = get_script_run_ctx() if UI_METRICS else None
+    if ctx is None or not callable(getattr(ctx, "_enqueue", None)):
+        yield
+        return
+    if not isinstance(ctx._enqueue, _PayloadCounter):
+        ctx._enqueue = _PayloadCounter(ctx._enqueue)
+    counter = ctx._enqueue
+    cpu, sent = time.thread_time(), counter.bytes
+    try:
+        yield
+    finally:
+        record = {
+            "scope": scope,
+            "cpu_ms": round((time.thread_time() - cpu) * 1e3, 2),
+            "payload_bytes": counter.bytes - sent,
+        }
+        st.session_state.setdefault("ui_metrics", deque(maxlen=200)).append(record)
+        logger.info("%(scope)s run: %(cpu_ms).2f ms CPU, %(payload_bytes)d bytes sent", record)
@@ -1,43 +1,154 @@
+# Serialization benchmark: Pydantic BaseModel vs TypedDict vs dataclass + asdict vs the
+# positional encoding in codec.py, for student profiles (slotted StudentProfile) and chat
+# turns (the dicts SessionStore returns).
+#
+#   python wp.py --records 100000
+#
+# For each representation: mean encode and decode time per record (decode rebuilds the
+# record object), encoded bytes per record, and memory per record held in RAM. Prints one
+# JSON object per (record type, representation); codec.BACKEND says which JSON library
+# the codec representation used (msgspec, orjson or the standard library).
 import json
+import time
+import argparse
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List
+
 from pydantic import BaseModel
 from typing_extensions import TypedDict
-from dataclasses import dataclass, asdict
-
-#MaseModel
-class User(BaseModel):
-    name: str
-    id: int   
-    
-user = User(name="Bano", id=17)
-agent_output_basemodel = {
-    "response": user.model_dump()  #gets wrapped
-}
-print("BaseModel Output:", json.dumps(agent_output_basemodel, indent=2))
-#TypedDict
-class Profile(TypedDict):
-    city: str
-    nic: str
-
-profile: Profile = {"city": "Karachi", "nic": "42201-0545295-6"}
-agent_output_typeddict = {
-    "response": profile   # gets wrapped
-}
-print("\nTypedDict Output:", json.dumps(agent_output_typeddict, indent=2))
 
-#dataclasses
+import codec
+from ai_teacher_assistant import StudentProfile
+
+ANSWER = ("Photosynthesis is how green plants make their own food. Leaves take in carbon dioxide from "
+          "the air and water from the roots, and use the energy of sunlight to turn them into glucose "
+          "and oxygen. ") * 8
+
+
+# BaseModel
+class ProfileModel(BaseModel):
+    Student_Name: str
+    Academic_Name: str
+    Academic_Level: str
+    Class: int
+    Subject: str
+
+
+class TurnModel(BaseModel):
+    seq: int
+    question: str
+    answer: str
+    created: float
+
+
+# TypedDict
+class ProfileDict(TypedDict):
+    Student_Name: str
+    Academic_Name: str
+    Academic_Level: str
+    Class: int
+    Subject: str
+
+
+class TurnDict(TypedDict):
+    seq: int
+    question: str
+    answer: str
+    created: float
+
+
+# dataclass (unslotted, as StudentProfile was)
+@dataclass
+class ProfileData:
+    Student_Name: str
+    Academic_Name: str
+    Academic_Level: str
+    Class: int
+    Subject: str
+
+
 @dataclass
-class ClassInfo:
-    class_level: str
-    teacher_name: str
+class TurnData:
+    seq: int
+    question: str
+    answer: str
+    created: float
+
+
+def profile_values(n: int) -> Dict:
+    return {"Student_Name": f"Student {n}", "Academic_Name": "Government High School Karachi",
+            "Academic_Level": "Matric", "Class": 10, "Subject": "Physics"}
 
-class_info = ClassInfo("Math", 5)
 
-agent_output_dataclass = {
-    "response": asdict(class_info)   # gets wrapped
+def turn_values(n: int) -> Dict:
+    return {"seq": n, "question": f"Explain photosynthesis step {n} in simple words", "answer": ANSWER,
+            "created": 1760000000.0 + n}
+
+
+# name -> (build record from values, encode record, decode bytes to record)
+PROFILE_REPRESENTATIONS = {
+    "pydantic": (lambda v: ProfileModel(**v), lambda r: r.model_dump_json().encode(),
+                 ProfileModel.model_validate_json),
+    "typeddict_json": (lambda v: ProfileDict(**v), lambda r: json.dumps(r).encode(), json.loads),
+    "dataclass_asdict_json": (lambda v: ProfileData(**v), lambda r: json.dumps(asdict(r)).encode(),
+                              lambda b: ProfileData(**json.loads(b))),
+    "slotted_codec": (lambda v: StudentProfile(**v), codec.encode_profile,
+                      lambda b: StudentProfile(*codec.loads(b))),
+}
+
+TURN_REPRESENTATIONS = {
+    "pydantic": (lambda v: TurnModel(**v), lambda r: r.model_dump_json().encode(), TurnModel.model_validate_json),
+    "typeddict_json": (lambda v: TurnDict(**v), lambda r: json.dumps(r).encode(), json.loads),
+    "dataclass_asdict_json": (lambda v: TurnData(**v), lambda r: json.dumps(asdict(r)).encode(),
+                              lambda b: TurnData(**json.loads(b))),
+    # Turns stay the dicts SessionStore returns; only the encoding changes
+    "dict_codec": (dict, codec.encode_turn, codec.decode_turn),
 }
-print("\nDataclass Output:", json.dumps(agent_output_dataclass, indent=2))
 
-#List[str]
-subjects = ["Math", "Biology", "Computer"]
-agent_output_list = subjects   # NOT wrapped
-print("\nList[str] Output:", json.dumps(agent_output_list, indent=2))
\ No newline at end of file
+
+def memory_per_record(build: Callable, values: List[Dict]) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [build(v) for v in values]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del records
+    return used / len(values)
+
+
+def bench(kind: str, representations: Dict, make_values: Callable, count: int) -> None:
+    # Distinct strings per record, shared by every representation
+    values = [make_values(n) for n in range(count)]
+    for name, (build, encode, decode) in representations.items():
+        records = [build(v) for v in values]
+        start = time.perf_counter()
+        encoded = [encode(r) for r in records]
+        encode_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for data in encoded:
+            decode(data)
+        decode_s = time.perf_counter() - start
+        print(json.dumps({
+            "record": kind,
+            "representation": name,
+            "backend": codec.BACKEND if name.endswith("_codec") else ("pydantic" if name == "pydantic" else "json"),
+            "records": count,
+            "encode_us": round(encode_s / count * 1e6, 3),
+            "decode_us": round(decode_s / count * 1e6, 3),
+            "bytes_per_record": round(sum(map(len, encoded)) / count, 1),
+            # Object overhead only: the field strings are shared with `values`
+            "memory_bytes_per_record": round(memory_per_record(build, values[:10000]), 1),
+        }), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode/decode time and size of profile and turn representations")
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+    bench("profile", PROFILE_REPRESENTATIONS, profile_values, args.records)
+    bench("turn", TURN_REPRESENTATIONS, turn_values, args.records)
+
+
+if __name__ == "__main__":
+    main()